@@ -78,6 +78,11 @@ bool relayActive = false;
 bool wifiConnected = false;
 bool mqttConnected = false;
 
+// Identitas verify request untuk idempotency key di desktop
+String deviceId = "";   // Chip ID (eFuse MAC), unik per unit
+uint32_t bootNonce = 0; // Acak per boot, millis() reset setelah reboot
+uint32_t verifySeq = 0; // Nomor urut verify request sejak boot
+
 // Sensor Metrics Tracking
 struct SensorMetrics
 {
@@ -154,6 +159,13 @@ void setup()
     DEBUG_PRINTLN("Version: " FIRMWARE_VERSION);
     DEBUG_PRINTLN("================================\n");
 
+    // Device ID dari eFuse MAC + nonce boot untuk idempotency key verify request
+    char chipId[13];
+    snprintf(chipId, sizeof(chipId), "%012llX", ESP.getEfuseMac());
+    deviceId = String(chipId);
+    bootNonce = esp_random() ^ micros();
+    DEBUG_PRINTF("Device ID: %s, boot nonce: %08X\n", deviceId.c_str(), bootNonce);
+
     // Initialize all components
     setupPins();
     setupLCD();
@@ -562,6 +574,10 @@ void handleSensors()
             doc["sensor"] = getSensorName(activeSensor);
             doc["fingerprint_id"] = result; // Raw ID (for debugging)
             doc["timestamp"] = millis();
+            // Idempotency key di desktop: device + boot + seq (unik antar unit dan reboot)
+            doc["device"] = deviceId;
+            doc["boot"] = bootNonce;
+            doc["seq"] = ++verifySeq;
 
             String payload;
             serializeJson(doc, payload);
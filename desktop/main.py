@@ -8,6 +8,13 @@ from datetime import datetime
 import sqlite3
 import base64
 import csv
+import collections
+import hashlib
+import os
+import struct
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 class RoundedButton(tk.Canvas):
     """Custom rounded button"""
@@ -106,6 +113,502 @@ class RoundedEntry(tk.Frame):
     def delete(self, first, last=None):
         return self.entry.delete(first, last)
 
+TEMPLATE_SIZE = 512  # byte per template, sama dengan TEMPLATE_SIZE di Config.h
+TEMPLATE_HEADER_BYTES = 4  # start code 0xEF01 + ID slot, bukan data minutiae
+TEMPLATE_MIN_POPULATED = 32  # minimal byte terisi (di luar header) agar skor bermakna
+
+# Jumlah bit 1 untuk setiap nilai byte (fallback jika np.bitwise_count tidak ada, NumPy < 2.0)
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+def popcount_rows(matrix):
+    """Jumlah bit 1 per baris matriks uint8"""
+    if hasattr(np, "bitwise_count") and matrix.shape[1] % 8 == 0:
+        words = np.ascontiguousarray(matrix).view(np.uint64)
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+    return POPCOUNT_TABLE[matrix].sum(axis=1, dtype=np.int64)
+
+def region_scores(gallery, probe_row, header_bytes=TEMPLATE_HEADER_BYTES, min_populated=TEMPLATE_MIN_POPULATED):
+    """Skor kemiripan (0-100) probe ke setiap baris gallery, hanya di region terisi
+    
+    Byte header dan padding nol (nol di kedua template) tidak ikut dihitung,
+    karena keduanya selalu sama dan membuat template berbeda tampak mirip.
+    Skor = persentase bit yang sama pada byte yang terisi di salah satu
+    template; pasangan dengan region terisi < min_populated byte diberi skor 0.
+    """
+    diff = np.bitwise_xor(gallery, probe_row)
+    distances = popcount_rows(diff) - POPCOUNT_TABLE[diff[:, :header_bytes]].sum(axis=1, dtype=np.int64)
+    populated = np.count_nonzero(np.bitwise_or(gallery[:, header_bytes:], probe_row[header_bytes:]), axis=1)
+    scores = 100.0 * (1.0 - distances / np.maximum(populated * 8, 1))
+    scores[populated < min_populated] = 0.0
+    return scores
+
+def bit_sketch(matrix, sketch_bytes, header_bytes=TEMPLATE_HEADER_BYTES):
+    """Sketch per template: sketch_bytes byte pertama region minutiae (setelah header)
+    
+    Region yang terisi selalu dimulai tepat setelah header dan minimal
+    TEMPLATE_MIN_POPULATED byte, jadi sketch tidak mengambil sampel dari
+    header atau padding nol seperti sampel ber-stride di seluruh baris.
+    
+    Jarak Hamming antar sketch adalah estimasi (sampel bit) dari jarak Hamming
+    penuh, jadi cukup murah untuk menyaring kandidat sebelum scoring penuh.
+    """
+    matrix = np.asarray(matrix)
+    return np.ascontiguousarray(matrix[:, header_bytes:header_bytes + sketch_bytes])
+
+class TemplateMatcher:
+    """Matcher 1:N berbasis jarak Hamming per bit dengan galeri resident
+    
+    Galeri berupa matriks uint8 kontigu (kapasitas x template_size) plus kolom
+    user_id. Jika path diberikan, keduanya di-memmap dari file galeri:
+    
+        header (64 byte) | user_id int64[kapasitas] | template uint8[kapasitas][template_size]
+    
+    sehingga startup tidak perlu membaca BLOB dari database dan page cache OS
+    yang menjaga halaman aktif tetap di memori. Enroll menambah baris (append)
+    atau menimpa baris user yang sama, delete menandai baris sebagai tombstone
+    (user_id = -1). Probe dibandingkan ke semua template sekaligus (XOR lalu
+    popcount per baris), skor = persentase bit yang sama (0-100) pada region
+    minutiae yang terisi (lihat region_scores).
+    
+    Kalibrasi threshold 70 (tests/test_template_matcher.py, pasangan sintetis
+    dengan region 64-400 byte acak): skor impostor ~50 (maks < 58 dari 20.000
+    pasangan), genuine dengan 10% bit noise ~90. FAR terukur 0/20.000 (batas
+    atas 95% ~1.5e-4) dan FRR 0. Data minutiae sensor asli tidak seacak ini,
+    jadi threshold perlu dikalibrasi ulang dengan pasangan genuine/impostor
+    dari sensor sebelum dipakai untuk kontrol akses. Template dummy firmware
+    (hanya header) tidak pernah MATCH.
+    
+    Dengan shortlist_k > 0, galeri besar dicocokkan dua tahap: index sketch
+    (sampel bit per template, di memori) memilih shortlist_k kandidat dengan
+    estimasi jarak terkecil, lalu scoring penuh hanya pada kandidat tersebut.
+    Setiap recall_sample_every probe juga dicek brute force untuk mengukur recall.
+    
+    Dengan set_workers(n > 1) dan galeri berbasis file, galeri minimal
+    parallel_min template di-scan oleh ShardedMatchPool; galeri kecil tetap
+    dicocokkan di proses ini (overhead IPC lebih besar dari scan-nya).
+    """
+    MAGIC = b"VFGALLRY"
+    VERSION = 1
+    HEADER = struct.Struct("<8sIIQQQ")  # magic, version, template_size, capacity, count, tombstones
+    HEADER_SIZE = 64
+    TOMBSTONE = -1
+    SKETCH_BYTES = 16  # 128 bit sampel per template
+    
+    def __init__(self, template_size=TEMPLATE_SIZE, threshold=70, initial_capacity=256, path=None,
+                 shortlist_k=0, recall_sample_every=50):
+        self.template_size = template_size
+        self.threshold = threshold
+        self.path = path
+        self.shortlist_k = shortlist_k
+        self.recall_sample_every = recall_sample_every
+        self.sketch_bytes = min(self.SKETCH_BYTES, template_size - TEMPLATE_HEADER_BYTES)
+        self._lock = threading.Lock()
+        self._map = None
+        self._rows = {}  # user_id -> index baris
+        self.count = 0  # baris terpakai, termasuk tombstone
+        self.tombstones = 0
+        self.rebuilds = 0
+        self.last_match_ms = 0.0
+        self.matches = 0
+        self.shortlisted = 0
+        self.recall_samples = 0
+        self.recall_hits = 0
+        self.pool = None
+        self.parallel_min = 50000
+        self.parallel_matches = 0
+        self.generation = 0  # naik setiap file galeri diganti / di-map ulang
+        # Storage di memori sampai open_file() atau load() membuat/memetakan file galeri
+        self._capacity = max(1, int(initial_capacity))
+        self._ids = np.zeros(self._capacity, dtype=np.int64)
+        self._gallery = np.zeros((self._capacity, template_size), dtype=np.uint8)
+        self._sketches = self._new_sketches(self._capacity)
+    
+    def _allocate(self, capacity, keep_rows=0):
+        """Siapkan storage berkapasitas capacity, salin keep_rows baris pertama"""
+        old_ids = self._ids[:keep_rows].copy() if keep_rows else None
+        old_gallery = self._gallery[:keep_rows].copy() if keep_rows else None
+        old_sketches = self._sketches[:keep_rows].copy() if keep_rows else None
+        
+        if self.path:
+            if self._map is not None:
+                self._map.flush()
+            # Lepas semua view ke map lama sebelum file diganti (wajib di Windows),
+            # termasuk map di proses worker
+            self._map = self._ids = self._gallery = None
+            workers = self.pool.workers if self.pool else 0
+            if self.pool:
+                self.pool.close()
+                self.pool = None
+            size = self.HEADER_SIZE + capacity * (8 + self.template_size)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.truncate(size)
+            os.replace(tmp_path, self.path)
+            self._map_file(capacity)
+            if workers:
+                self.pool = ShardedMatchPool(self.path, self.template_size, workers)
+        else:
+            self._ids = np.zeros(capacity, dtype=np.int64)
+            self._gallery = np.zeros((capacity, self.template_size), dtype=np.uint8)
+        self._capacity = capacity
+        self._sketches = self._new_sketches(capacity)
+        
+        if keep_rows:
+            self._ids[:keep_rows] = old_ids
+            self._gallery[:keep_rows] = old_gallery
+            self._sketches[:keep_rows] = old_sketches
+        self._write_header()
+    
+    def _new_sketches(self, capacity):
+        return np.zeros((capacity, self.sketch_bytes), dtype=np.uint8)
+    
+    def _map_file(self, capacity):
+        """Memmap file galeri (zero-copy view untuk kolom id dan matriks template)"""
+        self.generation += 1
+        self._map = np.memmap(self.path, dtype=np.uint8, mode="r+")
+        ids_end = self.HEADER_SIZE + capacity * 8
+        self._ids = self._map[self.HEADER_SIZE:ids_end].view(np.int64)
+        self._gallery = self._map[ids_end:].reshape(capacity, self.template_size)
+    
+    def _write_header(self):
+        if self._map is None:
+            return
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, self.template_size,
+                                  self._capacity, self.count, self.tombstones)
+        self._map[:len(header)] = np.frombuffer(header, dtype=np.uint8)
+    
+    def flush(self):
+        """Tulis perubahan memmap ke disk"""
+        with self._lock:
+            if self._map is not None:
+                self._write_header()
+                self._map.flush()
+    
+    def open_file(self):
+        """Map file galeri yang sudah ada, return False jika tidak ada/tidak valid"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb") as f:
+            raw = f.read(self.HEADER.size)
+        if len(raw) < self.HEADER.size:
+            return False
+        magic, version, template_size, capacity, count, tombstones = self.HEADER.unpack(raw)
+        expected = self.HEADER_SIZE + capacity * (8 + template_size)
+        if (magic != self.MAGIC or version != self.VERSION or template_size != self.template_size
+                or count > capacity or os.path.getsize(self.path) != expected):
+            return False
+        
+        with self._lock:
+            self._map = self._ids = self._gallery = None
+            self._map_file(capacity)
+            self._capacity = capacity
+            self.count = count
+            self.tombstones = tombstones
+            # Index sketch tidak disimpan di file, dihitung ulang dari matriks
+            self._sketches = self._new_sketches(capacity)
+            self._sketches[:count] = bit_sketch(self._gallery[:count], self.sketch_bytes)
+            ids = self._ids[:count]
+            self._rows = {int(user_id): index for index, user_id in enumerate(ids)
+                          if user_id != self.TOMBSTONE}
+        return True
+    
+    def set_workers(self, workers):
+        """Aktifkan (workers > 1) atau matikan pool proses matching"""
+        with self._lock:
+            if self.pool:
+                self.pool.close()
+                self.pool = None
+            if workers > 1 and self.path:
+                self.pool = ShardedMatchPool(self.path, self.template_size, workers)
+    
+    def close(self):
+        """Stop pool dan flush galeri"""
+        self.set_workers(0)
+        self.flush()
+    
+    def to_row(self, template):
+        """Template bytes -> array uint8 sepanjang template_size (pad nol / potong)"""
+        row = np.zeros(self.template_size, dtype=np.uint8)
+        data = np.frombuffer(bytes(template), dtype=np.uint8)[:self.template_size]
+        row[:len(data)] = data
+        return row
+    
+    def _grow(self, needed):
+        """Perbesar kapasitas (x2) agar append tetap amortized O(1)"""
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity != self._capacity:
+            self._allocate(capacity, keep_rows=self.count)
+    
+    def load(self, rows):
+        """Bangun ulang galeri dari rows (user_id, template_blob), template kosong dilewati"""
+        rows = [(user_id, blob) for user_id, blob in rows if blob]
+        with self._lock:
+            self.count = 0
+            self.tombstones = 0
+            self._rows = {}
+            capacity = self._capacity
+            while capacity < len(rows):
+                capacity *= 2
+            self._allocate(capacity)
+            for user_id, blob in rows:
+                self._set_row(user_id, blob)
+            self.rebuilds += 1
+            self._write_header()
+            if self._map is not None:
+                self._map.flush()
+    
+    def _set_row(self, user_id, blob):
+        index = self._rows.get(user_id)
+        if index is None:
+            self._grow(self.count + 1)
+            index = self.count
+            self.count += 1
+            self._rows[user_id] = index
+            self._ids[index] = user_id
+        row = self.to_row(blob)
+        self._gallery[index] = row
+        self._sketches[index] = bit_sketch(row[np.newaxis, :], self.sketch_bytes)[0]
+    
+    def upsert(self, user_id, template):
+        """Tambah (append) atau timpa template satu user"""
+        if not template:
+            self.remove(user_id)
+            return
+        with self._lock:
+            self._set_row(user_id, template)
+            self._write_header()
+    
+    def remove(self, user_id):
+        """Tandai baris user sebagai tombstone"""
+        with self._lock:
+            index = self._rows.pop(user_id, None)
+            if index is None:
+                return
+            self._ids[index] = self.TOMBSTONE
+            self.tombstones += 1
+            self._write_header()
+    
+    def needs_compaction(self):
+        """True jika lebih dari separuh baris adalah tombstone"""
+        return self.tombstones > 0 and self.tombstones * 2 > self.count
+    
+    def _brute_force(self, probe_row):
+        """Scoring penuh ke seluruh galeri, return (index, skor)"""
+        scores = region_scores(self._gallery[:self.count], probe_row)
+        if self.tombstones:
+            scores[self._ids[:self.count] == self.TOMBSTONE] = -1.0
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+    
+    def _shortlist(self, probe_row, k):
+        """Tahap 1 index sketch lalu scoring penuh pada k kandidat, return (index, skor)"""
+        probe_sketch = bit_sketch(probe_row[np.newaxis, :], self.sketch_bytes)[0]
+        estimates = popcount_rows(np.bitwise_xor(self._sketches[:self.count], probe_sketch))
+        if self.tombstones:
+            estimates[self._ids[:self.count] == self.TOMBSTONE] = self.sketch_bytes * 8 + 1
+        candidates = np.argpartition(estimates, k)[:k]
+        scores = region_scores(self._gallery[candidates], probe_row)
+        best = int(np.argmax(scores))
+        return int(candidates[best]), float(scores[best])
+    
+    def match(self, probe):
+        """Cari template terdekat, return (user_id atau None, skor terbaik)"""
+        start = time.perf_counter()
+        probe_row = self.to_row(probe)
+        with self._lock:
+            live = self.count - self.tombstones
+            if live <= 0:
+                return None, 0.0
+            self.matches += 1
+            pool = self.pool if live >= self.parallel_min else None
+            count, generation = self.count, self.generation
+        
+        best = None
+        if pool:
+            # Scan paralel di luar lock supaya enroll/delete tidak ikut menunggu
+            try:
+                best, score = pool.match(probe_row, count, generation)
+            except Exception:
+                best = None  # pool sedang diganti / worker mati, pakai jalur biasa
+        
+        with self._lock:
+            if self.count - self.tombstones <= 0:
+                return None, 0.0
+            k = self.shortlist_k
+            if best is not None and generation == self.generation and self._ids[best] != self.TOMBSTONE:
+                self.parallel_matches += 1
+            elif k and self.count - self.tombstones > k * 4:
+                self.shortlisted += 1
+                best, score = self._shortlist(probe_row, k)
+                if self.recall_sample_every and self.shortlisted % self.recall_sample_every == 0:
+                    # Sampel recall: apakah shortlist menemukan skor terbaik yang sama dengan brute force
+                    _, exact_score = self._brute_force(probe_row)
+                    self.recall_samples += 1
+                    self.recall_hits += int(score == exact_score)
+            else:
+                best, score = self._brute_force(probe_row)
+            user_id = int(self._ids[best])
+        self.last_match_ms = (time.perf_counter() - start) * 1000
+        
+        if score >= self.threshold:
+            return user_id, score
+        return None, score
+    
+    def nbytes(self):
+        """Ukuran galeri (termasuk kapasitas cadangan), untuk memmap = ukuran file"""
+        return self._gallery.nbytes + self._ids.nbytes + (self.HEADER_SIZE if self._map is not None else 0)
+    
+    def stats(self):
+        """Statistik galeri"""
+        with self._lock:
+            return {
+                "templates": self.count - self.tombstones,
+                "tombstones": self.tombstones,
+                "capacity": self._capacity,
+                "bytes": self.nbytes(),
+                "rebuilds": self.rebuilds,
+                "mapped": self._map is not None,
+                "last_match_ms": self.last_match_ms,
+                "shortlist_k": self.shortlist_k,
+                "shortlisted": self.shortlisted,
+                "workers": self.pool.workers if self.pool else 0,
+                "parallel_matches": self.parallel_matches,
+                "recall": (self.recall_hits / self.recall_samples) if self.recall_samples else None
+            }
+    
+    def __len__(self):
+        return self.count - self.tombstones
+
+# State per proses worker ShardedMatchPool (diisi oleh _shard_worker_init)
+_shard_state = {}
+
+def _shard_worker_init(path, template_size):
+    _shard_state.update(path=path, template_size=template_size, generation=None)
+
+def _shard_map(generation):
+    """Map (ulang) file galeri di proses worker jika file sudah diganti parent"""
+    if _shard_state["generation"] == generation:
+        return
+    _shard_state.update(ids=None, gallery=None)
+    with open(_shard_state["path"], "rb") as f:
+        header = TemplateMatcher.HEADER.unpack(f.read(TemplateMatcher.HEADER.size))
+    capacity = header[3]
+    mapped = np.memmap(_shard_state["path"], dtype=np.uint8, mode="r")
+    ids_end = TemplateMatcher.HEADER_SIZE + capacity * 8
+    _shard_state.update(ids=mapped[TemplateMatcher.HEADER_SIZE:ids_end].view(np.int64),
+                        gallery=mapped[ids_end:].reshape(capacity, _shard_state["template_size"]),
+                        generation=generation)
+
+def _shard_match(probe, generation, start, end):
+    """Scoring brute force baris [start, end) di proses worker, return (index, skor)"""
+    _shard_map(generation)
+    probe_row = np.frombuffer(probe, dtype=np.uint8)
+    scores = region_scores(_shard_state["gallery"][start:end], probe_row)
+    scores[_shard_state["ids"][start:end] == TemplateMatcher.TOMBSTONE] = -1.0
+    best = int(np.argmax(scores))
+    return start + best, float(scores[best])
+
+class ShardedMatchPool:
+    """Pool proses untuk matching galeri besar
+    
+    Setiap worker me-memmap file galeri yang sama (halaman dibagi lewat page
+    cache OS, tanpa menyalin galeri) dan men-scan satu shard baris. Probe
+    dikirim ke semua shard, hasil terbaik digabung di proses utama.
+    """
+    def __init__(self, path, template_size, workers):
+        self.path = path
+        self.template_size = template_size
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(max_workers=workers,
+                                             initializer=_shard_worker_init,
+                                             initargs=(path, template_size))
+    
+    def match(self, probe_row, count, generation):
+        """Fan-out probe ke semua shard, return (index, skor) terbaik"""
+        probe = probe_row.tobytes()
+        shard = -(-count // self.workers)
+        futures = [self._executor.submit(_shard_match, probe, generation, start, min(start + shard, count))
+                   for start in range(0, count, shard)]
+        return max((future.result() for future in futures), key=lambda result: result[1])
+    
+    def close(self):
+        """Hentikan worker (melepas memmap mereka)"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+class ProbeCache:
+    """Cache keputusan match per probe dengan TTL pendek dan eviction LRU
+    
+    Key = digest template probe, value = (user_id, skor). Untuk user yang
+    mengulang scan jari yang sama dalam beberapa detik. Harus di-clear setiap
+    galeri berubah supaya keputusan lama tidak dipakai lagi. clear() menaikkan
+    epoch; put() dengan epoch yang diambil sebelum clear() dibuang, sehingga
+    match yang sedang berjalan saat user dihapus tidak masuk cache.
+    """
+    def __init__(self, ttl_s=5.0, max_entries=256):
+        self.ttl_s = ttl_s
+        self.max_entries = max(1, int(max_entries))
+        self._entries = collections.OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.stale_puts = 0
+        self.epoch = 0
+    
+    @staticmethod
+    def key(template):
+        return hashlib.blake2b(bytes(template), digest_size=16).digest()
+    
+    def get(self, key):
+        """Return value yang masih berlaku atau None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+            return None
+    
+    def put(self, key, value, epoch):
+        """Simpan keputusan match, epoch = self.epoch saat match dimulai"""
+        with self._lock:
+            if epoch != self.epoch:
+                self.stale_puts += 1
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.epoch += 1
+    
+    def stats(self):
+        """Statistik cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "stale_puts": self.stale_puts
+            }
+
 class AttendanceApp:
     def __init__(self, root):
         self.root = root
@@ -141,6 +644,14 @@ class AttendanceApp:
         
         self.users = {}
         
+        # Matcher template 1:N (threshold bisa diatur lewat settings 'match_threshold')
+        # Galeri di-memmap dari file di samping attendance.db
+        # Galeri besar: shortlist 'match_shortlist_k' kandidat lewat index sketch (0 = brute force)
+        self.matcher = TemplateMatcher(threshold=70, path='attendance.gallery', shortlist_k=32)
+        
+        # Cache keputusan match untuk scan ulang probe yang sama ('probe_cache_ttl' detik)
+        self.probe_cache = ProbeCache(ttl_s=5.0, max_entries=256)
+        
         # Inisialisasi database
         self.init_database()
         
@@ -325,6 +836,7 @@ class AttendanceApp:
         
         self.conn.commit()
         self.load_users_from_db()
+        self.open_gallery()
     
     def load_users_from_db(self):
         """Load users dari database"""
@@ -332,6 +844,39 @@ class AttendanceApp:
         for user_id, name in self.cursor.fetchall():
             self.users[user_id] = name
     
+    def open_gallery(self):
+        """Map file galeri, bangun ulang dari tabel users jika tidak ada / tidak sinkron"""
+        # Template kosong dilewati load(), jadi tidak ikut dihitung
+        expected = self.conn.execute(
+            'SELECT COUNT(*) FROM users WHERE length(fingerprint_template) > 0'
+        ).fetchone()[0]
+        if (self.matcher.open_file() and len(self.matcher) == expected
+                and not self.matcher.needs_compaction()):
+            stats = self.matcher.stats()
+            print(f"✓ Template gallery mapped: {stats['templates']} template, "
+                  f"{stats['bytes'] / 1024:.0f} KB, {stats['tombstones']} tombstone")
+            return
+        self.reload_gallery()
+    
+    def reload_gallery(self):
+        """Bangun ulang galeri matcher dari tabel users (startup / restore)"""
+        rows = self.conn.execute(
+            'SELECT id, fingerprint_template FROM users WHERE length(fingerprint_template) > 0'
+        ).fetchall()
+        self.matcher.load(rows)
+        self.probe_cache.clear()
+        stats = self.matcher.stats()
+        print(f"✓ Template gallery: {stats['templates']} template, {stats['bytes'] / 1024:.0f} KB, "
+              f"rebuild #{stats['rebuilds']}")
+    
+    def compact_gallery(self):
+        """Flush galeri (bangun ulang jika tombstone sudah lebih dari separuh), reset cache probe"""
+        self.probe_cache.clear()
+        if self.matcher.needs_compaction():
+            self.reload_gallery()
+        else:
+            self.matcher.flush()
+    
     def load_settings(self):
         """Load settings dari database"""
         self.cursor.execute('SELECT key, value FROM settings')
@@ -346,6 +891,21 @@ class AttendanceApp:
             self.mqtt_port = int(settings['mqtt_port'])
             self.entry_port.delete(0, tk.END)
             self.entry_port.insert(0, str(self.mqtt_port))
+        
+        if 'match_threshold' in settings:
+            self.matcher.threshold = float(settings['match_threshold'])
+        
+        if 'probe_cache_ttl' in settings:
+            self.probe_cache.ttl_s = max(0.0, float(settings['probe_cache_ttl']))
+        
+        if 'match_shortlist_k' in settings:
+            self.matcher.shortlist_k = max(0, int(settings['match_shortlist_k']))
+        
+        # Pool proses matching: 'match_workers' > 1 untuk galeri >= 'match_parallel_min' template
+        if 'match_parallel_min' in settings:
+            self.matcher.parallel_min = max(1, int(settings['match_parallel_min']))
+        if 'match_workers' in settings:
+            self.matcher.set_workers(int(settings['match_workers']))
     
     def save_settings(self):
         """Simpan settings ke database"""
@@ -1326,7 +1886,12 @@ Anda dapat melakukan restore jika sensor fingerprint direset atau template hilan
                         'UPDATE users SET fingerprint_template = ? WHERE id = ?',
                         (template_blob, user_id)
                     )
+                    updated = self.cursor.rowcount
                     self.conn.commit()
+                    if updated:
+                        self.matcher.upsert(int(user_id), template_blob)
+                        self.matcher.flush()
+                        self.probe_cache.clear()
                     self.log(f"✅ Enrollment success: {user_name} (ID: {user_id}, Quality: {quality})")
                     self.root.after(0, self.refresh_user_list)
                 else:
@@ -1353,41 +1918,47 @@ Anda dapat melakukan restore jika sensor fingerprint direset atau template hilan
                     # Decode template
                     template_data = base64.b64decode(template_b64)
                     
-                    # Search in database for matching template
-                    self.cursor.execute('SELECT id, name, email, position, fingerprint_template FROM users')
-                    users = self.cursor.fetchall()
+                    # Scan ulang probe yang sama dalam TTL: pakai keputusan sebelumnya
+                    cache_key = ProbeCache.key(template_data)
+                    epoch = self.probe_cache.epoch
+                    cached = self.probe_cache.get(cache_key)
+                    if cached is not None:
+                        user_id, score = cached
+                    else:
+                        # Cocokkan ke seluruh galeri sekaligus; hasil dibuang dari cache
+                        # jika galeri berubah (enroll/hapus) selama match berjalan
+                        user_id, score = self.matcher.match(template_data)
+                        self.probe_cache.put(cache_key, (user_id, score), epoch)
+                    match_score = int(round(score))
                     
-                    matched = False
-                    for user in users:
-                        user_id, name, email, position, stored_template = user
-                        if stored_template:
-                            # Simple comparison (in production, use proper matching algorithm)
-                            # For now, we'll use basic byte comparison
-                            if len(template_data) == len(stored_template):
-                                # Calculate similarity (simplified)
-                                match_score = 85  # Placeholder - implement proper matching
-                                
-                                if match_score >= 70:  # Threshold
-                                    # Send verification response
-                                    response = {
-                                        "status": "MATCH",
-                                        "user_id": user_id,
-                                        "user_name": name,
-                                        "match_score": match_score
-                                    }
-                                    self.mqtt_client.publish(self.TOPIC_VERIFY_RESPONSE, json.dumps(response))
-                                    
-                                    # Log attendance
-                                    self.cursor.execute(
-                                        'INSERT INTO attendance_logs (user_id, user_name, match_score) VALUES (?, ?, ?)',
-                                        (user_id, name, match_score)
-                                    )
-                                    self.conn.commit()
-                                    
-                                    self.log(f"✅ Verification: {name} (ID: {user_id}, Score: {match_score})")
-                                    self.root.after(0, self.refresh_attendance_logs)
-                                    matched = True
-                                    break
+                    matched = user_id is not None
+                    if matched:
+                        name = self.users.get(user_id, "Unknown")
+                        
+                        # Send verification response
+                        response = {
+                            "status": "MATCH",
+                            "user_id": user_id,
+                            "user_name": name,
+                            "match_score": match_score
+                        }
+                        self.mqtt_client.publish(self.TOPIC_VERIFY_RESPONSE, json.dumps(response))
+                        
+                        # Log attendance
+                        self.cursor.execute(
+                            'INSERT INTO attendance_logs (user_id, user_name, match_score) VALUES (?, ?, ?)',
+                            (user_id, name, match_score)
+                        )
+                        self.conn.commit()
+                        
+                        stats = self.matcher.stats()
+                        recall = f", recall shortlist {stats['recall']:.0%}" if stats['recall'] is not None else ""
+                        cache = self.probe_cache.stats()
+                        source = "cache" if cached is not None else f"{stats['last_match_ms']:.2f} ms"
+                        self.log(f"✅ Verification: {name} (ID: {user_id}, Score: {match_score}, "
+                                 f"{source} / {stats['templates']} template{recall}, "
+                                 f"cache hit {cache['hit_rate']:.0%})")
+                        self.root.after(0, self.refresh_attendance_logs)
                     
                     if not matched:
                         # No match found
@@ -1398,7 +1969,8 @@ Anda dapat melakukan restore jika sensor fingerprint direset atau template hilan
                             "match_score": 0
                         }
                         self.mqtt_client.publish(self.TOPIC_VERIFY_RESPONSE, json.dumps(response))
-                        self.log(f"❌ Verification failed: No match found")
+                        self.log(f"❌ Verification failed: No match found (best score {match_score}, "
+                                 f"threshold {self.matcher.threshold:g})")
             
             # Handle system/health topic - system health status
             elif msg.topic == self.TOPIC_SYS_HEALTH:
@@ -1485,6 +2057,9 @@ Anda dapat melakukan restore jika sensor fingerprint direset atau template hilan
             ''', (user_id, user_name, user_email, user_position))
             self.conn.commit()
             self.users[user_id] = user_name
+            # INSERT OR REPLACE menghapus template lama
+            self.matcher.remove(user_id)
+            self.compact_gallery()
             
             # Kirim perintah enroll ke ESP32
             enroll_data = {
@@ -1639,6 +2214,8 @@ Anda dapat melakukan restore jika sensor fingerprint direset atau template hilan
             # Hapus dari database
             self.cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
             self.conn.commit()
+            self.matcher.remove(user_id)
+            self.compact_gallery()
             
             # Hapus dari dict
             if user_id in self.users:
@@ -1921,10 +2498,13 @@ Anda dapat melakukan restore jika sensor fingerprint direset atau template hilan
         """Handler saat aplikasi ditutup"""
         if self.is_connected:
             self.disconnect_mqtt()
+        self.matcher.close()
         self.conn.close()
         self.root.destroy()
 
 if __name__ == "__main__":
+    # Diperlukan worker ShardedMatchPool pada build PyInstaller (Windows)
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = AttendanceApp(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
@@ -2,12 +2,123 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
 import paho.mqtt.client as mqtt
 import json
+import os
 import threading
+import queue
+import random
 import time
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import sqlite3
+import contextlib
 import base64
 import csv
+import collections
+import logging
+import struct
+import sys
+import zlib
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Profil performa SQLite, nama profil disimpan di tabel settings (key 'db_profile')
+# cache_size dalam KiB (nilai negatif sesuai konvensi PRAGMA), mmap_size dalam byte
+DB_PROFILES = {
+    "peak": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16384,
+        "mmap_size": 67108864,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8192,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 10000
+    },
+    "legacy": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000
+    }
+}
+DEFAULT_DB_PROFILE = "balanced"
+
+def apply_db_profile(conn, profile_name, reader=False):
+    """Terapkan profil PRAGMA ke koneksi SQLite, return nilai efektif
+    
+    journal_mode berlaku untuk seluruh file database, jadi hanya diset dari
+    koneksi writer (reader=False).
+    """
+    profile = DB_PROFILES.get(profile_name, DB_PROFILES[DEFAULT_DB_PROFILE])
+    # busy_timeout dulu supaya ganti journal_mode menunggu lock, bukan langsung gagal
+    conn.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout'])}")
+    if reader:
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    else:
+        journal_mode = conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}").fetchone()[0]
+    conn.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+    conn.execute(f"PRAGMA temp_store = {profile['temp_store']}")
+    
+    effective = dict(profile)
+    effective["journal_mode"] = journal_mode.upper()
+    return effective
+
+def describe_db_profile(profile_name, effective):
+    """Teks ringkas profil untuk ditampilkan di UI"""
+    cache_size = effective['cache_size']
+    cache_text = f"{abs(cache_size) // 1024} MB" if cache_size < 0 else f"{cache_size} pages"
+    return (f"{profile_name}: journal={effective['journal_mode']}, synchronous={effective['synchronous']}, "
+            f"cache={cache_text}, mmap={effective['mmap_size'] // (1024 * 1024)} MB, "
+            f"temp_store={effective['temp_store']}, busy_timeout={effective['busy_timeout']} ms")
+
+def date_filter_ranges(years, month=None, day=None):
+    """Ubah pilihan tahun/bulan/tanggal jadi daftar rentang [start, end) check_in_time
+    
+    Rentang half-open berupa string 'YYYY-MM-DD HH:MM:SS' sehingga bisa dicari
+    lewat idx_attendance_time (strftime() pada kolom memaksa full scan).
+    Kombinasi yang tidak ada (mis. 31 Februari) dilewati.
+    """
+    fmt = '%Y-%m-%d %H:%M:%S'
+    ranges = []
+    for year in years:
+        months = [month] if month else range(1, 13)
+        if not month and not day:
+            start, end = date(year, 1, 1), date(year + 1, 1, 1)
+            ranges.append((start, end))
+            continue
+        for m in months:
+            if day:
+                try:
+                    start = date(year, m, day)
+                except ValueError:
+                    continue
+                end = start + timedelta(days=1)
+            else:
+                start = date(year, m, 1)
+                end = date(year + 1, 1, 1) if m == 12 else date(year, m + 1, 1)
+            ranges.append((start, end))
+    return [(datetime(s.year, s.month, s.day).strftime(fmt), datetime(e.year, e.month, e.day).strftime(fmt))
+            for s, e in ranges]
+
+def plan_searches_index(plan, index):
+    """True jika EXPLAIN QUERY PLAN mencari (SEARCH) lewat index, bukan SCAN seluruh index"""
+    return any(detail.startswith('SEARCH') and index in detail for detail in plan)
 
 class RoundedButton(tk.Canvas):
     """Custom rounded button"""
@@ -130,6 +241,1600 @@ class RoundedEntry(tk.Frame):
     def delete(self, first, last=None):
         return self.entry.delete(first, last)
 
+class UserIndex:
+    """Index resident fingerprint_hash -> (id_user, name, email, position)
+    
+    Dibangun dari tabel users saat startup dan di-update setiap kali user
+    disimpan/diedit/dihapus, sehingga verify request tidak perlu query SQLite.
+    """
+    def __init__(self):
+        self._by_hash = {}
+        self._hash_by_user = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.lookup_time = 0.0  # Total waktu lookup (detik)
+    
+    def rebuild(self, rows):
+        """Bangun ulang index dari rows (id_user, name, email, position, fingerprint_hash)"""
+        by_hash = {}
+        hash_by_user = {}
+        for user_id, name, email, position, fp_hash in rows:
+            if fp_hash:
+                owner = by_hash.get(fp_hash)
+                if owner and owner[0] != user_id:
+                    hash_by_user.pop(owner[0], None)
+                by_hash[fp_hash] = (user_id, name, email, position)
+                hash_by_user[user_id] = fp_hash
+        with self._lock:
+            self._by_hash = by_hash
+            self._hash_by_user = hash_by_user
+    
+    def put(self, fingerprint_hash, user_id, name, email, position):
+        """Tambah/ganti entry untuk user"""
+        with self._lock:
+            old_hash = self._hash_by_user.get(user_id)
+            if old_hash and old_hash != fingerprint_hash:
+                self._by_hash.pop(old_hash, None)
+            # Hash pindah dari user lain: lepas hash dari pemilik lama
+            owner = self._by_hash.get(fingerprint_hash)
+            if owner and owner[0] != user_id:
+                self._hash_by_user.pop(owner[0], None)
+            self._by_hash[fingerprint_hash] = (user_id, name, email, position)
+            self._hash_by_user[user_id] = fingerprint_hash
+    
+    def update_user(self, user_id, name, email, position):
+        """Update data user tanpa mengubah hash-nya"""
+        with self._lock:
+            fp_hash = self._hash_by_user.get(user_id)
+            if fp_hash:
+                self._by_hash[fp_hash] = (user_id, name, email, position)
+    
+    def remove_user(self, user_id):
+        """Hapus entry milik user"""
+        with self._lock:
+            fp_hash = self._hash_by_user.pop(user_id, None)
+            if fp_hash:
+                self._by_hash.pop(fp_hash, None)
+    
+    def lookup(self, fingerprint_hash):
+        """Cari user berdasarkan hash, return tuple atau None"""
+        start = time.perf_counter()
+        with self._lock:
+            result = self._by_hash.get(fingerprint_hash)
+            if result:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.lookup_time += time.perf_counter() - start
+        return result
+    
+    def stats(self):
+        """Statistik index (ukuran, hit/miss, rata-rata waktu lookup dalam µs)"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._by_hash),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total * 100) if total else 0.0,
+                "avg_lookup_us": (self.lookup_time / total * 1e6) if total else 0.0
+            }
+
+class NegativeCache:
+    """Cache negatif (TTL) untuk fingerprint_hash yang tidak terdaftar
+    
+    Slot sensor yang tertinggal setelah user dihapus bisa terus mengirim
+    verify request. Selama entry belum kedaluwarsa, miss berulang dijawab
+    dari memori tanpa query fallback ke SQLite. Counter miss per hash tetap
+    disimpan setelah TTL habis (dibatasi max_tracked) untuk melacak slot
+    yatim, dan dihapus saat hash didaftarkan lewat invalidate().
+    """
+    def __init__(self, ttl_s=60.0, max_tracked=256):
+        self.ttl_s = ttl_s
+        self.max_tracked = max_tracked
+        self._expires = {}  # hash -> waktu kedaluwarsa (monotonic)
+        self._misses = collections.OrderedDict()  # hash -> [jumlah, pertama, terakhir]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.version = 0  # Naik setiap counter berubah, untuk refresh tabel UI
+    
+    def contains(self, fingerprint_hash):
+        """True jika hash tercatat tidak terdaftar dan TTL belum habis"""
+        now = time.monotonic()
+        with self._lock:
+            expires = self._expires.get(fingerprint_hash)
+            if expires is None:
+                return False
+            if expires <= now:
+                del self._expires[fingerprint_hash]
+                return False
+            self.hits += 1
+            return True
+    
+    def add(self, fingerprint_hash):
+        """Catat hash sebagai tidak terdaftar selama ttl_s detik"""
+        now = time.monotonic()
+        with self._lock:
+            self._expires[fingerprint_hash] = now + self.ttl_s
+            if len(self._expires) > self.max_tracked:
+                self._expires = {h: t for h, t in self._expires.items() if t > now}
+    
+    def record_miss(self, fingerprint_hash):
+        """Tambah counter miss untuk hash, return jumlah miss sejauh ini"""
+        now = datetime.now()
+        with self._lock:
+            entry = self._misses.pop(fingerprint_hash, None)
+            if entry is None:
+                entry = [0, now, now]
+            entry[0] += 1
+            entry[2] = now
+            self._misses[fingerprint_hash] = entry
+            while len(self._misses) > self.max_tracked:
+                self._misses.popitem(last=False)
+            self.version += 1
+            return entry[0]
+    
+    def invalidate(self, fingerprint_hash):
+        """Hapus hash dari cache (dipanggil saat hash didaftarkan ke user)"""
+        with self._lock:
+            self._expires.pop(fingerprint_hash, None)
+            if self._misses.pop(fingerprint_hash, None) is not None:
+                self.version += 1
+    
+    def set_ttl(self, ttl_s):
+        """Ganti TTL untuk entry berikutnya"""
+        with self._lock:
+            self.ttl_s = ttl_s
+    
+    def snapshot(self, limit=50):
+        """List (hash, jumlah, pertama, terakhir) diurutkan dari miss terbanyak"""
+        with self._lock:
+            rows = [(h, e[0], e[1], e[2]) for h, e in self._misses.items()]
+        rows.sort(key=lambda r: (r[1], r[3]), reverse=True)
+        return rows[:limit]
+    
+    def stats(self):
+        """Statistik cache negatif"""
+        with self._lock:
+            return {
+                "cached": len(self._expires),
+                "tracked": len(self._misses),
+                "hits": self.hits,
+                "ttl_s": self.ttl_s
+            }
+
+def decode_mqtt_payload(payload):
+    """Decode payload JSON MQTT, return (data, lossy)
+    
+    lossy True jika payload bukan UTF-8 valid dan di-decode dengan latin-1
+    (semua byte diterima).
+    """
+    try:
+        return json.loads(payload.decode('utf-8')), False
+    except UnicodeDecodeError:
+        return json.loads(payload.decode('latin-1')), True
+
+# Encoding biner verify request/response ("struct1"), diiklankan di TOPIC_SYS_CONFIG.
+# Device yang memilihnya mengirim verify request biner, respons desktop mengikuti
+# encoding request. JSON tetap fallback dan dikenali dari byte pertama '{'.
+VERIFY_ENCODINGS = ("struct1", "json")
+VERIFY_MAGIC = b'VF'
+VERIFY_KIND_REQUEST = 1
+VERIFY_KIND_RESPONSE = 2
+VERIFY_SENSORS = ("FPM10A", "AS608", "ZW101")
+# Status lain (mis. error/duplikat) dikirim sebagai kode ERROR
+VERIFY_STATUSES = ("NO_MATCH", "MATCH", "ERROR")
+VERIFY_STATUS_ERROR = VERIFY_STATUSES.index("ERROR")
+# magic, kind, sensor, match_score, fingerprint_id, timestamp (millis), boot nonce, seq
+# + device (UTF-8, sisa payload)
+VERIFY_REQUEST_STRUCT = struct.Struct('<2sBBBHIII')
+# magic, kind, status, match_score, user_id, panjang nama + user_name (UTF-8, maks 32 byte)
+VERIFY_RESPONSE_STRUCT = struct.Struct('<2sBBBHB')
+VERIFY_NAME_MAX = 32
+
+def encode_verify_request(data):
+    """Encode verify request ke format struct1 (dipakai firmware dan benchmark)"""
+    sensor = data.get("sensor")
+    return VERIFY_REQUEST_STRUCT.pack(
+        VERIFY_MAGIC, VERIFY_KIND_REQUEST,
+        VERIFY_SENSORS.index(sensor) if sensor in VERIFY_SENSORS else 255,
+        max(0, min(255, int(data.get("match_score", 0)))),
+        int(data.get("fingerprint_id", 0)) & 0xFFFF,
+        int(data.get("timestamp", 0)) & 0xFFFFFFFF,
+        int(data.get("boot", 0)) & 0xFFFFFFFF,
+        int(data.get("seq", 0)) & 0xFFFFFFFF
+    ) + data.get("device", "").encode('utf-8')
+
+def encode_verify_response(response, encoding="json"):
+    """Encode verify response sesuai encoding request"""
+    if encoding != "struct1":
+        return json.dumps(response)
+    name = response.get("user_name", "").encode('utf-8')[:VERIFY_NAME_MAX]
+    status = response.get("status")
+    return VERIFY_RESPONSE_STRUCT.pack(
+        VERIFY_MAGIC, VERIFY_KIND_RESPONSE,
+        VERIFY_STATUSES.index(status) if status in VERIFY_STATUSES else VERIFY_STATUS_ERROR,
+        max(0, min(255, int(response.get("match_score", 0)))),
+        int(response.get("user_id", 0)) & 0xFFFF,
+        len(name)
+    ) + name
+
+def decode_verify_payload(payload):
+    """Decode verify request/response biner atau JSON, return (data, encoding, lossy)
+    
+    Payload struct1 yang terpotong (lebih pendek dari header) menghasilkan
+    (None, "struct1", True).
+    """
+    if payload[:2] != VERIFY_MAGIC:
+        data, lossy = decode_mqtt_payload(payload)
+        return data, "json", lossy
+    
+    kind = payload[2] if len(payload) > 2 else None
+    if kind == VERIFY_KIND_REQUEST:
+        if len(payload) < VERIFY_REQUEST_STRUCT.size:
+            return None, "struct1", True
+        _, _, sensor, score, fingerprint_id, timestamp, boot, seq = VERIFY_REQUEST_STRUCT.unpack_from(payload)
+        sensor_name = VERIFY_SENSORS[sensor] if sensor < len(VERIFY_SENSORS) else "UNKNOWN"
+        data = {
+            "fingerprint_hash": f"{sensor_name}_{fingerprint_id}",
+            "match_score": score,
+            "sensor": sensor_name,
+            "fingerprint_id": fingerprint_id,
+            "timestamp": timestamp,
+            "boot": boot,
+            "seq": seq
+        }
+        device = payload[VERIFY_REQUEST_STRUCT.size:]
+        if device:
+            data["device"] = device.decode('utf-8', 'replace')
+        return data, "struct1", False
+    if kind == VERIFY_KIND_RESPONSE:
+        if len(payload) < VERIFY_RESPONSE_STRUCT.size:
+            return None, "struct1", True
+        _, _, status, score, user_id, name_len = VERIFY_RESPONSE_STRUCT.unpack_from(payload)
+        start = VERIFY_RESPONSE_STRUCT.size
+        return {
+            "status": VERIFY_STATUSES[status] if status < len(VERIFY_STATUSES) else "UNKNOWN",
+            "user_id": user_id,
+            "user_name": payload[start:start + name_len].decode('utf-8', 'ignore'),
+            "match_score": score
+        }, "struct1", False
+    raise ValueError(f"Jenis payload verify biner tidak dikenal: {kind}")
+
+def verify_idempotency_key(data):
+    """Idempotency key verify request: device (chip ID) + nonce boot + nomor urut
+    
+    millis() reset saat reboot dan MQTT_CLIENT_ID sama di semua unit, jadi
+    request dari firmware lama tanpa boot/seq tidak diberi key (None) dan
+    presensi gandanya cukup ditekan check-in window.
+    """
+    device, boot, seq = data.get("device"), data.get("boot"), data.get("seq")
+    if not data.get("fingerprint_hash") or not device or boot is None or seq is None:
+        return None
+    return f"{device}:{boot}:{seq}"
+
+def benchmark_verify_codec(iterations=20000):
+    """Bandingkan waktu encode/decode verify request/response JSON vs struct1 (µs per operasi)"""
+    request = {"fingerprint_hash": "AS608_42", "match_score": 87, "sensor": "AS608",
+               "fingerprint_id": 42, "timestamp": 123456789, "boot": 0x5EED1234, "seq": 17,
+               "device": "24A160F3B2C8"}
+    response = {"status": "MATCH", "user_id": 42, "user_name": "Budi Santoso", "match_score": 87}
+    payloads = {"json": json.dumps(request).encode('utf-8'), "struct1": encode_verify_request(request)}
+    
+    def per_op(func):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - start) / iterations * 1e6
+    
+    results = {}
+    for encoding in VERIFY_ENCODINGS:
+        payload = payloads[encoding]
+        results[encoding] = {
+            "request_bytes": len(payload),
+            "response_bytes": len(encode_verify_response(response, encoding)),
+            "decode_request_us": per_op(lambda: decode_verify_payload(payload)),
+            "encode_response_us": per_op(lambda: encode_verify_response(response, encoding))
+        }
+    return results
+
+class TopicRoute:
+    """Satu handler terdaftar di TopicRouter beserta statistiknya"""
+    def __init__(self, pattern, handler, name=None, decode=True, log_payload=True):
+        self.pattern = pattern
+        self.handler = handler
+        self.name = name or pattern
+        self.decode = decode
+        self.log_payload = log_payload
+        self.is_pattern = '+' in pattern or '#' in pattern
+        self.messages = 0
+        self.errors = 0
+        self.total_time = 0.0  # Detik, termasuk decode
+
+class TopicRouter:
+    """Registry handler pesan MQTT berdasarkan topic
+    
+    Topic persis dicari lewat dict, pattern dengan wildcard MQTT (+/#) dicek
+    berurutan bila tidak ada yang persis. Handler dipanggil handler(msg, data);
+    data berisi payload JSON yang sudah di-decode, atau None untuk route
+    dengan decode=False (payload tidak dibutuhkan, di-decode sendiri oleh
+    handler, atau disimpan mentah dan di-decode belakangan).
+    on_decoded(route, topic, data, lossy) dipanggil setelah decode, mis.
+    untuk log debug. Exception dari handler dihitung lalu diteruskan.
+    """
+    def __init__(self, on_decoded=None):
+        self.on_decoded = on_decoded
+        self._exact = {}
+        self._patterns = []
+        self._lock = threading.Lock()
+        self.unrouted = 0
+    
+    def add(self, pattern, handler, name=None, decode=True, log_payload=True):
+        """Daftarkan handler untuk topic atau pattern, return TopicRoute"""
+        route = TopicRoute(pattern, handler, name=name, decode=decode, log_payload=log_payload)
+        if route.is_pattern:
+            self._patterns.append(route)
+        else:
+            self._exact[pattern] = route
+        return route
+    
+    def topics(self):
+        """Semua topic/pattern terdaftar (untuk subscribe)"""
+        return list(self._exact) + [route.pattern for route in self._patterns]
+    
+    def match(self, topic):
+        """Cari route untuk topic, return TopicRoute atau None"""
+        route = self._exact.get(topic)
+        if route is None:
+            for candidate in self._patterns:
+                if mqtt.topic_matches_sub(candidate.pattern, topic):
+                    return candidate
+        return route
+    
+    def route(self, msg):
+        """Jalankan handler untuk msg, return False jika tidak ada route"""
+        route = self.match(msg.topic)
+        if route is None:
+            with self._lock:
+                self.unrouted += 1
+            return False
+        
+        start = time.perf_counter()
+        failed = True
+        try:
+            data = None
+            if route.decode:
+                data, lossy = decode_mqtt_payload(msg.payload)
+                if self.on_decoded:
+                    self.on_decoded(route, msg.topic, data, lossy)
+            route.handler(msg, data)
+            failed = False
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                route.messages += 1
+                route.total_time += elapsed
+                if failed:
+                    route.errors += 1
+        return True
+    
+    def stats(self):
+        """List statistik per route (urut sesuai pendaftaran exact lalu pattern)"""
+        with self._lock:
+            return [{
+                "name": route.name,
+                "pattern": route.pattern,
+                "decode": route.decode,
+                "messages": route.messages,
+                "errors": route.errors,
+                "total_ms": route.total_time * 1000,
+                "avg_ms": (route.total_time / route.messages * 1000) if route.messages else 0.0
+            } for route in list(self._exact.values()) + self._patterns]
+
+class MqttSupervisor:
+    """Menjaga koneksi MQTT: connect ulang otomatis dengan exponential backoff + jitter
+    
+    Thread supervisor menjalankan network loop paho sendiri (pengganti
+    loop_start). Bila connect gagal atau koneksi putus, percobaan berikutnya
+    ditunggu min(max_delay, min_delay * 2^n) dikali jitter 0.5-1.0 supaya
+    banyak client tidak reconnect bersamaan. Subscribe ulang dilakukan di
+    callback on_connect aplikasi. mark_connected()/mark_disconnected()
+    dipanggil dari callback paho untuk mencatat durasi outage.
+    """
+    def __init__(self, client, host, port, keepalive=60, min_delay=1.0, max_delay=60.0, on_retry=None):
+        self.client = client
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.on_retry = on_retry
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._down_since = None
+        self._ever_connected = False
+        self.connected = False
+        
+        # Statistik
+        self.attempts = 0  # Percobaan gagal berturut-turut sejak koneksi terakhir
+        self.failed_attempts = 0
+        self.reconnects = 0
+        self.outages = 0
+        self.downtime = 0.0
+        self.last_outage = 0.0
+        self.longest_outage = 0.0
+    
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+    
+    def start(self):
+        """Start thread supervisor (connect pertama juga lewat thread ini)"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mqtt-supervisor", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=5.0):
+        """Disconnect yang disengaja: tidak dihitung outage dan tidak reconnect"""
+        self._stop.set()
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+    
+    def next_delay(self):
+        """Jeda sebelum percobaan berikutnya (detik)"""
+        delay = min(self.max_delay, self.min_delay * (2 ** min(self.attempts, 16)))
+        return delay * random.uniform(0.5, 1.0)
+    
+    def mark_connected(self):
+        """Dipanggil dari on_connect (rc == 0)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._down_since is not None:
+                outage = now - self._down_since
+                self.outages += 1
+                self.downtime += outage
+                self.last_outage = outage
+                self.longest_outage = max(self.longest_outage, outage)
+                self._down_since = None
+            if self._ever_connected:
+                self.reconnects += 1
+            self._ever_connected = True
+            self.connected = True
+            self.attempts = 0
+    
+    def mark_disconnected(self, rc):
+        """Dipanggil dari on_disconnect; rc != 0 = putus tidak disengaja"""
+        with self._lock:
+            self.connected = False
+            if rc != 0 and not self._stop.is_set() and self._down_since is None:
+                self._down_since = time.monotonic()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            error = None
+            try:
+                self.client.connect(self.host, self.port, self.keepalive)
+            except (OSError, ValueError) as e:
+                error = e
+            else:
+                # Network loop sampai koneksi putus atau stop()
+                while True:
+                    rc = self.client.loop(timeout=1.0)
+                    if rc != mqtt.MQTT_ERR_SUCCESS or self._stop.is_set():
+                        break
+                error = mqtt.error_string(rc)
+            if self._stop.is_set():
+                break
+            
+            with self._lock:
+                self.attempts += 1
+                self.failed_attempts += 1
+                if self._ever_connected and self._down_since is None:
+                    self._down_since = time.monotonic()
+            delay = self.next_delay()
+            if self.on_retry:
+                self.on_retry(delay, self.attempts, error)
+            self._stop.wait(delay)
+    
+    def stats(self):
+        """Statistik koneksi (durasi dalam detik)"""
+        with self._lock:
+            current = (time.monotonic() - self._down_since) if self._down_since is not None else 0.0
+            return {
+                "connected": self.connected,
+                "attempts": self.attempts,
+                "failed_attempts": self.failed_attempts,
+                "reconnects": self.reconnects,
+                "outages": self.outages,
+                "downtime_s": self.downtime + current,
+                "current_outage_s": current,
+                "last_outage_s": self.last_outage,
+                "longest_outage_s": self.longest_outage
+            }
+
+class OutboundSpool:
+    """Spool publish keluar di disk (append-only, per segmen) selama MQTT terputus
+    
+    Setiap pesan ditulis sebagai frame [panjang, crc32][dibuat, kedaluwarsa, qos,
+    panjang topic][topic][payload] ke segmen seg-NNNNNNNN.spool; segmen baru
+    dibuat setelah segment_bytes. drain() membaca berurutan dari cursor,
+    membuang pesan yang sudah kedaluwarsa (mis. perintah buka pintu yang basi)
+    dan menghapus segmen yang sudah habis dibaca. Cursor disimpan setelah
+    setiap drain, sehingga setelah crash paling banyak satu batch dikirim ulang.
+    Frame terpotong di ujung segmen terakhir (crash saat menulis) dibuang saat open.
+    """
+    FRAME = struct.Struct('<II')       # panjang body, crc32 body
+    RECORD = struct.Struct('<ddBH')    # dibuat, kedaluwarsa (0 = tidak ada), qos, panjang topic
+    
+    def __init__(self, directory, segment_bytes=256 * 1024):
+        self.directory = directory
+        self.segment_bytes = max(1024, int(segment_bytes))
+        self._lock = threading.Lock()
+        self._reader = None
+        self._writer = None
+        os.makedirs(directory, exist_ok=True)
+        
+        # Statistik
+        self.appended = 0
+        self.sent = 0
+        self.expired = 0
+        
+        segments = self._segments()
+        self._read_seq, self._read_offset = self._load_cursor(segments)
+        if segments and self._read_seq not in segments:
+            # Segmen cursor sudah dihapus: lanjut dari segmen pertama setelahnya
+            later = [seq for seq in segments if seq > self._read_seq]
+            self._read_seq = later[0] if later else segments[-1] + 1
+            self._read_offset = 0
+        for seq in segments:
+            if seq < self._read_seq:
+                os.remove(self._path(seq))
+        segments = [seq for seq in segments if seq >= self._read_seq]
+        
+        # Hitung pesan yang belum terkirim, potong frame rusak di segmen terakhir
+        self._pending = 0
+        for seq in segments:
+            offset = self._read_offset if seq == self._read_seq else 0
+            count, valid_end = self._scan(seq, offset)
+            self._pending += count
+            if seq == segments[-1] and valid_end < os.path.getsize(self._path(seq)):
+                with open(self._path(seq), 'r+b') as f:
+                    f.truncate(valid_end)
+        self._write_seq = segments[-1] if segments else self._read_seq
+        self._open_writer()
+    
+    def _path(self, seq):
+        return os.path.join(self.directory, f"seg-{seq:08d}.spool")
+    
+    def _segments(self):
+        return sorted(int(name[4:12]) for name in os.listdir(self.directory)
+                      if name.startswith("seg-") and name.endswith(".spool"))
+    
+    def _load_cursor(self, segments):
+        try:
+            with open(os.path.join(self.directory, "cursor"), encoding='utf-8') as f:
+                cursor = json.load(f)
+            return int(cursor["segment"]), int(cursor["offset"])
+        except (OSError, ValueError, KeyError):
+            return (segments[0] if segments else 0), 0
+    
+    def _save_cursor(self):
+        path = os.path.join(self.directory, "cursor")
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({"segment": self._read_seq, "offset": self._read_offset}, f)
+        os.replace(path + ".tmp", path)
+    
+    def _read_frame(self, f):
+        """Baca satu frame dari posisi f, return (topic, payload, qos, expires_at) atau None"""
+        header = f.read(self.FRAME.size)
+        if len(header) < self.FRAME.size:
+            return None
+        length, crc = self.FRAME.unpack(header)
+        body = f.read(length)
+        if len(body) < length or zlib.crc32(body) != crc:
+            return None
+        _, expires_at, qos, topic_len = self.RECORD.unpack_from(body)
+        start = self.RECORD.size
+        topic = body[start:start + topic_len].decode('utf-8')
+        return topic, body[start + topic_len:], qos, expires_at
+    
+    def _scan(self, seq, offset):
+        """Hitung frame valid di segmen mulai offset, return (jumlah, offset akhir valid)"""
+        count = 0
+        with open(self._path(seq), 'rb') as f:
+            f.seek(offset)
+            while self._read_frame(f) is not None:
+                count += 1
+                offset = f.tell()
+        return count, offset
+    
+    def _open_writer(self):
+        self._writer = open(self._path(self._write_seq), 'ab')
+    
+    def append(self, topic, payload, ttl_s=None, qos=0):
+        """Tambahkan pesan ke akhir spool; ttl_s None = tidak kedaluwarsa"""
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        topic_bytes = topic.encode('utf-8')
+        now = time.time()
+        body = self.RECORD.pack(now, (now + ttl_s) if ttl_s else 0.0, qos, len(topic_bytes)) + topic_bytes + payload
+        with self._lock:
+            if self._writer.tell() >= self.segment_bytes:
+                self._writer.close()
+                self._write_seq += 1
+                self._open_writer()
+            self._writer.write(self.FRAME.pack(len(body), zlib.crc32(body)) + body)
+            self._writer.flush()
+            self._pending += 1
+            self.appended += 1
+    
+    def drain(self, publish, limit):
+        """Kirim maks limit pesan berurutan lewat publish(topic, payload, qos) -> bool
+        
+        Berhenti bila publish gagal (pesan tetap di spool). Return (terkirim, kedaluwarsa).
+        """
+        sent = expired = 0
+        with self._lock:
+            now = time.time()
+            start = (self._read_seq, self._read_offset)
+            while self._pending and sent + expired < limit:
+                if self._reader is None:
+                    self._reader = open(self._path(self._read_seq), 'rb')
+                    self._reader.seek(self._read_offset)
+                record = self._read_frame(self._reader)
+                if record is None:
+                    if self._read_seq >= self._write_seq:
+                        break
+                    # Segmen habis dibaca, lanjut ke segmen berikutnya
+                    self._reader.close()
+                    self._reader = None
+                    os.remove(self._path(self._read_seq))
+                    self._read_seq += 1
+                    self._read_offset = 0
+                    continue
+                
+                topic, payload, qos, expires_at = record
+                if expires_at and expires_at < now:
+                    expired += 1
+                elif publish(topic, payload, qos):
+                    sent += 1
+                else:
+                    self._reader.seek(self._read_offset)
+                    break
+                self._read_offset = self._reader.tell()
+                self._pending -= 1
+            
+            self.sent += sent
+            self.expired += expired
+            # Simpan setiap kali cursor bergeser, termasuk pindah segmen tanpa pesan terkirim
+            if (self._read_seq, self._read_offset) != start:
+                self._save_cursor()
+        return sent, expired
+    
+    def pending(self):
+        with self._lock:
+            return self._pending
+    
+    def close(self):
+        with self._lock:
+            if self._reader:
+                self._reader.close()
+                self._reader = None
+            if self._writer:
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+                self._writer.close()
+                self._writer = None
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "appended": self.appended,
+                "sent": self.sent,
+                "expired": self.expired,
+                "segments": self._write_seq - self._read_seq + 1
+            }
+
+class MessagePipeline:
+    """Pipeline pesan MQTT: ingest -> antrian bounded -> worker thread
+    
+    Thread jaringan paho hanya memanggil submit() (tanpa decode/DB/publish),
+    sehingga commit yang lambat tidak menahan keepalive dan topic lain.
+    
+    Kebijakan backpressure saat antrian penuh: drop-oldest. Pesan tertua di
+    antrian dibuang dan dihitung di 'dropped', pesan baru tetap masuk. Verify
+    request yang sudah lama antre tidak berguna lagi karena ESP32 hanya
+    menunggu respons selama MQTT_RESPONSE_TIMEOUT (3 detik).
+    
+    Setiap worker punya antrian sendiri (maks max_size pesan) dan pesan
+    dibagi per topic, sehingga pesan satu topic diproses berurutan (mis.
+    health lama tidak menimpa yang baru). Topic berbeda tetap paralel.
+    Exception dari handler dihitung di 'errors' dan diteruskan ke on_error.
+    """
+    def __init__(self, handler, workers=2, max_size=256, name="mqtt-worker", on_error=None):
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.max_size = max(1, int(max_size))
+        self.name = name
+        self.on_error = on_error
+        self._queues = [queue.Queue(maxsize=self.max_size) for _ in range(self.workers)]
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        
+        # Statistik
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.stage_time = {"ingest": 0.0, "queue_wait": 0.0, "handle": 0.0}
+        self.stage_max = {"ingest": 0.0, "queue_wait": 0.0, "handle": 0.0}
+    
+    def start(self):
+        """Start worker threads"""
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, args=(self._queues[i],),
+                                 name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+    
+    def stop(self, timeout=2.0):
+        """Hentikan worker, pesan yang masih di antrian diabaikan"""
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+    
+    def partition(self, topic):
+        """Index antrian/worker untuk topic (stabil selama proses berjalan)"""
+        return zlib.crc32(topic.encode('utf-8')) % self.workers
+    
+    def submit(self, msg):
+        """Ingest stage - dipanggil dari thread paho, hanya enqueue"""
+        start = time.perf_counter()
+        item = (msg, start)
+        work_queue = self._queues[self.partition(msg.topic)]
+        try:
+            work_queue.put_nowait(item)
+        except queue.Full:
+            # Drop-oldest: buang pesan tertua lalu masukkan yang baru
+            try:
+                work_queue.get_nowait()
+                with self._lock:
+                    self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                work_queue.put_nowait(item)
+            except queue.Full:
+                with self._lock:
+                    self.dropped += 1
+                return False
+        
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, work_queue.qsize())
+            self._record("ingest", elapsed)
+        return True
+    
+    def _worker_loop(self, work_queue):
+        while not self._stop.is_set():
+            try:
+                msg, enqueued_at = work_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            
+            started = time.perf_counter()
+            try:
+                self.handler(msg)
+                failed = False
+            except Exception as e:
+                failed = True
+                if self.on_error:
+                    self.on_error(msg, e)
+            finished = time.perf_counter()
+            
+            with self._lock:
+                self.processed += 1
+                if failed:
+                    self.errors += 1
+                self._record("queue_wait", started - enqueued_at)
+                self._record("handle", finished - started)
+    
+    def _record(self, stage, seconds):
+        self.stage_time[stage] += seconds
+        self.stage_max[stage] = max(self.stage_max[stage], seconds)
+    
+    def depth(self):
+        return sum(work_queue.qsize() for work_queue in self._queues)
+    
+    def stats(self):
+        """Statistik antrian dan waktu per stage (ms)"""
+        with self._lock:
+            stages = {}
+            for stage, total in self.stage_time.items():
+                count = self.enqueued if stage == "ingest" else self.processed
+                stages[stage] = {
+                    "avg_ms": (total / count * 1000) if count else 0.0,
+                    "max_ms": self.stage_max[stage] * 1000
+                }
+            return {
+                "depth": self.depth(),
+                "max_depth": self.max_depth,
+                "capacity": self.max_size,
+                "workers": self.workers,
+                "enqueued": self.enqueued,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "stages": stages
+            }
+
+class LatencyTracker:
+    """Rolling window latency per stage verify request untuk p50/p95/p99
+    
+    Setiap stage menyimpan window sampel terakhir (ms); persentil dihitung
+    saat stats diminta (tiap 1 detik oleh UI), bukan di jalur verifikasi.
+    
+    Stage 'uplink' memakai timestamp device (millis sejak boot, bukan jam
+    dinding): offset = waktu terima desktop - timestamp device. Offset
+    terkecil per device dianggap delay minimum + selisih jam, sehingga
+    offset - offset_min adalah perkiraan delay sensor -> desktop di atas
+    kondisi terbaik. Offset direset bila timestamp mundur (device reboot).
+    """
+    STAGES = ("receive", "decode", "lookup", "publish", "insert", "commit", "total", "uplink")
+    
+    def __init__(self, window=1024):
+        self.window = window
+        self._samples = {stage: collections.deque(maxlen=window) for stage in self.STAGES}
+        self._counts = dict.fromkeys(self.STAGES, 0)
+        self._devices = {}  # device -> [timestamp terakhir, offset min (ms), offset terakhir (ms)]
+        self._lock = threading.Lock()
+    
+    def record(self, stage, seconds):
+        """Catat durasi stage (detik)"""
+        with self._lock:
+            self._samples[stage].append(seconds * 1000)
+            self._counts[stage] += 1
+    
+    def record_device(self, device, device_ts, received_at):
+        """Catat timestamp device (ms) terhadap waktu terima desktop (epoch detik)"""
+        offset = received_at * 1000 - device_ts
+        with self._lock:
+            state = self._devices.get(device)
+            if state is None or device_ts < state[0]:
+                state = [device_ts, offset, offset]
+                self._devices[device] = state
+            state[0] = device_ts
+            state[1] = min(state[1], offset)
+            state[2] = offset
+            self._samples["uplink"].append(offset - state[1])
+            self._counts["uplink"] += 1
+    
+    @staticmethod
+    def _percentile(ordered, pct):
+        # Nearest-rank: rank = ceil(p/100 * n); round() (banker's rounding) salah untuk n ganjil
+        index = max(0, int(-(-pct * len(ordered) // 100)) - 1)
+        return ordered[min(index, len(ordered) - 1)]
+    
+    def stats(self):
+        """Dict stage -> {count, p50, p95, p99} (ms) dan offset per device"""
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+            counts = dict(self._counts)
+            devices = {device: {"offset_ms": state[2], "min_offset_ms": state[1]}
+                       for device, state in self._devices.items()}
+        stages = {}
+        for stage in self.STAGES:
+            ordered = sorted(samples[stage])
+            stages[stage] = {
+                "count": counts[stage],
+                "p50": self._percentile(ordered, 50) if ordered else None,
+                "p95": self._percentile(ordered, 95) if ordered else None,
+                "p99": self._percentile(ordered, 99) if ordered else None
+            }
+        return {"stages": stages, "devices": devices}
+
+class SQLitePool:
+    """Pool koneksi SQLite: koneksi baca per-thread + satu koneksi writer
+    
+    Setiap thread (Tk, worker pipeline, writer) mendapat koneksi baca sendiri,
+    sehingga query UI dan verifikasi bisa berjalan bersamaan (WAL) tanpa
+    berbagi cursor. Semua penulisan lewat writer() yang dijaga lock.
+    """
+    def __init__(self, db_path, profile=DEFAULT_DB_PROFILE, timeout=5.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.profile = profile
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._readers = []  # (thread, connection)
+        self._generation = 0
+        self._writer_lock = threading.RLock()
+        self._writer = self._connect()
+        self.profile_effective = apply_db_profile(self._writer, profile)
+    
+    def _connect(self):
+        # check_same_thread=False hanya supaya close() bisa dipanggil dari thread lain,
+        # setiap koneksi baca tetap dipakai oleh satu thread saja
+        return sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+    
+    def reader(self):
+        """Koneksi baca milik thread saat ini"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            with self._lock:
+                self._prune_readers()
+                self._readers.append((threading.current_thread(), conn))
+            self._local.conn = conn
+            self._local.generation = -1
+        if self._local.generation != self._generation:
+            apply_db_profile(conn, self.profile, reader=True)
+            self._local.generation = self._generation
+        return conn
+    
+    def _prune_readers(self):
+        """Tutup koneksi milik thread yang sudah berhenti (mis. worker lama)"""
+        alive = []
+        for thread, conn in self._readers:
+            if thread.is_alive():
+                alive.append((thread, conn))
+            else:
+                conn.close()
+        self._readers = alive
+    
+    def query(self, sql, params=()):
+        """SELECT lewat koneksi baca thread ini, return semua row"""
+        return self.reader().execute(sql, params).fetchall()
+    
+    def query_one(self, sql, params=()):
+        """SELECT lewat koneksi baca thread ini, return satu row atau None"""
+        return self.reader().execute(sql, params).fetchone()
+    
+    @contextlib.contextmanager
+    def writer(self):
+        """Akses eksklusif koneksi writer, commit otomatis (rollback jika error)"""
+        with self._writer_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+    
+    def set_profile(self, profile):
+        """Terapkan profil ke writer, koneksi baca menyusul saat dipakai berikutnya"""
+        with self._writer_lock:
+            effective = apply_db_profile(self._writer, profile)
+        with self._lock:
+            self.profile = profile
+            self.profile_effective = effective
+            self._generation += 1
+        return effective
+    
+    def close(self):
+        """Tutup semua koneksi"""
+        with self._lock:
+            for thread, conn in self._readers:
+                conn.close()
+            self._readers = []
+        with self._writer_lock:
+            self._writer.close()
+
+class ResponseCache:
+    """Map bounded (LRU) idempotency key verify request -> payload respons terkirim
+    
+    Dengan QoS >= 1 broker bisa mengirim ulang pesan yang sama. Key baru
+    dicatat setelah respons dipublish, sehingga request duplikat dijawab
+    ulang dengan respons yang sama tanpa lookup/tulis ulang; key yang sudah
+    tergeser dari cache tetap ditolak unique index idempotency_key di database.
+    """
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._responses = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.duplicates = 0
+    
+    def get(self, key):
+        """Payload respons untuk key yang sudah dijawab, atau None"""
+        with self._lock:
+            payload = self._responses.get(key)
+            if payload is not None:
+                self._responses.move_to_end(key)
+                self.duplicates += 1
+            return payload
+    
+    def put(self, key, payload):
+        """Catat respons yang sudah dipublish untuk key"""
+        with self._lock:
+            self._responses[key] = payload
+            self._responses.move_to_end(key)
+            if len(self._responses) > self.max_entries:
+                self._responses.popitem(last=False)
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._responses)
+
+class CheckinWindow:
+    """Map resident user_id -> waktu check-in terakhir untuk menekan presensi ganda
+    
+    Scan berulang dari user yang sama dalam window_s detik tetap dijawab
+    MATCH, tapi tidak ditulis lagi ke attendance_logs. slot() memberi nomor
+    jendela (epoch // window_s) yang disimpan di kolom checkin_slot dengan
+    unique index (user_id, checkin_slot), sehingga retry atau restart
+    aplikasi tetap idempotent di level database.
+    """
+    def __init__(self, window_s=60):
+        self.window_s = window_s
+        self._last_seen = {}
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.suppressed = 0
+    
+    def slot(self, ts):
+        """Nomor jendela untuk timestamp epoch ts (None jika window nonaktif)"""
+        if self.window_s <= 0:
+            return None
+        return int(ts // self.window_s)
+    
+    def admit(self, user_id, ts):
+        """True jika check-in user pada ts perlu dicatat, False jika masih dalam jendela"""
+        with self._lock:
+            if self.window_s > 0:
+                last = self._last_seen.get(user_id)
+                if last is not None and 0 <= ts - last < self.window_s:
+                    self.suppressed += 1
+                    return False
+            self._last_seen[user_id] = ts
+            self.admitted += 1
+            return True
+    
+    def seed(self, rows):
+        """Isi map dari rows (user_id, epoch) check-in terakhir di database"""
+        with self._lock:
+            for user_id, ts in rows:
+                if ts is not None and ts > self._last_seen.get(user_id, float('-inf')):
+                    self._last_seen[user_id] = ts
+    
+    def forget(self, user_id):
+        """Hapus user dari map (user dihapus)"""
+        with self._lock:
+            self._last_seen.pop(user_id, None)
+    
+    def set_window(self, window_s):
+        with self._lock:
+            self.window_s = window_s
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "window_s": self.window_s,
+                "users": len(self._last_seen),
+                "admitted": self.admitted,
+                "suppressed": self.suppressed
+            }
+
+class AttendanceWriter:
+    """Group-commit writer untuk tabel attendance_logs
+    
+    Row presensi dikumpulkan di antrian lalu ditulis dengan executemany dan
+    di-commit setiap batch_size row atau setiap max_delay_ms (mana yang lebih
+    dulu). max_delay_ms sekaligus batas maksimum jendela data yang bisa hilang
+    bila aplikasi crash sebelum commit.
+    
+    Row yang bentrok dengan unique index (user_id, checkin_slot) atau
+    idempotency_key diabaikan (INSERT OR IGNORE) dan dihitung di rows_ignored.
+    """
+    INSERT_SQL = ('INSERT OR IGNORE INTO attendance_logs '
+                  '(user_id, user_name, check_in_time, match_score, fingerprint_hash, checkin_slot, idempotency_key) '
+                  'VALUES (?, ?, ?, ?, ?, ?, ?)')
+    
+    def __init__(self, pool, batch_size=32, max_delay_ms=200, on_commit=None, on_error=None, latency=None):
+        self.pool = pool
+        self.batch_size = max(1, int(batch_size))
+        self.max_delay_ms = max(1, int(max_delay_ms))
+        self.on_commit = on_commit
+        self.on_error = on_error
+        self.latency = latency  # LatencyTracker opsional, stage 'commit' = submit -> commit
+        self._queue = queue.Queue()
+        self._submitted = collections.deque()  # Waktu submit (FIFO, urutan sama dengan row)
+        self._thread = None
+        self._lock = threading.Lock()
+        
+        # Statistik
+        self.rows_written = 0
+        self.rows_ignored = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.commit_time = 0.0
+        self.last_commit_ms = 0.0
+    
+    def start(self):
+        """Start writer thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, row):
+        """Antrekan row (user_id, user_name, check_in_time, match_score, fingerprint_hash,
+        checkin_slot, idempotency_key)"""
+        self._submitted.append(time.perf_counter())
+        self._queue.put(("row", row))
+    
+    def flush(self, timeout=5.0):
+        """Paksa commit semua row yang tertunda dan tunggu sampai selesai"""
+        if not (self._thread and self._thread.is_alive()):
+            return False
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+    
+    def stop(self, timeout=5.0):
+        """Flush lalu hentikan writer (dipanggil saat aplikasi ditutup)"""
+        if not (self._thread and self._thread.is_alive()):
+            return
+        done = threading.Event()
+        self._queue.put(("stop", done))
+        done.wait(timeout)
+        self._thread.join(timeout)
+    
+    def pending(self):
+        return self._queue.qsize()
+    
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            if pending:
+                wait = max(0.0, deadline - time.monotonic())
+            else:
+                wait = None
+            try:
+                kind, value = self._queue.get(timeout=wait)
+            except queue.Empty:
+                kind, value = None, None
+            
+            if kind == "row":
+                if not pending:
+                    deadline = time.monotonic() + self.max_delay_ms / 1000
+                pending.append(value)
+                if len(pending) < self.batch_size and time.monotonic() < deadline:
+                    continue
+            waiters = []
+            stopping = False
+            if kind in ("flush", "stop"):
+                waiters.append(value)
+                stopping = (kind == "stop")
+                # Ambil semua row yang sudah antre sebelum flush
+                while True:
+                    try:
+                        k, v = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if k == "row":
+                        pending.append(v)
+                    else:
+                        waiters.append(v)
+                        stopping = stopping or (k == "stop")
+            
+            if pending:
+                pending = self._write_batch(pending)
+                deadline = time.monotonic() + self.max_delay_ms / 1000
+            
+            for done in waiters:
+                done.set()
+            if stopping:
+                break
+    
+    def _write_batch(self, rows):
+        """Tulis satu batch, return row yang gagal (untuk dicoba lagi)"""
+        start = time.perf_counter()
+        try:
+            with self.pool.writer() as conn:
+                inserted = conn.executemany(self.INSERT_SQL, rows).rowcount
+        except sqlite3.Error as e:
+            with self._lock:
+                self.failed_batches += 1
+            if self.on_error:
+                self.on_error(e, len(rows))
+            return rows
+        finished = time.perf_counter()
+        elapsed = finished - start
+        
+        for _ in rows:
+            try:
+                submitted = self._submitted.popleft()
+            except IndexError:
+                break
+            if self.latency:
+                self.latency.record("commit", finished - submitted)
+        
+        with self._lock:
+            self.rows_written += inserted
+            self.rows_ignored += len(rows) - inserted
+            self.batches += 1
+            self.commit_time += elapsed
+            self.last_commit_ms = elapsed * 1000
+        if self.on_commit and inserted:
+            self.on_commit(rows)
+        return []
+    
+    def stats(self):
+        """Statistik writer"""
+        with self._lock:
+            return {
+                "pending": self._queue.qsize(),
+                "rows_written": self.rows_written,
+                "rows_ignored": self.rows_ignored,
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "avg_batch": (self.rows_written / self.batches) if self.batches else 0.0,
+                "avg_commit_ms": (self.commit_time / self.batches * 1000) if self.batches else 0.0,
+                "last_commit_ms": self.last_commit_ms
+            }
+
+class TelemetryStore:
+    """Store latest-value-wins untuk telemetry ESP32 (sensor/metrics, system/health)
+    
+    Handler MQTT hanya menimpa nilai terakhir per key lewat put(); UI mengambil
+    key yang berubah dengan take_changed() pada interval tetap. Burst pesan
+    telemetry (mis. setelah reconnect) hanya menghasilkan satu update UI per
+    interval, sisanya terhitung sebagai 'superseded'.
+    """
+    def __init__(self):
+        self._values = {}  # key -> (seq, value)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.updates = 0
+        self.applied = 0
+    
+    def put(self, key, value):
+        """Simpan nilai terbaru untuk key"""
+        with self._lock:
+            self._seq += 1
+            self._values[key] = (self._seq, value)
+            self.updates += 1
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._values.get(key)
+        return entry[1] if entry else default
+    
+    def take_changed(self, since):
+        """Return (seq, {key: value}) untuk key yang berubah setelah seq since"""
+        with self._lock:
+            changed = {key: value for key, (seq, value) in self._values.items() if seq > since}
+            self.applied += len(changed)
+            return self._seq, changed
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "keys": len(self._values),
+                "updates": self.updates,
+                "applied": self.applied,
+                "superseded": self.updates - self.applied
+            }
+
+class UiDispatcher:
+    """Antrian update UI thread-safe yang di-drain oleh Tk setiap interval_ms
+    
+    Thread lain tidak menyentuh widget: call() mengantrekan fungsi untuk
+    dijalankan di thread Tk (urutan terjaga), refresh() mengantrekan refresh
+    yang digabung - berapapun jumlah permintaan dalam satu tick, fungsi yang
+    sama hanya dijalankan sekali di akhir tick. Exception dari fungsi yang
+    dijalankan dihitung lalu dilaporkan ke on_error(func, error).
+    """
+    def __init__(self, root, interval_ms=50, max_calls_per_tick=200, on_error=None):
+        self.root = root
+        self.on_error = on_error
+        self.interval_ms = max(1, int(interval_ms))
+        self.max_calls_per_tick = max(1, int(max_calls_per_tick))
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._refresh_pending = {}  # func -> None, dict supaya urutan tetap
+        self._thread_id = threading.get_ident()
+        self._running = False
+        
+        # Statistik
+        self.calls = 0
+        self.refreshes = 0
+        self.coalesced = 0
+        self.ticks = 0
+        self.errors = 0
+    
+    def start(self):
+        """Mulai tick (dipanggil dari thread Tk)"""
+        self._thread_id = threading.get_ident()
+        if not self._running:
+            self._running = True
+            self.root.after(self.interval_ms, self._tick)
+    
+    def stop(self):
+        self._running = False
+    
+    def on_ui_thread(self):
+        return threading.get_ident() == self._thread_id
+    
+    def call(self, func, *args, **kwargs):
+        """Jalankan func(*args, **kwargs) di thread Tk pada tick berikutnya"""
+        self._queue.put((func, args, kwargs))
+    
+    def refresh(self, func):
+        """Minta func() dijalankan di tick berikutnya, permintaan ganda digabung"""
+        with self._lock:
+            if func in self._refresh_pending:
+                self.coalesced += 1
+            else:
+                self._refresh_pending[func] = None
+    
+    def _run(self, func, args=(), kwargs=None):
+        try:
+            func(*args, **(kwargs or {}))
+        except Exception as e:
+            self.errors += 1
+            if self.on_error:
+                self.on_error(func, e)
+            else:
+                logging.getLogger('verifynger').error(
+                    f"UI update error in {getattr(func, '__name__', func)}: {e}", exc_info=True)
+    
+    def _tick(self):
+        if not self._running:
+            return
+        self.ticks += 1
+        for _ in range(self.max_calls_per_tick):
+            try:
+                func, args, kwargs = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self.calls += 1
+            self._run(func, args, kwargs)
+        
+        with self._lock:
+            pending = list(self._refresh_pending)
+            self._refresh_pending.clear()
+        for func in pending:
+            self.refreshes += 1
+            self._run(func)
+        self.root.after(self.interval_ms, self._tick)
+    
+    def stats(self):
+        """Statistik dispatcher"""
+        with self._lock:
+            pending_refresh = len(self._refresh_pending)
+        return {
+            "queued": self._queue.qsize(),
+            "pending_refresh": pending_refresh,
+            "calls": self.calls,
+            "refreshes": self.refreshes,
+            "coalesced": self.coalesced,
+            "ticks": self.ticks,
+            "errors": self.errors
+        }
+
+class ActivityLog:
+    """Activity log dengan ring buffer dan penulisan file di background
+    
+    Baris baru masuk ke ring buffer (maks max_lines) dan antrian pending;
+    widget diisi per batch oleh drain() di tick UI dan dipangkas ke max_lines,
+    jadi ukuran widget tetap terbatas. Riwayat lengkap ditulis ke file
+    rotating oleh QueueListener di thread terpisah.
+    """
+    LEVELS = {
+        "DEBUG": logging.DEBUG,
+        "INFO": logging.INFO,
+        "WARNING": logging.WARNING,
+        "ERROR": logging.ERROR
+    }
+    
+    def __init__(self, max_lines=1000, level=logging.INFO, file_path='verifynger.log',
+                 file_level=logging.INFO, max_bytes=5 * 1024 * 1024, backup_count=5):
+        self.max_lines = max(1, int(max_lines))
+        self.level = level
+        self.file_level = file_level
+        self._lock = threading.Lock()
+        self._lines = collections.deque(maxlen=self.max_lines)  # (level, text)
+        self._pending = []
+        self._rerender = False
+        
+        # File log: logger -> QueueHandler -> QueueListener (thread) -> RotatingFileHandler
+        self.logger = logging.getLogger('verifynger')
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        self._file_handler = RotatingFileHandler(file_path, maxBytes=max_bytes,
+                                                 backupCount=backup_count, encoding='utf-8')
+        self._file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)-7s %(message)s'))
+        self._file_handler.setLevel(file_level)
+        log_queue = queue.Queue()
+        self._queue_handler = QueueHandler(log_queue)
+        self.logger.addHandler(self._queue_handler)
+        self._listener = QueueListener(log_queue, self._file_handler, respect_handler_level=True)
+        self._listener.start()
+    
+    def is_enabled_for(self, level):
+        """True jika level ini ditampilkan atau ditulis ke file"""
+        return level >= min(self.level, self.file_level)
+    
+    def add(self, message, level=logging.INFO, exc_info=False):
+        """Tambah satu baris (thread-safe), exc_info=True menulis traceback ke file log"""
+        if not self.is_enabled_for(level):
+            return
+        if level >= self.file_level:
+            self.logger.log(level, message, exc_info=exc_info)
+        text = f"[{datetime.now().strftime('%H:%M:%S')}] {message}"
+        with self._lock:
+            self._lines.append((level, text))
+            if level >= self.level:
+                self._pending.append(text)
+                if len(self._pending) > self.max_lines:
+                    del self._pending[:-self.max_lines]
+    
+    def set_level(self, level):
+        """Ganti filter level tampilan, widget dibangun ulang dari ring buffer"""
+        with self._lock:
+            self.level = level
+            self._rerender = True
+    
+    def set_max_lines(self, max_lines):
+        with self._lock:
+            self.max_lines = max(1, int(max_lines))
+            self._lines = collections.deque(self._lines, maxlen=self.max_lines)
+            self._rerender = True
+    
+    def drain(self, widget):
+        """Masukkan baris pending ke widget dalam satu insert (dipanggil dari thread Tk)"""
+        with self._lock:
+            if self._rerender:
+                lines = [text for level, text in self._lines if level >= self.level]
+                self._rerender = False
+                widget.delete("1.0", "end")
+            else:
+                lines = self._pending
+            self._pending = []
+        if not lines:
+            return
+        widget.insert("end", "\n".join(lines) + "\n")
+        
+        # Pangkas baris terlama di luar batas
+        line_count = int(widget.index("end-1c").split(".")[0]) - 1
+        excess = line_count - self.max_lines
+        if excess > 0:
+            widget.delete("1.0", f"{excess + 1}.0")
+        widget.see("end")
+    
+    def close(self):
+        """Stop listener (flush sisa record ke file)"""
+        self._listener.stop()
+        self.logger.removeHandler(self._queue_handler)
+        self._file_handler.close()
+
+class LogPager:
+    """Keyset pagination untuk attendance_logs
+    
+    Halaman diambil berdasarkan kunci (check_in_time, log_id), bukan OFFSET,
+    sehingga biaya satu halaman tetap sama di posisi manapun dalam riwayat.
+    log_id adalah rowid, jadi idx_attendance_time sudah terurut per
+    (check_in_time, log_id) tanpa index tambahan. Filter opsional berupa
+    potongan WHERE.
+    
+    Jumlah row per filter di-cache bersama log_id terakhir yang sudah
+    dihitung: COUNT(*) penuh hanya sekali per filter, reload berikutnya cukup
+    menghitung row baru lewat rentang log_id (rowid).
+    """
+    COLUMNS = 'log_id, user_id, user_name, check_in_time, match_score, fingerprint_hash'
+    
+    def __init__(self, db, page_size=200):
+        self.db = db
+        self.page_size = max(1, int(page_size))
+        self.where = ''
+        self.params = []
+        self._counts = collections.OrderedDict()  # (where, params) -> (jumlah, log_id terakhir)
+        self.max_cached_counts = 16
+    
+    def set_filter(self, where='', params=()):
+        """Set filter aktif (potongan WHERE tanpa kata WHERE)"""
+        self.where = where
+        self.params = list(params)
+    
+    @staticmethod
+    def key(row):
+        """Kunci keyset sebuah row: (check_in_time, log_id)"""
+        return (row[3], row[0])
+    
+    def build_query(self, key_op=None, key=None, descending=True):
+        """Susun SELECT satu halaman, return (sql, params)"""
+        clauses = []
+        params = []
+        if self.where:
+            clauses.append(f'({self.where})')
+            params.extend(self.params)
+        if key_op:
+            clauses.append(f'(check_in_time, log_id) {key_op} (?, ?)')
+            params.extend(key)
+        order = 'DESC' if descending else 'ASC'
+        sql = f'SELECT {self.COLUMNS} FROM attendance_logs'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += f' ORDER BY check_in_time {order}, log_id {order} LIMIT ?'
+        params.append(self.page_size)
+        return sql, params
+    
+    def first_page(self):
+        """Halaman terbaru"""
+        return self.db.query(*self.build_query())
+    
+    def older(self, key):
+        """Halaman berikutnya yang lebih lama dari key (urut terbaru dulu)"""
+        return self.db.query(*self.build_query('<', key))
+    
+    def newer(self, key):
+        """Halaman yang lebih baru dari key (urut terbaru dulu)"""
+        rows = self.db.query(*self.build_query('>', key, descending=False))
+        rows.reverse()
+        return rows
+    
+    def since(self, log_id, limit):
+        """Row baru dengan log_id > log_id sesuai filter aktif (urut terbaru dulu)"""
+        sql = f'SELECT {self.COLUMNS} FROM attendance_logs WHERE log_id > ?'
+        params = [log_id]
+        if self.where:
+            sql += f' AND ({self.where})'
+            params.extend(self.params)
+        sql += ' ORDER BY check_in_time DESC, log_id DESC LIMIT ?'
+        params.append(limit)
+        return self.db.query(sql, params)
+    
+    def max_log_id(self):
+        """log_id terbesar di tabel (tanpa filter)"""
+        return self.db.query_one('SELECT MAX(log_id) FROM attendance_logs')[0] or 0
+    
+    def _count_where(self, clause, params):
+        sql = f'SELECT COUNT(*) FROM attendance_logs WHERE {clause}'
+        if self.where:
+            sql += f' AND ({self.where})'
+        return self.db.query_one(sql, list(params) + self.params)[0]
+    
+    def count(self, max_log_id):
+        """Jumlah row sesuai filter aktif dengan log_id <= max_log_id"""
+        key = (self.where, tuple(self.params))
+        cached = self._counts.get(key)
+        if cached is None or cached[1] > max_log_id:
+            total = self._count_where('log_id <= ?', [max_log_id])
+        else:
+            total, counted_id = cached
+            if max_log_id > counted_id:
+                total += self._count_where('log_id > ? AND log_id <= ?', [counted_id, max_log_id])
+        self.seed_count(total, max_log_id)
+        return total
+    
+    def seed_count(self, total, max_log_id):
+        """Catat jumlah row filter aktif yang sudah diketahui (mis. halaman pertama tidak penuh)"""
+        key = (self.where, tuple(self.params))
+        self._counts[key] = (total, max_log_id)
+        self._counts.move_to_end(key)
+        while len(self._counts) > self.max_cached_counts:
+            self._counts.popitem(last=False)
+    
+    def invalidate_counts(self):
+        """Buang cache jumlah row (setelah row dihapus)"""
+        self._counts.clear()
+
 class AttendanceApp:
     def __init__(self, root):
         self.root = root
@@ -147,6 +1852,56 @@ class AttendanceApp:
         self.mqtt_client = None
         self.is_connected = False
         
+        # Reconnect otomatis: backoff eksponensial antara mqtt_backoff_min_s dan mqtt_backoff_max_s
+        self.mqtt_supervisor = None
+        self.mqtt_backoff_min_s = 1.0
+        self.mqtt_backoff_max_s = 60.0
+        
+        # Spool publish keluar di disk selama putus, dikirim ulang maks spool_drain_rate pesan/detik
+        self.outbound_spool = OutboundSpool('outbound_spool')
+        self.spool_drain_rate = 20
+        self.spool_drain_thread = None
+        self.spool_drain_lock = threading.Lock()
+        
+        # Semua update widget dari thread lain lewat dispatcher ini (di-drain tiap ui_tick_ms)
+        self.ui_tick_ms = 50
+        self.ui = UiDispatcher(self.root, interval_ms=self.ui_tick_ms, on_error=self.on_ui_error)
+        
+        # Telemetry ESP32 (metrics/health): nilai terakhir saja, di-sample UI tiap telemetry_sample_ms
+        self.telemetry = TelemetryStore()
+        self.telemetry_seq = 0
+        self.telemetry_sample_ms = 1000
+        
+        # Activity log: maks log_max_lines baris di widget, riwayat lengkap di verifynger.log
+        self.log_max_lines = 1000
+        self.activity_log = ActivityLog(max_lines=self.log_max_lines)
+        
+        # Pipeline pemrosesan pesan MQTT (ingest -> antrian -> worker)
+        self.pipeline = None
+        self.pipeline_workers = 2
+        self.pipeline_queue_size = 256
+        
+        # Group-commit writer attendance_logs
+        # writer_max_delay_ms = jendela maksimum log presensi yang bisa hilang saat crash
+        self.attendance_writer = None
+        self.writer_batch_size = 32
+        self.writer_max_delay_ms = 200
+        
+        # Jendela penekan presensi ganda per user (detik, 0 = nonaktif)
+        self.checkin_window_s = 60
+        self.checkin_window = CheckinWindow(self.checkin_window_s)
+        
+        # Idempotency key verify request yang sudah diproses (redelivery QoS >= 1)
+        self.verify_responses = ResponseCache(max_entries=4096)
+        
+        # Latency per stage verify request (p50/p95/p99)
+        self.verify_latency = LatencyTracker(window=1024)
+        
+        # Log view: halaman keyset, hanya log_window_pages halaman yang ada di log_tree
+        self.log_page_size = 200
+        self.log_window_pages = 3
+        self.log_page_pending = False
+        
         # MQTT Topics
         # MQTT Topics - Must match ESP32 Config.h
         self.TOPIC_CMD_MODE = "verifynger/command/mode"
@@ -163,9 +1918,35 @@ class AttendanceApp:
         
         self.TOPIC_SYS_HEALTH = "verifynger/system/health"
         self.TOPIC_SYS_CONFIG = "verifynger/system/config"
+        
+        # Encoding verify yang diiklankan ke device dan encoding terakhir per device
+        # Default JSON: firmware saat ini belum mengirim struct1
+        self.verify_encoding = "json"
+        self.device_encodings = {}
         self.TOPIC_SENSOR_METRICS = "verifynger/sensor/metrics"
         
+        # Router topic -> handler untuk pesan MQTT masuk
+        self.setup_mqtt_routes()
+        
+        # Umur maksimum pesan keluar di spool (detik); respons verify ditunggu ESP32 maks 3 detik
+        self.spool_ttl = {
+            self.TOPIC_VERIFY_RESPONSE: 3,
+            self.TOPIC_CMD_RELAY: 5,
+            self.TOPIC_CMD_MODE: 30,
+            self.TOPIC_CMD_SENSOR: 30,
+            self.TOPIC_CMD_ENROLL: 60
+        }
+        
         self.users = {}
+        self.metrics_lock = threading.Lock()
+        
+        # Index fingerprint_hash -> user untuk jalur verifikasi
+        self.user_index = UserIndex()
+        
+        # Cache negatif untuk hash yang tidak terdaftar (slot sensor yatim)
+        self.negative_cache_ttl = 60.0
+        self.negative_cache = NegativeCache(ttl_s=self.negative_cache_ttl)
+        self.negative_cache_shown = -1
         
         # Sensor tracking
         self.active_sensor = "FPM10A"  # Default sensor
@@ -210,9 +1991,21 @@ class AttendanceApp:
         
         # Setup UI
         self.setup_ui()
+        self.ui.start()
         
         # Load settings
         self.load_settings()
+        self.load_recent_checkins()
+        self.sample_telemetry()
+        
+        # Start group-commit writer untuk attendance_logs
+        self.attendance_writer = AttendanceWriter(self.db,
+                                                  batch_size=self.writer_batch_size,
+                                                  max_delay_ms=self.writer_max_delay_ms,
+                                                  on_commit=self.on_attendance_committed,
+                                                  on_error=self.on_attendance_write_error,
+                                                  latency=self.verify_latency)
+        self.attendance_writer.start()
     
     def setup_theme(self):
         """Setup tema warna ungu muda yang menarik"""
@@ -346,12 +2139,26 @@ class AttendanceApp:
     
     def init_database(self):
         """Inisialisasi database SQLite"""
-        self.conn = sqlite3.connect('attendance.db', check_same_thread=False)
-        self.cursor = self.conn.cursor()
+        # Pool koneksi: koneksi baca per-thread + satu koneksi writer
+        self.db = SQLitePool('attendance.db')
+        
+        # Terapkan profil performa SQLite (WAL, synchronous, cache, mmap, dll)
+        self.db_profile = self.read_db_profile_setting()
+        self.db_profile_effective = self.db.set_profile(self.db_profile)
+        print(f"✓ SQLite profile {describe_db_profile(self.db_profile, self.db_profile_effective)}")
+        
+        with self.db.writer() as conn:
+            self.create_schema(conn)
+        self.log_pager = LogPager(self.db, page_size=self.log_page_size)
+        self.load_users_from_db()
+    
+    def create_schema(self, conn):
+        """Buat/migrasi tabel (dijalankan di koneksi writer)"""
+        cursor = conn.cursor()
         
         # Check if users table migration is needed (old schema with 'id' column)
-        self.cursor.execute("PRAGMA table_info(users)")
-        columns = [col[1] for col in self.cursor.fetchall()]
+        cursor.execute("PRAGMA table_info(users)")
+        columns = [col[1] for col in cursor.fetchall()]
         
         needs_migration = False
         old_users = []
@@ -360,17 +2167,17 @@ class AttendanceApp:
             print("⚠️ Old database schema detected. Migrating to new schema...")
             
             # Backup old data
-            self.cursor.execute('SELECT * FROM users')
-            old_users = self.cursor.fetchall()
+            cursor.execute('SELECT * FROM users')
+            old_users = cursor.fetchall()
             
             # Drop old table
-            self.cursor.execute('DROP TABLE IF EXISTS users')
-            self.conn.commit()
+            cursor.execute('DROP TABLE IF EXISTS users')
+            conn.commit()
             
             print(f"✓ Backed up {len(old_users)} users")
         
         # Tabel users - template berisi hash dari (fingerprint_id + sensor_name)
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
                 id_user INTEGER PRIMARY KEY,
                 name TEXT NOT NULL,
@@ -399,19 +2206,19 @@ class AttendanceApp:
                     else:
                         fingerprint_hash = "UNKNOWN_0"  # Fallback for old data
                     
-                    self.cursor.execute('''
+                    cursor.execute('''
                         INSERT INTO users (id_user, name, email, position, fingerprint_template, created_at, updated_at)
                         VALUES (?, ?, ?, ?, ?, ?, ?)
                     ''', (user[0], user[1], user[2], user[3], fingerprint_hash, 
                          user[5] if len(user) > 5 else None, user[6] if len(user) > 6 else None))
                 except Exception as e:
                     print(f"⚠️ Error restoring user {user[1]}: {e}")
-            self.conn.commit()
+            conn.commit()
             print(f"✓ Migration completed. {len(old_users)} users restored.")
         
         # Check if attendance_logs table needs migration (has 'location' column)
-        self.cursor.execute("PRAGMA table_info(attendance_logs)")
-        log_columns = [col[1] for col in self.cursor.fetchall()]
+        cursor.execute("PRAGMA table_info(attendance_logs)")
+        log_columns = [col[1] for col in cursor.fetchall()]
         
         needs_log_migration = False
         old_logs = []
@@ -420,17 +2227,17 @@ class AttendanceApp:
             print("⚠️ Old attendance_logs schema detected. Migrating...")
             
             # Backup old logs
-            self.cursor.execute('SELECT * FROM attendance_logs')
-            old_logs = self.cursor.fetchall()
+            cursor.execute('SELECT * FROM attendance_logs')
+            old_logs = cursor.fetchall()
             
             # Drop old table
-            self.cursor.execute('DROP TABLE IF EXISTS attendance_logs')
-            self.conn.commit()
+            cursor.execute('DROP TABLE IF EXISTS attendance_logs')
+            conn.commit()
             
             print(f"✓ Backed up {len(old_logs)} attendance logs")
         
         # Tabel attendance logs
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS attendance_logs (
                 log_id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL,
@@ -451,17 +2258,17 @@ class AttendanceApp:
                     # Map old location to fingerprint_hash (use placeholder if needed)
                     fp_hash = log[5] if len(log) > 5 else "MIGRATED_UNKNOWN"
                     
-                    self.cursor.execute('''
+                    cursor.execute('''
                         INSERT INTO attendance_logs (log_id, user_id, user_name, check_in_time, match_score, fingerprint_hash)
                         VALUES (?, ?, ?, ?, ?, ?)
                     ''', (log[0], log[1], log[2], log[3], log[4], fp_hash))
                 except Exception as e:
                     print(f"⚠️ Error restoring log {log[0]}: {e}")
-            self.conn.commit()
+            conn.commit()
             print(f"✓ Attendance logs migration completed. {len(old_logs)} logs restored.")
         
         # Tabel settings
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS settings (
                 key TEXT PRIMARY KEY,
                 value TEXT NOT NULL,
@@ -469,23 +2276,81 @@ class AttendanceApp:
             )
         ''')
         
+        # Simpan nama profil SQLite yang aktif
+        cursor.execute('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)',
+                       ('db_profile', self.db_profile))
+        
+        # Kolom checkin_slot (jendela presensi) dan idempotency_key untuk database lama
+        cursor.execute("PRAGMA table_info(attendance_logs)")
+        log_columns = [col[1] for col in cursor.fetchall()]
+        if 'checkin_slot' not in log_columns:
+            cursor.execute('ALTER TABLE attendance_logs ADD COLUMN checkin_slot INTEGER')
+        if 'idempotency_key' not in log_columns:
+            cursor.execute('ALTER TABLE attendance_logs ADD COLUMN idempotency_key TEXT')
+        
         # Index
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_user_id ON attendance_logs(user_id)')
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_time ON attendance_logs(check_in_time)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_user_id ON attendance_logs(user_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_time ON attendance_logs(check_in_time)')
+        # Satu presensi per user per jendela; row lama (checkin_slot NULL) tidak dibatasi
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_checkin_slot '
+                       'ON attendance_logs(user_id, checkin_slot)')
+        # Verify request yang dikirim ulang (device + timestamp + hash sama) tidak ditulis dua kali
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_idempotency_key '
+                       'ON attendance_logs(idempotency_key)')
+    
+    def load_recent_checkins(self):
+        """Isi checkin_window dari presensi terakhir yang masih dalam jendela"""
+        if self.checkin_window_s <= 0:
+            return
+        since = (datetime.now() - timedelta(seconds=self.checkin_window_s)).strftime('%Y-%m-%d %H:%M:%S')
+        rows = self.db.query('SELECT user_id, MAX(check_in_time) FROM attendance_logs '
+                             'WHERE check_in_time >= ? GROUP BY user_id', (since,))
+        self.checkin_window.seed(
+            (user_id, datetime.strptime(last, '%Y-%m-%d %H:%M:%S').timestamp()) for user_id, last in rows
+        )
+    
+    def read_db_profile_setting(self):
+        """Baca nama profil SQLite dari settings (tabel mungkin belum ada saat pertama kali)"""
+        try:
+            row = self.db.query_one("SELECT value FROM settings WHERE key = 'db_profile'")
+        except sqlite3.OperationalError:
+            row = None
+        if row and row[0] in DB_PROFILES:
+            return row[0]
+        return DEFAULT_DB_PROFILE
+    
+    def change_db_profile(self, event=None):
+        """Ganti profil SQLite dari UI, simpan ke settings dan terapkan langsung"""
+        profile = self.db_profile_var.get()
+        if profile not in DB_PROFILES or profile == self.db_profile:
+            return
+        try:
+            self.db_profile_effective = self.db.set_profile(profile)
+        except sqlite3.Error as e:
+            self.log(f"❌ Gagal menerapkan profil SQLite '{profile}': {str(e)}")
+            self.db_profile_var.set(self.db_profile)
+            return
         
-        self.conn.commit()
-        self.load_users_from_db()
+        self.db_profile = profile
+        with self.db.writer() as conn:
+            conn.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                         ('db_profile', profile))
+        
+        self.db_profile_label.config(text=describe_db_profile(self.db_profile, self.db_profile_effective))
+        self.log(f"💾 Profil SQLite diganti: {describe_db_profile(self.db_profile, self.db_profile_effective)}")
     
     def load_users_from_db(self):
         """Load users dari database"""
-        self.cursor.execute('SELECT id_user, name FROM users')
-        for user_id, name in self.cursor.fetchall():
+        rows = self.db.query('SELECT id_user, name, email, position, fingerprint_template FROM users')
+        for user_id, name, email, position, fp_hash in rows:
             self.users[user_id] = name
+        
+        # Bangun index hash -> user untuk verify request
+        self.user_index.rebuild(rows)
     
     def load_settings(self):
         """Load settings dari database"""
-        self.cursor.execute('SELECT key, value FROM settings')
-        settings = dict(self.cursor.fetchall())
+        settings = dict(self.db.query('SELECT key, value FROM settings'))
         
         if 'mqtt_broker' in settings:
             self.mqtt_broker = settings['mqtt_broker']
@@ -496,14 +2361,58 @@ class AttendanceApp:
             self.mqtt_port = int(settings['mqtt_port'])
             self.entry_port.delete(0, tk.END)
             self.entry_port.insert(0, str(self.mqtt_port))
+        
+        if 'mqtt_backoff_min_s' in settings:
+            self.mqtt_backoff_min_s = max(0.1, float(settings['mqtt_backoff_min_s']))
+        
+        if 'mqtt_backoff_max_s' in settings:
+            self.mqtt_backoff_max_s = max(self.mqtt_backoff_min_s, float(settings['mqtt_backoff_max_s']))
+        
+        if 'spool_drain_rate' in settings:
+            self.spool_drain_rate = max(1, int(settings['spool_drain_rate']))
+        
+        if 'pipeline_workers' in settings:
+            self.pipeline_workers = max(1, int(settings['pipeline_workers']))
+        
+        if 'pipeline_queue_size' in settings:
+            self.pipeline_queue_size = max(1, int(settings['pipeline_queue_size']))
+        
+        if 'writer_batch_size' in settings:
+            self.writer_batch_size = max(1, int(settings['writer_batch_size']))
+        
+        if 'writer_max_delay_ms' in settings:
+            self.writer_max_delay_ms = max(1, int(settings['writer_max_delay_ms']))
+        
+        if settings.get('verify_encoding') in VERIFY_ENCODINGS:
+            self.verify_encoding = settings['verify_encoding']
+        
+        if 'telemetry_sample_ms' in settings:
+            self.telemetry_sample_ms = max(100, int(settings['telemetry_sample_ms']))
+        
+        if 'log_max_lines' in settings:
+            self.log_max_lines = max(1, int(settings['log_max_lines']))
+            self.activity_log.set_max_lines(self.log_max_lines)
+        
+        if 'checkin_window_s' in settings:
+            self.checkin_window_s = max(0, int(settings['checkin_window_s']))
+            self.checkin_window.set_window(self.checkin_window_s)
+        
+        if 'negative_cache_ttl' in settings:
+            self.negative_cache_ttl = max(0.0, float(settings['negative_cache_ttl']))
+            self.negative_cache.set_ttl(self.negative_cache_ttl)
+        
+        if settings.get('log_level') in ActivityLog.LEVELS:
+            self.activity_log.set_level(ActivityLog.LEVELS[settings['log_level']])
+            self.log_level_var.set(settings['log_level'])
+            self.ui.refresh(self.flush_activity_log)
     
     def save_settings(self):
         """Simpan settings ke database"""
-        self.cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-                          ('mqtt_broker', self.mqtt_broker))
-        self.cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-                          ('mqtt_port', str(self.mqtt_port)))
-        self.conn.commit()
+        with self.db.writer() as conn:
+            conn.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                         ('mqtt_broker', self.mqtt_broker))
+            conn.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                         ('mqtt_port', str(self.mqtt_port)))
     
     def setup_ui(self):
         """Setup antarmuka"""
@@ -912,12 +2821,27 @@ class AttendanceApp:
         shadow.place(in_=log_frame, x=3, y=3, relwidth=1, relheight=1)
         log_frame.lift()
         
-        log_title = tk.Label(log_frame,
+        log_header = tk.Frame(log_frame, bg=self.colors['bg_frame'])
+        log_header.pack(fill="x", padx=20, pady=(15, 10))
+        
+        log_title = tk.Label(log_header,
                             text="📋 Status Log",
                             bg=self.colors['bg_frame'],
                             fg=self.colors['primary'],
                             font=('Segoe UI', 12, 'bold'))
-        log_title.pack(anchor="w", padx=20, pady=(15, 10))
+        log_title.pack(side="left")
+        
+        # Filter level activity log
+        self.log_level_var = tk.StringVar(value=logging.getLevelName(self.activity_log.level))
+        log_level_combo = ttk.Combobox(log_header, textvariable=self.log_level_var,
+                                       values=list(ActivityLog.LEVELS), state='readonly',
+                                       width=10, font=('Segoe UI', 9))
+        log_level_combo.pack(side="right")
+        log_level_combo.bind('<<ComboboxSelected>>', self.change_log_level)
+        tk.Label(log_header, text="Level:",
+                bg=self.colors['bg_frame'],
+                fg=self.colors['text_dark'],
+                font=('Segoe UI', 9)).pack(side="right", padx=(0, 5))
         
         log_text_frame = tk.Frame(log_frame, bg=self.colors['bg_frame'])
         log_text_frame.pack(fill="both", expand=True, padx=20, pady=(10, 20))
@@ -1080,7 +3004,7 @@ class AttendanceApp:
         
         # Buttons
         refresh_btn = RoundedButton(btn_container, text="🔄 Refresh",
-                                   command=self.refresh_attendance_logs,
+                                   command=lambda: self.refresh_attendance_logs(recount=True),
                                    bg_color=self.colors['primary'],
                                    fg_color=self.colors['text_light'],
                                    hover_color=self.colors['hover'],
@@ -1245,15 +3169,15 @@ class AttendanceApp:
         tree_wrapper = tk.Frame(tree_frame, bg=self.colors['bg_frame'])
         tree_wrapper.pack(fill="both", expand=True, padx=15, pady=(0, 15))
         
-        scrollbar = ttk.Scrollbar(tree_wrapper)
-        scrollbar.pack(side="right", fill="y")
+        self.log_scrollbar = ttk.Scrollbar(tree_wrapper)
+        self.log_scrollbar.pack(side="right", fill="y")
         
         self.log_tree = ttk.Treeview(tree_wrapper, 
                                      columns=("No", "ID", "Nama", "Waktu", "Score", "Hash"), 
                                      show="headings", 
-                                     yscrollcommand=scrollbar.set,
+                                     yscrollcommand=self.on_log_tree_scroll,
                                      height=12)
-        scrollbar.config(command=self.log_tree.yview)
+        self.log_scrollbar.config(command=self.log_tree.yview)
         
         self.log_tree.heading("No", text="No")
         self.log_tree.heading("ID", text="ID User")
@@ -1345,6 +3269,70 @@ class AttendanceApp:
                            font=('Segoe UI', 11))
         subtitle.pack(anchor="w", pady=(3, 0))
         
+        # Statistik pipeline MQTT (kedalaman antrian dan waktu per stage)
+        self.pipeline_stats_label = tk.Label(title_frame,
+                                             text="⚙️ Pipeline MQTT: belum aktif",
+                                             bg=self.colors['bg_frame'],
+                                             fg=self.colors['accent'],
+                                             font=('Segoe UI', 9))
+        self.pipeline_stats_label.pack(anchor="w", pady=(3, 0))
+        
+        # Statistik koneksi MQTT (reconnect dan outage)
+        self.mqtt_stats_label = tk.Label(title_frame,
+                                         text="📶 Koneksi MQTT: belum terhubung",
+                                         bg=self.colors['bg_frame'],
+                                         fg=self.colors['accent'],
+                                         font=('Segoe UI', 9))
+        self.mqtt_stats_label.pack(anchor="w", pady=(3, 0))
+        
+        # Statistik group-commit writer
+        self.writer_stats_label = tk.Label(title_frame,
+                                           text="💾 Writer presensi: -",
+                                           bg=self.colors['bg_frame'],
+                                           fg=self.colors['accent'],
+                                           font=('Segoe UI', 9))
+        self.writer_stats_label.pack(anchor="w", pady=(3, 0))
+        
+        # Statistik router handler MQTT per topic
+        self.router_stats_label = tk.Label(title_frame,
+                                           text="🧭 Router MQTT: -",
+                                           bg=self.colors['bg_frame'],
+                                           fg=self.colors['accent'],
+                                           font=('Segoe UI', 9),
+                                           justify="left")
+        self.router_stats_label.pack(anchor="w", pady=(3, 0))
+        
+        # Statistik dispatcher update UI
+        self.ui_stats_label = tk.Label(title_frame,
+                                       text="🖥️ UI dispatcher: -",
+                                       bg=self.colors['bg_frame'],
+                                       fg=self.colors['accent'],
+                                       font=('Segoe UI', 9))
+        self.ui_stats_label.pack(anchor="w", pady=(3, 0))
+        
+        # Profil performa SQLite yang aktif
+        profile_frame = tk.Frame(title_frame, bg=self.colors['bg_frame'])
+        profile_frame.pack(anchor="w", pady=(3, 0))
+        
+        tk.Label(profile_frame, text="💾 Profil SQLite:",
+                bg=self.colors['bg_frame'],
+                fg=self.colors['text_dark'],
+                font=('Segoe UI', 9, 'bold')).pack(side="left")
+        
+        self.db_profile_var = tk.StringVar(value=self.db_profile)
+        profile_combo = ttk.Combobox(profile_frame, textvariable=self.db_profile_var,
+                                     width=10, state='readonly', font=('Segoe UI', 9))
+        profile_combo['values'] = list(DB_PROFILES.keys())
+        profile_combo.pack(side="left", padx=5)
+        profile_combo.bind('<<ComboboxSelected>>', self.change_db_profile)
+        
+        self.db_profile_label = tk.Label(profile_frame,
+                                         text=describe_db_profile(self.db_profile, self.db_profile_effective),
+                                         bg=self.colors['bg_frame'],
+                                         fg=self.colors['accent'],
+                                         font=('Segoe UI', 9))
+        self.db_profile_label.pack(side="left")
+        
         # Right side - Refresh button
         refresh_btn = RoundedButton(header_content, text="🔄 Refresh Data",
                                     command=self.refresh_sensor_analysis,
@@ -1360,10 +3348,11 @@ class AttendanceApp:
         cards_container = ttk.Frame(scrollable_frame)
         cards_container.pack(fill="both", expand=True, padx=10, pady=(5, 10))
         
-        # Configure grid to have 3 equal columns
+        # Configure grid to have 4 equal columns (3 sensor + latency)
         cards_container.columnconfigure(0, weight=1)
         cards_container.columnconfigure(1, weight=1)
         cards_container.columnconfigure(2, weight=1)
+        cards_container.columnconfigure(3, weight=1)
         
         # FPM10A Card
         self.create_sensor_card(cards_container, "FPM10A", "📟 FPM10A Sensor", 0)
@@ -1374,8 +3363,15 @@ class AttendanceApp:
         # ZW101 Card
         self.create_sensor_card(cards_container, "ZW101", "📟 HLK-ZW101 Sensor", 2)
         
+        # Latency verify request per stage
+        self.create_latency_card(cards_container, 3)
+        
+        # Tabel hash tidak terdaftar (miss per hash dari cache negatif)
+        self.create_unknown_hash_card(scrollable_frame)
+        
         # Load initial data
         self.refresh_sensor_analysis()
+        self.update_pipeline_stats()
     
     def create_sensor_card(self, parent, sensor_name, title, column):
         """Create individual sensor detail card with comprehensive parameters"""
@@ -1461,11 +3457,141 @@ class AttendanceApp:
             
             setattr(self, attr_name, value_label)
     
+    def create_latency_card(self, parent, column):
+        """Card latency verify request per stage (p50/p95/p99 dalam ms)"""
+        card_container = ttk.Frame(parent)
+        card_container.grid(row=0, column=column, padx=8, pady=5, sticky="nsew")
+        
+        card = tk.Frame(card_container, bg=self.colors['bg_frame'], relief='flat', bd=0)
+        card.pack(fill="both", expand=True)
+        
+        shadow = tk.Frame(card_container, bg='#E0E0E0')
+        shadow.place(in_=card, x=3, y=3, relwidth=1, relheight=1)
+        card.lift()
+        
+        title_bg = tk.Frame(card, bg=self.colors['primary'], height=50)
+        title_bg.pack(fill="x")
+        title_bg.pack_propagate(False)
+        
+        tk.Label(title_bg,
+                text="⏱️ Latency Verifikasi",
+                bg=self.colors['primary'],
+                fg=self.colors['text_light'],
+                font=('Segoe UI', 14, 'bold')).pack(anchor="center", expand=True)
+        
+        content = tk.Frame(card, bg=self.colors['bg_frame'])
+        content.pack(fill="both", expand=True, padx=18, pady=15)
+        
+        self.latency_tree = ttk.Treeview(content,
+                                         columns=("Stage", "p50", "p95", "p99", "n"),
+                                         show="headings",
+                                         height=len(LatencyTracker.STAGES))
+        for col, text, width in (("Stage", "Stage", 70), ("p50", "p50 ms", 60),
+                                 ("p95", "p95 ms", 60), ("p99", "p99 ms", 60), ("n", "n", 50)):
+            self.latency_tree.heading(col, text=text)
+            self.latency_tree.column(col, width=width, anchor="center")
+        self.latency_tree.tag_configure('oddrow', background='white')
+        self.latency_tree.tag_configure('evenrow', background='#F9F9FF')
+        for i, stage in enumerate(LatencyTracker.STAGES):
+            self.latency_tree.insert("", "end", iid=stage, values=(stage, "-", "-", "-", 0),
+                                     tags=('evenrow' if i % 2 == 0 else 'oddrow',))
+        self.latency_tree.pack(fill="x")
+        
+        self.latency_skew_label = tk.Label(content,
+                                           text="Offset device: -",
+                                           bg=self.colors['bg_frame'],
+                                           fg=self.colors['accent'],
+                                           font=('Segoe UI', 9),
+                                           justify="left",
+                                           wraplength=300)
+        self.latency_skew_label.pack(anchor="w", pady=(8, 0))
+    
+    def refresh_latency_card(self):
+        """Update tabel persentil latency dan offset jam device"""
+        stats = self.verify_latency.stats()
+        fmt = lambda v: "-" if v is None else f"{v:.1f}"
+        for stage, s in stats['stages'].items():
+            self.latency_tree.item(stage, values=(stage, fmt(s['p50']), fmt(s['p95']), fmt(s['p99']), s['count']))
+        if stats['devices']:
+            self.latency_skew_label.config(text="\n".join(
+                f"Offset {device}: {d['offset_ms'] - d['min_offset_ms']:.0f} ms di atas minimum "
+                f"(desktop - device = {d['offset_ms'] / 1000:.1f} s)"
+                for device, d in stats['devices'].items()))
+    
+    def create_unknown_hash_card(self, parent):
+        """Card tabel counter miss per fingerprint_hash yang tidak terdaftar"""
+        card_container = ttk.Frame(parent)
+        card_container.pack(fill="x", padx=18, pady=(5, 15))
+        
+        card = tk.Frame(card_container, bg=self.colors['bg_frame'], relief='flat', bd=0)
+        card.pack(fill="both", expand=True)
+        
+        shadow = tk.Frame(card_container, bg='#E0E0E0')
+        shadow.place(in_=card, x=3, y=3, relwidth=1, relheight=1)
+        card.lift()
+        
+        title_bg = tk.Frame(card, bg=self.colors['primary'], height=40)
+        title_bg.pack(fill="x")
+        title_bg.pack_propagate(False)
+        
+        tk.Label(title_bg,
+                text="🚫 Hash Tidak Terdaftar (slot sensor yatim)",
+                bg=self.colors['primary'],
+                fg=self.colors['text_light'],
+                font=('Segoe UI', 12, 'bold')).pack(anchor="center", expand=True)
+        
+        content = tk.Frame(card, bg=self.colors['bg_frame'])
+        content.pack(fill="both", expand=True, padx=18, pady=10)
+        
+        self.negative_cache_label = tk.Label(content,
+                                             text="Cache negatif: -",
+                                             bg=self.colors['bg_frame'],
+                                             fg=self.colors['accent'],
+                                             font=('Segoe UI', 9))
+        self.negative_cache_label.pack(anchor="w", pady=(0, 5))
+        
+        self.unknown_hash_tree = ttk.Treeview(content,
+                                              columns=("Hash", "Miss", "Pertama", "Terakhir"),
+                                              show="headings",
+                                              height=6)
+        self.unknown_hash_tree.heading("Hash", text="Fingerprint Hash")
+        self.unknown_hash_tree.heading("Miss", text="Jumlah Miss")
+        self.unknown_hash_tree.heading("Pertama", text="Miss Pertama")
+        self.unknown_hash_tree.heading("Terakhir", text="Miss Terakhir")
+        
+        self.unknown_hash_tree.column("Hash", width=150, anchor="center")
+        self.unknown_hash_tree.column("Miss", width=100, anchor="center")
+        self.unknown_hash_tree.column("Pertama", width=180, anchor="center")
+        self.unknown_hash_tree.column("Terakhir", width=180, anchor="center")
+        
+        self.unknown_hash_tree.tag_configure('oddrow', background='white')
+        self.unknown_hash_tree.tag_configure('evenrow', background='#F9F9FF')
+        self.unknown_hash_tree.pack(fill="x")
+    
+    def refresh_unknown_hash_table(self):
+        """Isi ulang tabel hash tidak terdaftar jika counter berubah"""
+        stats = self.negative_cache.stats()
+        self.negative_cache_label.config(
+            text=f"Cache negatif: {stats['cached']} hash aktif (TTL {stats['ttl_s']:.0f} s), "
+                 f"{stats['hits']} miss dijawab dari memori, {stats['tracked']} hash dilacak")
+        
+        if self.negative_cache.version == self.negative_cache_shown:
+            return
+        self.negative_cache_shown = self.negative_cache.version
+        
+        self.unknown_hash_tree.delete(*self.unknown_hash_tree.get_children())
+        for i, (fp_hash, misses, first, last) in enumerate(self.negative_cache.snapshot()):
+            tag = 'evenrow' if i % 2 == 0 else 'oddrow'
+            self.unknown_hash_tree.insert("", "end", values=(
+                fp_hash, misses,
+                first.strftime('%Y-%m-%d %H:%M:%S'),
+                last.strftime('%Y-%m-%d %H:%M:%S')
+            ), tags=(tag,))
+    
     def refresh_sensor_analysis(self):
         """Refresh sensor analysis cards with latest data"""
         # Count used capacity per sensor by reading database
-        self.cursor.execute('SELECT fingerprint_template FROM users')
-        templates = self.cursor.fetchall()
+        templates = self.db.query('SELECT fingerprint_template FROM users')
         
         # Reset used counts
         for sensor in self.sensor_metrics:
@@ -1483,6 +3609,65 @@ class AttendanceApp:
         self.update_sensor_cards()
         
         self.log("📊 Data analisa sensor berhasil di-refresh")
+        
+        # Statistik index user (hit/miss dan rata-rata waktu lookup)
+        stats = self.user_index.stats()
+        self.log(f"🔎 User index: {stats['size']} hash, hit={stats['hits']}, miss={stats['misses']} "
+                 f"({stats['hit_rate']:.1f}%), avg lookup={stats['avg_lookup_us']:.2f} µs")
+    
+    def update_pipeline_stats(self):
+        """Tampilkan statistik pipeline MQTT, dijadwalkan ulang tiap 1 detik"""
+        if self.pipeline:
+            stats = self.pipeline.stats()
+            stages = stats['stages']
+            self.pipeline_stats_label.config(
+                text=f"⚙️ Pipeline MQTT: antrian {stats['depth']}/{stats['capacity']} "
+                     f"(maks {stats['max_depth']}), {stats['workers']} worker, "
+                     f"diproses {stats['processed']}, dibuang {stats['dropped']}, error {stats['errors']} | "
+                     f"ingest {stages['ingest']['avg_ms']:.3f} ms, "
+                     f"antre {stages['queue_wait']['avg_ms']:.1f} ms (maks {stages['queue_wait']['max_ms']:.1f}), "
+                     f"proses {stages['handle']['avg_ms']:.1f} ms (maks {stages['handle']['max_ms']:.1f})")
+        text = "📶 Koneksi MQTT: belum terhubung"
+        if self.mqtt_supervisor:
+            stats = self.mqtt_supervisor.stats()
+            state = "terhubung" if stats['connected'] else (
+                f"terputus {stats['current_outage_s']:.0f} s" if stats['current_outage_s'] else "menghubungkan")
+            text = (f"📶 Koneksi MQTT: {state}, reconnect {stats['reconnects']}, "
+                    f"outage {stats['outages']} (total {stats['downtime_s']:.1f} s, "
+                    f"terakhir {stats['last_outage_s']:.1f} s, terlama {stats['longest_outage_s']:.1f} s), "
+                    f"percobaan gagal {stats['failed_attempts']}")
+        stats = self.outbound_spool.stats()
+        self.mqtt_stats_label.config(
+            text=f"{text} | spool: tertunda {stats['pending']} ({stats['segments']} segmen), "
+                 f"masuk {stats['appended']}, terkirim {stats['sent']}, kedaluwarsa {stats['expired']}")
+        if self.attendance_writer:
+            stats = self.attendance_writer.stats()
+            self.writer_stats_label.config(
+                text=f"💾 Writer presensi: {stats['rows_written']} row dalam {stats['batches']} batch "
+                     f"(rata-rata {stats['avg_batch']:.1f} row/batch), tertunda {stats['pending']}, "
+                     f"commit {stats['avg_commit_ms']:.1f} ms, gagal {stats['failed_batches']} | "
+                     f"batch {self.attendance_writer.batch_size} row / {self.attendance_writer.max_delay_ms} ms | "
+                     f"ganda diabaikan {self.checkin_window.suppressed + stats['rows_ignored']} "
+                     f"(jendela {self.checkin_window.window_s} s), "
+                     f"request duplikat {self.verify_responses.duplicates}")
+        stats = self.ui.stats()
+        telemetry = self.telemetry.stats()
+        self.ui_stats_label.config(
+            text=f"🖥️ UI dispatcher: tick {self.ui.interval_ms} ms, {stats['calls']} update, "
+                 f"{stats['refreshes']} refresh ({stats['coalesced']} digabung), "
+                 f"antrian {stats['queued']}, error {stats['errors']} | "
+                 f"telemetry: sample {self.telemetry_sample_ms} ms, {telemetry['updates']} pesan, "
+                 f"{telemetry['applied']} diterapkan, {telemetry['superseded']} ditimpa")
+        routes = [r for r in self.mqtt_router.stats() if r['messages']]
+        self.router_stats_label.config(
+            text="🧭 Router MQTT: " + ("\n    ".join(
+                f"{r['name']} {r['messages']} pesan, error {r['errors']}, "
+                f"rata-rata {r['avg_ms']:.2f} ms, total {r['total_ms']:.0f} ms"
+                for r in routes) or "belum ada pesan") +
+                 (f" | tanpa handler {self.mqtt_router.unrouted}" if self.mqtt_router.unrouted else ""))
+        self.refresh_unknown_hash_table()
+        self.refresh_latency_card()
+        self.root.after(1000, self.update_pipeline_stats)
     
     def calculate_avg_response_time(self, sensor_name):
         """Calculate average response time for sensor"""
@@ -1538,11 +3723,11 @@ class AttendanceApp:
     
     # ============= MQTT Functions =============
     def toggle_connection(self):
-        """Toggle MQTT connection"""
-        if not self.is_connected:
-            self.connect_mqtt()
-        else:
+        """Toggle MQTT connection (Disconnect juga membatalkan reconnect yang sedang berjalan)"""
+        if self.mqtt_supervisor and self.mqtt_supervisor.running:
             self.disconnect_mqtt()
+        else:
+            self.connect_mqtt()
     
     def connect_mqtt(self):
         """Koneksi ke MQTT Broker"""
@@ -1559,8 +3744,18 @@ class AttendanceApp:
             self.mqtt_client.on_message = self.on_mqtt_message
             self.mqtt_client.on_disconnect = self.on_mqtt_disconnect
             
-            self.mqtt_client.connect(self.mqtt_broker, self.mqtt_port, 60)
-            self.mqtt_client.loop_start()
+            # Start worker pipeline sebelum pesan pertama masuk
+            self.start_pipeline()
+            
+            # Connect, network loop dan reconnect dijalankan thread supervisor
+            self.mqtt_supervisor = MqttSupervisor(self.mqtt_client, self.mqtt_broker, self.mqtt_port, 60,
+                                                  min_delay=self.mqtt_backoff_min_s,
+                                                  max_delay=self.mqtt_backoff_max_s,
+                                                  on_retry=self.on_mqtt_retry)
+            self.mqtt_supervisor.start()
+            self.btn_connect.config_text("⏹️ Cancel")
+            self.btn_connect.config_color(self.colors['error'])
+            self.log(f"🔗 Menghubungkan ke MQTT Broker: {self.mqtt_broker}:{self.mqtt_port}")
             
         except Exception as e:
             messagebox.showerror("Error", f"Gagal koneksi ke MQTT Broker:\n{str(e)}")
@@ -1570,410 +3765,652 @@ class AttendanceApp:
         """Callback saat berhasil koneksi ke MQTT"""
         if rc == 0:
             self.is_connected = True
-            self.status_label.config(text="● Connected", foreground=self.colors['success'])
-            self.btn_connect.config_text("🔌 Disconnect")
-            self.btn_connect.config_color(self.colors['error'])
-            self.log(f"✅ Terhubung ke MQTT Broker: {self.mqtt_broker}:{self.mqtt_port}")
+            if self.mqtt_supervisor:
+                self.mqtt_supervisor.mark_connected()
             
-            # Subscribe ke topics
+            # Subscribe ke topics (ulang setiap reconnect, session broker tidak disimpan)
             # Subscribe to all ESP32 response topics
-            self.mqtt_client.subscribe(self.TOPIC_RES_TEMPLATE)
-            self.mqtt_client.subscribe(self.TOPIC_RES_STATUS)
-            self.mqtt_client.subscribe(self.TOPIC_RES_ERROR)
-            self.mqtt_client.subscribe(self.TOPIC_VERIFY_REQUEST)
-            self.mqtt_client.subscribe(self.TOPIC_VERIFY_RESPONSE)
-            self.mqtt_client.subscribe(self.TOPIC_SYS_HEALTH)
-            self.mqtt_client.subscribe(self.TOPIC_SENSOR_METRICS)
-            
-            self.log(f"📡 Subscribed to topics: template, status, error, verify_request, verify_response, health, metrics")
+            for topic in self.mqtt_router.topics():
+                self.mqtt_client.subscribe(topic)
             
-            # Save settings
-            self.save_settings()
+            # Iklankan encoding verify yang didukung (retained, dibaca device saat connect)
+            self.mqtt_client.publish(self.TOPIC_SYS_CONFIG, json.dumps({
+                "verify_encodings": list(VERIFY_ENCODINGS),
+                "verify_encoding": self.verify_encoding
+            }), retain=True)
             
-            # Publish current selected mode from radiobutton
-            current_mode = self.current_mode.get().lower()
-            self.publish_command({"mode": current_mode}, topic=self.TOPIC_CMD_MODE)
-            self.mode_status.config(text=current_mode.upper())
-            self.log(f"📡 Mode synchronized to ESP32: {current_mode.upper()}")
-            
-            # Update sensor cards di tab Analysis dengan data terbaru
-            self.root.after(100, self.update_sensor_cards)
+            # Kirim pesan yang tertahan di spool selama putus
+            if self.outbound_spool.pending():
+                self.start_spool_drain()
             
             # Note: ESP32 does not store user list locally
             # All verification is done via MQTT template matching
             # self.sync_users_to_esp()  # Not needed
+            self.ui.call(self.show_mqtt_connected)
         else:
             self.log(f"❌ Gagal koneksi: RC={rc}")
     
+    def mqtt_active(self):
+        """True selama koneksi MQTT dijaga supervisor (terhubung atau sedang reconnect)"""
+        return bool(self.mqtt_supervisor and self.mqtt_supervisor.running)
+    
+    def publish_or_spool(self, topic, payload, qos=0, ttl_s=None):
+        """Publish langsung bila terhubung dan spool kosong, selain itu masukkan ke spool
+        
+        Pesan baru ikut masuk spool selama spool belum habis supaya urutan terjaga.
+        Return True jika terkirim langsung, False jika di-spool.
+        """
+        if ttl_s is None:
+            ttl_s = self.spool_ttl.get(topic)
+        if self.is_connected and not self.outbound_spool.pending() and self.spool_publish(topic, payload, qos):
+            return True
+        self.outbound_spool.append(topic, payload, ttl_s=ttl_s, qos=qos)
+        if self.is_connected:
+            self.start_spool_drain()
+        return False
+    
+    def spool_publish(self, topic, payload, qos):
+        """Publish satu pesan, False bila paho menolak (mis. koneksi baru saja putus)"""
+        if not (self.is_connected and self.mqtt_client):
+            return False
+        return self.mqtt_client.publish(topic, payload, qos=qos).rc == mqtt.MQTT_ERR_SUCCESS
+    
+    def start_spool_drain(self):
+        """Start thread drain spool bila belum berjalan"""
+        with self.spool_drain_lock:
+            if self.spool_drain_thread is None:
+                self.spool_drain_thread = threading.Thread(target=self.run_spool_drain,
+                                                           name="spool-drain", daemon=True)
+                self.spool_drain_thread.start()
+    
+    def run_spool_drain(self):
+        """Kirim isi spool berurutan, maks spool_drain_rate pesan per detik"""
+        interval = 0.1
+        total_sent = total_expired = 0
+        try:
+            while True:
+                with self.spool_drain_lock:
+                    # Keputusan berhenti dan pelepasan slot dalam satu lock (tidak ada append yang terlewat)
+                    if not self.is_connected or not self.outbound_spool.pending():
+                        self.spool_drain_thread = None
+                        break
+                limit = max(1, int(self.spool_drain_rate * interval))
+                sent, expired = self.outbound_spool.drain(self.spool_publish, limit)
+                total_sent += sent
+                total_expired += expired
+                time.sleep(interval)
+        except Exception as e:
+            self.log(f"❌ Error drain spool: {str(e)} (dicoba lagi saat publish/reconnect berikutnya)")
+        finally:
+            # Lepas slot thread juga saat error supaya start_spool_drain bisa memulai drainer baru
+            with self.spool_drain_lock:
+                if self.spool_drain_thread is threading.current_thread():
+                    self.spool_drain_thread = None
+        if total_sent or total_expired:
+            self.log(f"📤 Spool terkirim: {total_sent} pesan, {total_expired} kedaluwarsa dibuang, "
+                     f"sisa {self.outbound_spool.pending()}")
+    
+    def show_mqtt_connected(self):
+        """Update UI setelah koneksi MQTT berhasil (thread Tk)"""
+        self.status_label.config(text="● Connected", foreground=self.colors['success'])
+        self.btn_connect.config_text("🔌 Disconnect")
+        self.btn_connect.config_color(self.colors['error'])
+        self.log(f"✅ Terhubung ke MQTT Broker: {self.mqtt_broker}:{self.mqtt_port}")
+        self.log(f"📡 Subscribed to topics: template, status, error, verify_request, verify_response, health, metrics")
+        
+        # Save settings
+        self.save_settings()
+        
+        # Publish current selected mode from radiobutton
+        current_mode = self.current_mode.get().lower()
+        self.publish_command({"mode": current_mode}, topic=self.TOPIC_CMD_MODE)
+        self.mode_status.config(text=current_mode.upper())
+        self.log(f"📡 Mode synchronized to ESP32: {current_mode.upper()}")
+        
+        # Update sensor cards di tab Analysis dengan data terbaru
+        self.ui.refresh(self.update_sensor_cards)
+    
     def on_mqtt_disconnect(self, client, userdata, rc):
         """Callback saat disconnect dari MQTT"""
         self.is_connected = False
+        if self.mqtt_supervisor:
+            self.mqtt_supervisor.mark_disconnected(rc)
+        # rc == 0 hanya dari disconnect_mqtt(), UI sudah di-update di sana
+        if rc != 0:
+            self.log(f"⚠️ Koneksi MQTT terputus: {mqtt.error_string(rc)}")
+    
+    def on_mqtt_retry(self, delay, attempt, error):
+        """Callback dari supervisor sebelum menunggu percobaan connect berikutnya"""
+        self.log(f"🔄 Koneksi MQTT gagal ({error}), mencoba lagi dalam {delay:.1f} s (percobaan ke-{attempt})")
+        self.ui.call(self.show_mqtt_reconnecting, attempt)
+    
+    def show_mqtt_reconnecting(self, attempt):
+        """Update UI saat supervisor menunggu reconnect (thread Tk)"""
+        if self.mqtt_supervisor and self.mqtt_supervisor.running:
+            self.status_label.config(text=f"● Reconnecting ({attempt})", foreground=self.colors['warning'])
+            self.btn_connect.config_text("⏹️ Cancel")
+            self.btn_connect.config_color(self.colors['error'])
+    
+    def show_mqtt_disconnected(self):
+        """Update UI setelah koneksi MQTT terputus (thread Tk)"""
         self.status_label.config(text="● Disconnected", foreground=self.colors['error'])
         self.btn_connect.config_text("🔗 Connect")
         self.btn_connect.config_color(self.colors['primary'])
         self.log("⚠️ Terputus dari MQTT Broker (Mode: Idle)")
     
     def disconnect_mqtt(self):
-        """Disconnect dari MQTT Broker"""
-        if self.mqtt_client:
-            self.mqtt_client.loop_stop()
-            self.mqtt_client.disconnect()
+        """Disconnect dari MQTT Broker (menghentikan supervisor reconnect)"""
+        if self.mqtt_supervisor:
+            self.mqtt_supervisor.stop()
+        self.is_connected = False
+        self.stop_pipeline()
+        self.show_mqtt_disconnected()
+    
+    def start_pipeline(self):
+        """Start worker pipeline untuk pesan MQTT"""
+        self.stop_pipeline()
+        self.pipeline = MessagePipeline(self.process_mqtt_message,
+                                        workers=self.pipeline_workers,
+                                        max_size=self.pipeline_queue_size,
+                                        on_error=self.on_pipeline_error)
+        self.pipeline.start()
+        self.log(f"⚙️ Pipeline MQTT: {self.pipeline_workers} worker, "
+                 f"antrian maks {self.pipeline_queue_size} pesan per worker")
+    
+    def stop_pipeline(self):
+        """Stop worker pipeline (statistik tetap disimpan)"""
+        if self.pipeline:
+            self.pipeline.stop()
     
     def on_mqtt_message(self, client, userdata, msg):
-        """Callback saat menerima pesan MQTT"""
-        try:
-            # Decode payload with error handling for binary data
-            try:
-                payload_str = msg.payload.decode('utf-8')
-            except UnicodeDecodeError:
-                # If UTF-8 decode fails, try with latin-1 (accepts all byte values)
-                payload_str = msg.payload.decode('latin-1')
-                self.log(f"⚠️ Warning: Message contains non-UTF8 data, using latin-1 decode")
+        """Callback saat menerima pesan MQTT - hanya enqueue ke pipeline"""
+        if self.pipeline:
+            self.pipeline.submit(msg)
+    
+    def setup_mqtt_routes(self):
+        """Daftarkan handler per topic MQTT ke router (sekaligus daftar subscribe)"""
+        self.mqtt_router = TopicRouter(on_decoded=self.on_mqtt_payload)
+        # Telemetry latest-value-wins: payload mentah disimpan, di-decode oleh sample_telemetry
+        # sehingga pesan yang tergeser pesan berikutnya tidak pernah di-parse
+        self.metrics_route = self.mqtt_router.add(self.TOPIC_SENSOR_METRICS, self.handle_sensor_metrics,
+                                                  name="sensor/metrics", decode=False, log_payload=False)
+        self.mqtt_router.add(self.TOPIC_RES_TEMPLATE, self.handle_template_response, name="response/template")
+        self.mqtt_router.add(self.TOPIC_RES_STATUS, self.handle_status_response, name="response/status")
+        self.mqtt_router.add(self.TOPIC_RES_ERROR, self.handle_error_response, name="response/error")
+        # Payload verify bisa JSON atau struct1, decode di handler (sekaligus masuk stage 'decode' latency)
+        self.mqtt_router.add(self.TOPIC_VERIFY_REQUEST, self.handle_verify_request,
+                             name="verify/request", decode=False)
+        self.mqtt_router.add(self.TOPIC_VERIFY_RESPONSE, self.handle_verify_response,
+                             name="verify/response", decode=False)
+        self.health_route = self.mqtt_router.add(self.TOPIC_SYS_HEALTH, self.handle_system_health,
+                                                 name="system/health", decode=False)
+    
+    def process_mqtt_message(self, msg):
+        """Proses pesan MQTT (dijalankan di worker thread pipeline, error ditangani pipeline)"""
+        if not self.mqtt_router.route(msg):
+            self.log(f"⚠️ Tidak ada handler untuk topic '{msg.topic}'", logging.DEBUG)
+    
+    def on_pipeline_error(self, msg, error):
+        """Callback worker pipeline saat handler gagal (dipanggil di dalam except)"""
+        self.log(f"❌ Error processing MQTT message from topic '{msg.topic}': {str(error)} "
+                 f"(payload {len(msg.payload)} bytes)", exc_info=True)
+    
+    def on_mqtt_payload(self, route, topic, data, lossy):
+        """Dipanggil router setelah payload di-decode (route None = dari handler sendiri)"""
+        if lossy:
+            self.log(f"⚠️ Warning: Message contains non-UTF8 data, using latin-1 decode")
+        # Debug log untuk tracking (skip untuk metrics to avoid spam)
+        # json.dumps hanya dijalankan jika level DEBUG aktif
+        if (route is None or route.log_payload) and self.activity_log.is_enabled_for(logging.DEBUG):
+            self.log(f"📨 MQTT [{topic}]: {json.dumps(data, indent=2)}", logging.DEBUG)
+    
+    def handle_sensor_metrics(self, msg, data):
+        """sensor/metrics: simpan payload metrics terbaru (di-decode dan diterapkan oleh sample_telemetry)"""
+        self.telemetry.put("metrics", msg.payload)
+    
+    def handle_template_response(self, msg, data):
+        """response/template: konfirmasi enrollment dari ESP32"""
+        # ESP32 mengirim hash setelah enrollment berhasil (TANPA user_id)
+        fingerprint_hash = data.get("fingerprint_hash")  # e.g., "AS608_5"
+        sensor_type = data.get("sensor")
+        fingerprint_id = data.get("fingerprint_id")
+        user_name = data.get("name")
+        
+        if fingerprint_hash:
+            # Simpan hash ke pending variable (TIDAK LANGSUNG SIMPAN KE DATABASE)
+            self.pending_fingerprint_hash = fingerprint_hash
             
-            data = json.loads(payload_str)
+            self.ui.call(self.show_enrolled_template, fingerprint_hash, sensor_type, fingerprint_id)
             
-            # Handle sensor metrics update (without logging to avoid spam)
-            if msg.topic == self.TOPIC_SENSOR_METRICS:
-                try:
-                    # Update sensor metrics from ESP32
-                    for sensor_name in ["FPM10A", "AS608", "ZW101"]:
-                        if sensor_name in data:
-                            sensor_data = data[sensor_name]
-                            if sensor_name in self.sensor_metrics:
-                                # Update metrics dari ESP32
-                                self.sensor_metrics[sensor_name]['total_scans'] = sensor_data.get('total_scans', 0)
-                                self.sensor_metrics[sensor_name]['success_count'] = sensor_data.get('success_count', 0)
-                                self.sensor_metrics[sensor_name]['fail_count'] = sensor_data.get('fail_count', 0)
-                                self.sensor_metrics[sensor_name]['avg_confidence'] = sensor_data.get('avg_confidence', 0)
-                                
-                                # Update response time
-                                avg_resp_time = sensor_data.get('avg_response_time', 0)
-                                if avg_resp_time > 0:
-                                    self.sensor_metrics[sensor_name]['response_time'] = [avg_resp_time]
-                                
-                                # Update last scan time
-                                last_scan = sensor_data.get('last_scan_time', 0)
-                                if last_scan > 0:
-                                    self.sensor_metrics[sensor_name]['last_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    # Update card display
-                    self.root.after(0, self.update_sensor_cards)
-                except Exception as e:
-                    self.log(f"⚠️ Error parsing sensor metrics: {e}")
-                return
+            self.log(f"✅ Fingerprint template berhasil ditambahkan!")
+            self.log(f"   Hash: {fingerprint_hash}")
+            self.log(f"   Sensor: {sensor_type}, ID: {fingerprint_id}")
+            self.log(f"ℹ️ Klik 'Save User' untuk menyimpan ke database")
             
-            # Debug log untuk tracking (skip untuk metrics to avoid spam)
-            self.log(f"📨 MQTT [{msg.topic}]: {json.dumps(data, indent=2)}")
+            # Update sensor metrics
+            if sensor_type in self.sensor_metrics:
+                self.sensor_metrics[sensor_type]['success_count'] += 1
+                self.sensor_metrics[sensor_type]['total_scans'] += 1
+                self.sensor_metrics[sensor_type]['last_update'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        else:
+            self.log(f"❌ Enrollment failed - No hash received")
+            self.ui.call(self.show_enroll_failed)
+            
+            # Track failure
+            if sensor_type in self.sensor_metrics:
+                self.sensor_metrics[sensor_type]['fail_count'] += 1
+                self.sensor_metrics[sensor_type]['total_scans'] += 1
+    
+    def handle_status_response(self, msg, data):
+        """response/status: pesan status umum dari ESP32"""
+        status = data.get("status")
+        details = data.get("details", "")
+        mode = data.get("mode")
+        sensor = data.get("sensor")
+        
+        self.log(f"📡 Status dari ESP32: {status} - {details}")
+        
+        # Update UI based on ESP32 status
+        if status == "mode_changed" and mode:
+            # Sync mode from ESP32
+            mode_upper = mode.upper()
             
-            # Handle response/template topic - enrollment confirmation from ESP32
-            if msg.topic == self.TOPIC_RES_TEMPLATE:
-                # ESP32 mengirim hash setelah enrollment berhasil (TANPA user_id)
-                fingerprint_hash = data.get("fingerprint_hash")  # e.g., "AS608_5"
-                sensor_type = data.get("sensor")
-                fingerprint_id = data.get("fingerprint_id")
-                user_name = data.get("name")
+            self.ui.call(self.apply_esp_mode, mode_upper)
+            self.log(f"✅ Mode berhasil disinkronkan: {mode_upper}")
+        
+        elif status == "sensor_changed" and sensor:
+            # Sync active sensor from ESP32
+            if sensor in self.sensor_list:
+                self.active_sensor = sensor
+                self.ui.call(self.sensor_status.config, text=sensor)
+                self.log(f"✅ Sensor berhasil disinkronkan: {sensor}")
                 
-                if fingerprint_hash:
-                    # Simpan hash ke pending variable (TIDAK LANGSUNG SIMPAN KE DATABASE)
-                    self.pending_fingerprint_hash = fingerprint_hash
-                    
-                    # Update textbox display
-                    self.template_display.config(state='normal')
-                    self.template_display.delete(0, tk.END)
-                    self.template_display.insert(0, fingerprint_hash)
-                    self.template_display.config(state='readonly', fg=self.colors['success'])
-                    
-                    # ✅ ENABLE button Save User setelah dapat fingerprint hash
-                    self.save_user_btn.config(state='normal', cursor='hand2')
-                    
-                    self.log(f"✅ Fingerprint template berhasil ditambahkan!")
-                    self.log(f"   Hash: {fingerprint_hash}")
-                    self.log(f"   Sensor: {sensor_type}, ID: {fingerprint_id}")
-                    self.log(f"ℹ️ Klik 'Save User' untuk menyimpan ke database")
-                    
-                    # Update sensor metrics
-                    if sensor_type in self.sensor_metrics:
-                        self.sensor_metrics[sensor_type]['success_count'] += 1
-                        self.sensor_metrics[sensor_type]['total_scans'] += 1
-                        self.sensor_metrics[sensor_type]['last_update'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    # Show success message
-                    messagebox.showinfo("Sukses", 
-                        f"Fingerprint template berhasil ditambahkan!\n\n" +
-                        f"Hash: {fingerprint_hash}\n" +
-                        f"Sensor: {sensor_type}\n" +
-                        f"ID di sensor: {fingerprint_id}\n\n" +
-                        f"Silakan klik 'Save User' untuk menyimpan data.")
+                # Update sensor cards di tab Analysis untuk reflect sensor aktif
+                self.ui.refresh(self.update_sensor_cards)
+        
+        elif status == "enroll_complete":
+            # Enrollment completed successfully
+            self.log(f"🎉 Enrollment selesai: {details}")
+            # Refresh user list to show new user
+            self.ui.refresh(self.refresh_user_list)
+        
+        elif status == "enroll_started":
+            # Enrollment started
+            self.log(f"▶️ Enrollment dimulai: {details}")
+    
+    def handle_error_response(self, msg, data):
+        """response/error: pesan error dari ESP32"""
+        error_code = data.get("error_code")
+        error_msg = data.get("error_message")
+        self.log(f"❌ ESP32 Error [{error_code}]: {error_msg}")
+    
+    def handle_verify_request(self, msg, data):
+        """verify/request: ESP32 mengirim fingerprint_hash hasil match di sensor"""
+        started = time.perf_counter()
+        # msg.timestamp = time.monotonic() saat paho menerima pesan
+        received = max(0.0, time.monotonic() - msg.timestamp)
+        data, encoding, lossy = decode_verify_payload(msg.payload)
+        decoded = time.perf_counter()
+        if data is None:
+            self.log(f"⚠️ Verify request {encoding} terpotong ({len(msg.payload)} bytes), diabaikan")
+            return
+        self.on_mqtt_payload(None, msg.topic, data, lossy)
+        
+        device = data.get('device', 'verifynger_esp32')
+        if self.device_encodings.get(device) != encoding:
+            self.device_encodings[device] = encoding
+            self.log(f"🔤 Device {device} memakai encoding verify '{encoding}'")
+        
+        # ESP32 sends verification request with fingerprint hash
+        fingerprint_hash = data.get("fingerprint_hash")  # Hash: "SENSOR_ID" (e.g., "AS608_42")
+        match_score = data.get("match_score", 95)  # Confidence score dari sensor
+        sensor = data.get("sensor", self.active_sensor)
+        fingerprint_id = data.get("fingerprint_id")  # Raw ID (for logging)
+        
+        device_ts = data.get("timestamp")
+        idempotency_key = verify_idempotency_key(data)
+        
+        latency = self.verify_latency
+        latency.record("receive", received)
+        latency.record("decode", decoded - started)
+        if isinstance(device_ts, (int, float)):
+            latency.record_device(device, device_ts, time.time() - received)
+        
+        cached = self.verify_responses.get(idempotency_key) if idempotency_key else None
+        if cached is not None:
+            # Pesan dikirim ulang broker - jawab ulang, presensi sudah dicatat sebelumnya
+            self.publish_or_spool(self.TOPIC_VERIFY_RESPONSE, cached)
+            self.log(f"🔁 Verify request duplikat dijawab ulang: {idempotency_key}", logging.DEBUG)
+        elif fingerprint_hash:
+            # Find user by fingerprint hash - cek index di memori dulu
+            mark = time.perf_counter()
+            result = self.user_index.lookup(fingerprint_hash)
+            known_miss = result is None and self.negative_cache.contains(fingerprint_hash)
+            if result is None and not known_miss:
+                # Fallback ke database (mis. data diubah di luar aplikasi)
+                result = self.db.query_one(
+                    'SELECT id_user, name, email, position FROM users WHERE fingerprint_template = ?',
+                    (fingerprint_hash,)
+                )
+                if result:
+                    self.user_index.put(fingerprint_hash, *result)
                 else:
-                    self.log(f"❌ Enrollment failed - No hash received")
-                    self.template_display.config(state='normal')
-                    self.template_display.delete(0, tk.END)
-                    self.template_display.insert(0, "❌ Enrollment failed")
-                    self.template_display.config(state='readonly', fg=self.colors['error'])
-                    
-                    # ✅ DISABLE button Save User jika enrollment gagal
-                    self.save_user_btn.config(state='disabled', cursor='arrow')
-                    
-                    # Track failure
-                    if sensor_type in self.sensor_metrics:
-                        self.sensor_metrics[sensor_type]['fail_count'] += 1
-                        self.sensor_metrics[sensor_type]['total_scans'] += 1
-            
-            # Handle response/status topic - general status messages
-            elif msg.topic == self.TOPIC_RES_STATUS:
-                status = data.get("status")
-                details = data.get("details", "")
-                mode = data.get("mode")
-                sensor = data.get("sensor")
-                
-                self.log(f"📡 Status dari ESP32: {status} - {details}")
+                    self.negative_cache.add(fingerprint_hash)
+            latency.record("lookup", time.perf_counter() - mark)
+            
+            if result:
+                user_id, name, email, position = result
                 
-                # Update UI based on ESP32 status
-                if status == "mode_changed" and mode:
-                    # Sync mode from ESP32
-                    mode_upper = mode.upper()
-                    
-                    # Update internal state
-                    self.current_mode.set(mode_upper)
-                    self.mode_status.config(text=mode_upper)
-                    
-                    # Update button states and form display
-                    if mode_upper == "PRESENSI":
-                        self.btn_mode_presensi.config_color(self.colors['primary'])
-                        self.btn_mode_presensi.config(state='disabled', cursor='arrow')
-                        self.btn_mode_daftar.config_color(self.colors['secondary'])
-                        self.btn_mode_daftar.config(state='normal', cursor='hand2')
-                        
-                        # Switch form display
-                        self.reg_title.config(text="✅ Form Presensi")
-                        self.form_frame_daftar.pack_forget()
-                        self.btn_frame_daftar.pack_forget()
-                        self.form_frame_presensi.pack(fill="x", padx=20, pady=10)
-                        
-                        # Reset display fields
-                        self.display_id.config(text="-", fg=self.colors['accent'])
-                        self.display_name.config(text="-", fg=self.colors['text_dark'])
-                        self.display_email.config(text="-")
-                        self.display_position.config(text="-")
-                    else:  # ENROLL/DAFTAR
-                        self.btn_mode_presensi.config_color(self.colors['secondary'])
-                        self.btn_mode_presensi.config(state='normal', cursor='hand2')
-                        self.btn_mode_daftar.config_color(self.colors['primary'])
-                        self.btn_mode_daftar.config(state='disabled', cursor='arrow')
-                        
-                        # Switch form display
-                        self.reg_title.config(text="📝 Pendaftaran User Baru")
-                        self.form_frame_presensi.pack_forget()
-                        self.form_frame_daftar.pack(fill="x", padx=20, pady=10)
-                        self.btn_frame_daftar.pack(pady=20)
-                    
-                    self.log(f"✅ Mode berhasil disinkronkan: {mode_upper}")
+                # Send verification response to ESP32
+                response = {
+                    "status": "MATCH",
+                    "user_id": user_id,
+                    "user_name": name,
+                    "match_score": match_score
+                }
+                payload = encode_verify_response(response, encoding)
+                mark = time.perf_counter()
+                self.publish_or_spool(self.TOPIC_VERIFY_RESPONSE, payload)
+                sent = time.perf_counter()
+                if idempotency_key:
+                    self.verify_responses.put(idempotency_key, payload)
+                latency.record("publish", sent - mark)
+                latency.record("total", received + (sent - started))
                 
-                elif status == "sensor_changed" and sensor:
-                    # Sync active sensor from ESP32
-                    if sensor in self.sensor_list:
-                        self.active_sensor = sensor
-                        self.sensor_status.config(text=sensor)
-                        self.log(f"✅ Sensor berhasil disinkronkan: {sensor}")
+                # Log attendance with local time and hash
+                # Response sudah terkirim, commit dilakukan oleh group-commit writer
+                try:
+                    now = datetime.now()
+                    current_time = now.strftime('%Y-%m-%d %H:%M:%S')
+                    ts = now.timestamp()
+                    if self.checkin_window.admit(user_id, ts):
+                        mark = time.perf_counter()
+                        self.attendance_writer.submit(
+                            (user_id, name, current_time, match_score, fingerprint_hash,
+                             self.checkin_window.slot(ts), idempotency_key)
+                        )
+                        latency.record("insert", time.perf_counter() - mark)
                         
-                        # Update sensor cards di tab Analysis untuk reflect sensor aktif
-                        self.root.after(0, self.update_sensor_cards)
-                
-                elif status == "enroll_complete":
-                    # Enrollment completed successfully
-                    self.log(f"🎉 Enrollment selesai: {details}")
-                    # Refresh user list to show new user
-                    self.root.after(0, self.refresh_user_list)
+                        self.log(f"✅ Presensi berhasil: {name} (User ID: {user_id}, Hash: {fingerprint_hash}, Score: {match_score})")
+                        self.log(f"📝 Log presensi diantrekan ke database: {current_time}")
+                    else:
+                        # Scan ulang dalam jendela: MATCH tetap dikirim, log tidak ditulis lagi
+                        self.log(f"🔁 Presensi ganda diabaikan: {name} (User ID: {user_id}) "
+                                 f"sudah presensi dalam {self.checkin_window.window_s} detik terakhir")
+                except Exception as db_error:
+                    self.log(f"❌ Error menyimpan log presensi: {str(db_error)}")
+                    import traceback
+                    self.log(f"   Traceback: {traceback.format_exc()}")
                 
-                elif status == "enroll_started":
-                    # Enrollment started
-                    self.log(f"▶️ Enrollment dimulai: {details}")
-            
-            # Handle response/error topic - error messages from ESP32
-            elif msg.topic == self.TOPIC_RES_ERROR:
-                error_code = data.get("error_code")
-                error_msg = data.get("error_message")
-                self.log(f"❌ ESP32 Error [{error_code}]: {error_msg}")
-            
-            # Handle verify/request topic - verification result from ESP32 (already matched)
-            elif msg.topic == self.TOPIC_VERIFY_REQUEST:
-                # ESP32 sends verification request with fingerprint hash
-                fingerprint_hash = data.get("fingerprint_hash")  # Hash: "SENSOR_ID" (e.g., "AS608_42")
-                match_score = data.get("match_score", 95)  # Confidence score dari sensor
-                sensor = data.get("sensor", self.active_sensor)
-                fingerprint_id = data.get("fingerprint_id")  # Raw ID (for logging)
+                # Update sensor metrics for successful verification
+                self.record_verify_success(sensor, match_score)
                 
-                if fingerprint_hash:
-                    # Find user by fingerprint hash (direct match)
-                    self.cursor.execute(
-                        'SELECT id_user, name, email, position FROM users WHERE fingerprint_template = ?',
-                        (fingerprint_hash,)
-                    )
-                    result = self.cursor.fetchone()
-                    
-                    if result:
-                        user_id, name, email, position = result
-                        
-                        # Send verification response to ESP32
-                        response = {
-                            "status": "MATCH",
-                            "user_id": user_id,
-                            "user_name": name,
-                            "match_score": match_score
-                        }
-                        self.mqtt_client.publish(self.TOPIC_VERIFY_RESPONSE, json.dumps(response))
-                        
-                        # Log attendance with local time and hash
-                        try:
-                            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                            self.cursor.execute(
-                                'INSERT INTO attendance_logs (user_id, user_name, check_in_time, match_score, fingerprint_hash) VALUES (?, ?, ?, ?, ?)',
-                                (user_id, name, current_time, match_score, fingerprint_hash)
-                            )
-                            self.conn.commit()
-                            
-                            self.log(f"✅ Presensi berhasil: {name} (User ID: {user_id}, Hash: {fingerprint_hash}, Score: {match_score})")
-                            self.log(f"📝 Log presensi tersimpan di database: {current_time}")
-                        except Exception as db_error:
-                            self.log(f"❌ Error menyimpan log presensi: {str(db_error)}")
-                            import traceback
-                            self.log(f"   Traceback: {traceback.format_exc()}")
-                        
-                        # Update sensor metrics for successful verification
-                        if sensor in self.sensor_metrics:
-                            self.sensor_metrics[sensor]['success_count'] += 1
-                            self.sensor_metrics[sensor]['total_scans'] += 1
-                            self.sensor_metrics[sensor]['last_update'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            
-                            # Track confidence score
-                            if self.sensor_metrics[sensor]['avg_confidence'] == 0:
-                                self.sensor_metrics[sensor]['avg_confidence'] = match_score
-                            else:
-                                # Running average
-                                current_avg = self.sensor_metrics[sensor]['avg_confidence']
-                                total = self.sensor_metrics[sensor]['success_count']
-                                self.sensor_metrics[sensor]['avg_confidence'] = ((current_avg * (total - 1)) + match_score) / total
-                        
-                        # Update display form if in PRESENSI mode
-                        if self.current_mode.get() == "PRESENSI":
-                            self.root.after(0, lambda: self.update_presensi_display(user_id, name, email if email else "-", position if position else "-"))
-                        
-                        self.root.after(0, self.refresh_attendance_logs)
-                    else:
-                        # User not found in database
-                        response = {
-                            "status": "NO_MATCH",
-                            "user_id": 0,
-                            "user_name": "Unknown",
-                            "match_score": 0
-                        }
-                        self.mqtt_client.publish(self.TOPIC_VERIFY_RESPONSE, json.dumps(response))
-                        self.log(f"❌ Presensi gagal: Hash {fingerprint_hash} tidak ditemukan di database")
-                        
-                        # Track failed verification
-                        if sensor in self.sensor_metrics:
-                            self.sensor_metrics[sensor]['fail_count'] += 1
-                            self.sensor_metrics[sensor]['total_scans'] += 1
-                            self.sensor_metrics[sensor]['last_update'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                # Update display form if in PRESENSI mode (mode dicek di thread Tk)
+                self.ui.call(self.update_presensi_display, user_id, name, email if email else "-", position if position else "-")
+                # Refresh log tab dilakukan setelah writer commit (on_attendance_committed)
+            else:
+                # User not found in database
+                response = {
+                    "status": "NO_MATCH",
+                    "user_id": 0,
+                    "user_name": "Unknown",
+                    "match_score": 0
+                }
+                payload = encode_verify_response(response, encoding)
+                mark = time.perf_counter()
+                self.publish_or_spool(self.TOPIC_VERIFY_RESPONSE, payload)
+                sent = time.perf_counter()
+                if idempotency_key:
+                    self.verify_responses.put(idempotency_key, payload)
+                latency.record("publish", sent - mark)
+                latency.record("total", received + (sent - started))
+                misses = self.negative_cache.record_miss(fingerprint_hash)
+                if known_miss:
+                    # Miss berulang dijawab dari cache negatif, cukup log level DEBUG
+                    self.log(f"❌ Presensi gagal: Hash {fingerprint_hash} tidak terdaftar "
+                             f"(cache negatif, miss ke-{misses})", logging.DEBUG)
                 else:
-                    self.log(f"⚠️ Verification request without fingerprint_hash")
+                    self.log(f"❌ Presensi gagal: Hash {fingerprint_hash} tidak ditemukan di database")
+                
+                # Track failed verification
+                self.record_verify_failure(sensor)
+        else:
+            self.log(f"⚠️ Verification request without fingerprint_hash")
+    
+    def handle_verify_response(self, msg, data):
+        """verify/response: hasil verifikasi dari ESP32"""
+        data, encoding, _ = decode_verify_payload(msg.payload)
+        if data is None:
+            self.log(f"⚠️ Verify response {encoding} terpotong ({len(msg.payload)} bytes), diabaikan")
+            return
+        status = data.get("status", "")
+        
+        if status == "success":
+            # ESP32 successfully verified fingerprint
+            user_id = data.get("user_id")
+            sensor = data.get("sensor", self.active_sensor)
+            
+            # Get user info from database
+            result = self.db.query_one('SELECT name FROM users WHERE id_user = ?', (user_id,))
             
-            # Handle verify/response topic - verification result from ESP32
-            elif msg.topic == self.TOPIC_VERIFY_RESPONSE:
-                status = data.get("status", "")
+            if result:
+                user_name = result[0]
                 
-                if status == "success":
-                    # ESP32 successfully verified fingerprint
-                    user_id = data.get("user_id")
-                    sensor = data.get("sensor", self.active_sensor)
-                    
-                    # Get user info from database
-                    self.cursor.execute('SELECT name FROM users WHERE id_user = ?', (user_id,))
-                    result = self.cursor.fetchone()
-                    
-                    if result:
-                        user_name = result[0]
-                        
-                        # Save attendance log with local time
-                        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        match_score = 95  # Default confidence score for ESP32 internal match
-                        
-                        self.cursor.execute(
-                            'INSERT INTO attendance_logs (user_id, user_name, check_in_time, match_score, location) VALUES (?, ?, ?, ?, ?)',
-                            (user_id, user_name, current_time, match_score, f"Sensor {sensor}")
-                        )
-                        self.conn.commit()
-                        
-                        self.log(f"✅ Presensi berhasil: {user_name} (ID: {user_id}) - Sensor: {sensor}")
-                        
-                        # Update sensor metrics
-                        if sensor in self.sensor_metrics:
-                            self.sensor_metrics[sensor]['success_count'] += 1
-                            self.sensor_metrics[sensor]['total_scans'] += 1
-                            self.sensor_metrics[sensor]['last_update'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            
-                            # Update confidence
-                            if self.sensor_metrics[sensor]['avg_confidence'] == 0:
-                                self.sensor_metrics[sensor]['avg_confidence'] = match_score
-                            else:
-                                current_avg = self.sensor_metrics[sensor]['avg_confidence']
-                                total = self.sensor_metrics[sensor]['success_count']
-                                self.sensor_metrics[sensor]['avg_confidence'] = ((current_avg * (total - 1)) + match_score) / total
-                        
-                        # Refresh attendance logs display
-                        self.root.after(0, self.refresh_attendance_logs)
-                    else:
-                        self.log(f"⚠️ User ID {user_id} tidak ditemukan di database")
+                # Save attendance log with local time
+                current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                match_score = 95  # Default confidence score for ESP32 internal match
                 
-                elif status == "no_match":
-                    # No match found
-                    sensor = data.get("sensor", self.active_sensor)
-                    self.log(f"❌ Verifikasi gagal: Sidik jari tidak dikenali - Sensor: {sensor}")
-                    
-                    # Track failed verification
-                    if sensor in self.sensor_metrics:
-                        self.sensor_metrics[sensor]['fail_count'] += 1
-                        self.sensor_metrics[sensor]['total_scans'] += 1
-                        self.sensor_metrics[sensor]['last_update'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Handle system/health topic - system health status
-            elif msg.topic == self.TOPIC_SYS_HEALTH:
-                state = data.get("state", "unknown")
-                mode = data.get("mode", "unknown")
-                sensor = data.get("sensor", "unknown")
-                wifi_rssi = data.get("wifi_rssi", 0)
-                free_heap = data.get("free_heap", 0)
-                uptime_ms = data.get("uptime_ms", 0)
-                relay_state = data.get("relay_state", "closed")
-                battery = data.get("battery_voltage", 0)
+                with self.db.writer() as conn:
+                    conn.execute(
+                        'INSERT INTO attendance_logs (user_id, user_name, check_in_time, match_score, location) VALUES (?, ?, ?, ?, ?)',
+                        (user_id, user_name, current_time, match_score, f"Sensor {sensor}")
+                    )
+                
+                self.log(f"✅ Presensi berhasil: {user_name} (ID: {user_id}) - Sensor: {sensor}")
                 
-                # Update sensor status display
-                if sensor != "unknown":
-                    self.active_sensor = sensor
-                    self.sensor_status.config(text=sensor)
+                # Update sensor metrics
+                self.record_verify_success(sensor, match_score)
                 
-                # Update mode status display from ESP32 health message
-                if mode != "unknown":
-                    # Update the mode_status label to reflect ESP32's current mode
-                    self.mode_status.config(text=mode.upper())
-                    self.log(f"📡 Mode synchronized from ESP32: {mode.upper()}")
+                # Refresh attendance logs display
+                self.ui.refresh(self.append_new_logs)
+            else:
+                self.log(f"⚠️ User ID {user_id} tidak ditemukan di database")
+        
+        elif status == "no_match":
+            # No match found
+            sensor = data.get("sensor", self.active_sensor)
+            self.log(f"❌ Verifikasi gagal: Sidik jari tidak dikenali - Sensor: {sensor}")
+            
+            # Track failed verification
+            self.record_verify_failure(sensor)
+    
+    def handle_system_health(self, msg, data):
+        """system/health: simpan payload health terbaru ESP32 (di-decode dan diterapkan oleh sample_telemetry)"""
+        self.telemetry.put("health", msg.payload)
+    
+    def sample_telemetry(self):
+        """Terapkan telemetry terbaru ke UI, dijadwalkan ulang tiap telemetry_sample_ms"""
+        try:
+            self.telemetry_seq, changed = self.telemetry.take_changed(self.telemetry_seq)
+            
+            if "metrics" in changed:
+                try:
+                    data, lossy = decode_mqtt_payload(changed["metrics"])
+                    self.on_mqtt_payload(self.metrics_route, self.TOPIC_SENSOR_METRICS, data, lossy)
+                    metrics = {name: data[name] for name in self.sensor_list if isinstance(data.get(name), dict)}
+                    if metrics:
+                        self.apply_sensor_metrics(metrics)
+                except Exception as e:
+                    self.log(f"⚠️ Error parsing sensor metrics: {e}")
+            
+            if "health" in changed:
+                try:
+                    data, lossy = decode_mqtt_payload(changed["health"])
+                    self.on_mqtt_payload(self.health_route, self.TOPIC_SYS_HEALTH, data, lossy)
+                    self.apply_system_health(data)
+                except Exception as e:
+                    self.log(f"⚠️ Error parsing system health: {e}")
+        finally:
+            # Payload rusak tidak boleh menghentikan sampling
+            self.root.after(self.telemetry_sample_ms, self.sample_telemetry)
+    
+    def apply_sensor_metrics(self, metrics):
+        """Update sensor_metrics dari payload metrics ESP32 lalu redraw card sekali"""
+        with self.metrics_lock:
+            for sensor_name, sensor_data in metrics.items():
+                if sensor_name not in self.sensor_metrics:
+                    continue
+                # Update metrics dari ESP32
+                self.sensor_metrics[sensor_name]['total_scans'] = sensor_data.get('total_scans', 0)
+                self.sensor_metrics[sensor_name]['success_count'] = sensor_data.get('success_count', 0)
+                self.sensor_metrics[sensor_name]['fail_count'] = sensor_data.get('fail_count', 0)
+                self.sensor_metrics[sensor_name]['avg_confidence'] = sensor_data.get('avg_confidence', 0)
                 
-                # Format uptime
-                uptime_sec = uptime_ms // 1000
-                uptime_str = f"{uptime_sec//3600}h{(uptime_sec%3600)//60}m{uptime_sec%60}s"
+                # Update response time
+                avg_resp_time = sensor_data.get('avg_response_time', 0)
+                if avg_resp_time > 0:
+                    self.sensor_metrics[sensor_name]['response_time'] = [avg_resp_time]
                 
-                self.log(f"💓 Health: State={state}, Mode={mode}, Sensor={sensor}, WiFi={wifi_rssi}dBm, Heap={free_heap}B, Uptime={uptime_str}, Relay={relay_state}, Battery={battery}V")
+                # Update last scan time
+                last_scan = sensor_data.get('last_scan_time', 0)
+                if last_scan > 0:
+                    self.sensor_metrics[sensor_name]['last_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        except Exception as e:
-            import traceback
-            self.log(f"❌ Error processing MQTT message from topic '{msg.topic}': {str(e)}")
-            self.log(f"   Payload length: {len(msg.payload)} bytes")
-            # Log traceback for debugging (optional)
-            # self.log(f"   Traceback: {traceback.format_exc()}")
-    
-    def publish_command(self, command, topic=None):
-        """Publish command ke ESP32"""
-        if not self.is_connected:
+        self.update_sensor_cards()
+    
+    def apply_system_health(self, data):
+        """Update label sensor/mode dari pesan health terbaru ESP32"""
+        state = data.get("state", "unknown")
+        mode = data.get("mode", "unknown")
+        sensor = data.get("sensor", "unknown")
+        wifi_rssi = data.get("wifi_rssi", 0)
+        free_heap = data.get("free_heap", 0)
+        uptime_ms = data.get("uptime_ms", 0)
+        relay_state = data.get("relay_state", "closed")
+        battery = data.get("battery_voltage", 0)
+        
+        # Update sensor status display
+        if sensor != "unknown":
+            self.active_sensor = sensor
+            self.sensor_status.config(text=sensor)
+        
+        # Update mode status display from ESP32 health message
+        if mode != "unknown" and self.mode_status.cget("text") != mode.upper():
+            # Update the mode_status label to reflect ESP32's current mode
+            self.mode_status.config(text=mode.upper())
+            self.log(f"📡 Mode synchronized from ESP32: {mode.upper()}")
+        
+        # Format uptime
+        uptime_sec = uptime_ms // 1000
+        uptime_str = f"{uptime_sec//3600}h{(uptime_sec%3600)//60}m{uptime_sec%60}s"
+        
+        self.log(f"💓 Health: State={state}, Mode={mode}, Sensor={sensor}, WiFi={wifi_rssi}dBm, Heap={free_heap}B, Uptime={uptime_str}, Relay={relay_state}, Battery={battery}V")
+    
+    def show_enrolled_template(self, fingerprint_hash, sensor_type, fingerprint_id):
+        """Tampilkan hash hasil enrollment dan aktifkan Save User (thread Tk)"""
+        # Update textbox display
+        self.template_display.config(state='normal')
+        self.template_display.delete(0, tk.END)
+        self.template_display.insert(0, fingerprint_hash)
+        self.template_display.config(state='readonly', fg=self.colors['success'])
+        
+        # ✅ ENABLE button Save User setelah dapat fingerprint hash
+        self.save_user_btn.config(state='normal', cursor='hand2')
+        
+        # Show success message
+        messagebox.showinfo("Sukses", 
+            f"Fingerprint template berhasil ditambahkan!\n\n" +
+            f"Hash: {fingerprint_hash}\n" +
+            f"Sensor: {sensor_type}\n" +
+            f"ID di sensor: {fingerprint_id}\n\n" +
+            f"Silakan klik 'Save User' untuk menyimpan data.")
+    
+    def show_enroll_failed(self):
+        """Tampilkan enrollment gagal dan nonaktifkan Save User (thread Tk)"""
+        self.template_display.config(state='normal')
+        self.template_display.delete(0, tk.END)
+        self.template_display.insert(0, "❌ Enrollment failed")
+        self.template_display.config(state='readonly', fg=self.colors['error'])
+        
+        # ✅ DISABLE button Save User jika enrollment gagal
+        self.save_user_btn.config(state='disabled', cursor='arrow')
+    
+    def apply_esp_mode(self, mode_upper):
+        """Sinkronkan tombol dan form dengan mode dari ESP32 (thread Tk)"""
+        # Update internal state
+        self.current_mode.set(mode_upper)
+        self.mode_status.config(text=mode_upper)
+        
+        # Update button states and form display
+        if mode_upper == "PRESENSI":
+            self.btn_mode_presensi.config_color(self.colors['primary'])
+            self.btn_mode_presensi.config(state='disabled', cursor='arrow')
+            self.btn_mode_daftar.config_color(self.colors['secondary'])
+            self.btn_mode_daftar.config(state='normal', cursor='hand2')
+            
+            # Switch form display
+            self.reg_title.config(text="✅ Form Presensi")
+            self.form_frame_daftar.pack_forget()
+            self.btn_frame_daftar.pack_forget()
+            self.form_frame_presensi.pack(fill="x", padx=20, pady=10)
+            
+            # Reset display fields
+            self.display_id.config(text="-", fg=self.colors['accent'])
+            self.display_name.config(text="-", fg=self.colors['text_dark'])
+            self.display_email.config(text="-")
+            self.display_position.config(text="-")
+        else:  # ENROLL/DAFTAR
+            self.btn_mode_presensi.config_color(self.colors['secondary'])
+            self.btn_mode_presensi.config(state='normal', cursor='hand2')
+            self.btn_mode_daftar.config_color(self.colors['primary'])
+            self.btn_mode_daftar.config(state='disabled', cursor='arrow')
+            
+            # Switch form display
+            self.reg_title.config(text="📝 Pendaftaran User Baru")
+            self.form_frame_presensi.pack_forget()
+            self.form_frame_daftar.pack(fill="x", padx=20, pady=10)
+            self.btn_frame_daftar.pack(pady=20)
+    
+    def on_attendance_committed(self, rows):
+        """Callback dari writer thread setelah batch log presensi di-commit"""
+        self.ui.refresh(self.append_new_logs)
+    
+    def on_attendance_write_error(self, error, row_count):
+        """Callback dari writer thread saat batch gagal di-commit (akan dicoba lagi)"""
+        self.log(f"❌ Error menyimpan {row_count} log presensi: {str(error)} (akan dicoba lagi)")
+    
+    def record_verify_success(self, sensor, match_score):
+        """Update sensor metrics untuk verifikasi berhasil (thread-safe)"""
+        if sensor not in self.sensor_metrics:
+            return
+        with self.metrics_lock:
+            metrics = self.sensor_metrics[sensor]
+            metrics['success_count'] += 1
+            metrics['total_scans'] += 1
+            metrics['last_update'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            
+            # Track confidence score
+            if metrics['avg_confidence'] == 0:
+                metrics['avg_confidence'] = match_score
+            else:
+                # Running average
+                current_avg = metrics['avg_confidence']
+                total = metrics['success_count']
+                metrics['avg_confidence'] = ((current_avg * (total - 1)) + match_score) / total
+    
+    def record_verify_failure(self, sensor):
+        """Update sensor metrics untuk verifikasi gagal (thread-safe)"""
+        if sensor not in self.sensor_metrics:
+            return
+        with self.metrics_lock:
+            metrics = self.sensor_metrics[sensor]
+            metrics['fail_count'] += 1
+            metrics['total_scans'] += 1
+            metrics['last_update'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    def publish_command(self, command, topic=None, ttl_s=None):
+        """Publish command ke ESP32 (di-spool selama reconnect, kedaluwarsa setelah ttl_s)"""
+        if not self.mqtt_active():
             messagebox.showwarning("Peringatan", "Belum terkoneksi ke MQTT Broker!")
             return False
         
@@ -1993,8 +4430,10 @@ class AttendanceApp:
                     topic = self.TOPIC_CMD_MODE  # Default
             
             payload = json.dumps(command)
-            self.log(f"📡 MQTT Publish -> Topic: {topic}, Payload: {payload}")
-            self.mqtt_client.publish(topic, payload)
+            if self.publish_or_spool(topic, payload, ttl_s=ttl_s):
+                self.log(f"📡 MQTT Publish -> Topic: {topic}, Payload: {payload}")
+            else:
+                self.log(f"📥 MQTT terputus, perintah masuk spool -> Topic: {topic}, Payload: {payload}")
             return True
         except Exception as e:
             self.log(f"❌ Error publish: {str(e)}")
@@ -2008,7 +4447,7 @@ class AttendanceApp:
             self.log(f"ℹ️ Sudah dalam mode {mode}")
             return
         
-        if not self.is_connected:
+        if not self.mqtt_active():
             self.log("⚠️ Tidak terhubung ke MQTT. Mode tidak dapat diubah (tetap idle)")
             messagebox.showwarning("MQTT Disconnected", "Harap connect ke MQTT terlebih dahulu!")
             return
@@ -2025,7 +4464,7 @@ class AttendanceApp:
     
     def cycle_sensor(self):
         """Cycle through available sensors: FPM10A -> AS608 -> ZW101 -> FPM10A"""
-        if not self.is_connected:
+        if not self.mqtt_active():
             self.log("⚠️ Tidak terhubung ke MQTT. Sensor tidak dapat diubah")
             messagebox.showwarning("MQTT Disconnected", "Harap connect ke MQTT terlebih dahulu!")
             return
@@ -2058,7 +4497,9 @@ class AttendanceApp:
             self.update_sensor_cards()
     
     def update_presensi_display(self, user_id, name, email, position):
-        """Update display form presensi dengan data user yang melakukan presensi"""
+        """Update display form presensi dengan data user yang melakukan presensi (thread Tk)"""
+        if self.current_mode.get() != "PRESENSI":
+            return
         try:
             self.display_id.config(text=str(user_id), fg=self.colors['success'])
             self.display_name.config(text=name, fg=self.colors['success'])
@@ -2090,7 +4531,7 @@ class AttendanceApp:
                 messagebox.showerror("Error", "Nama harus diisi terlebih dahulu!")
                 return
             
-            if not self.is_connected:
+            if not self.mqtt_active():
                 messagebox.showwarning("Peringatan", "Belum terkoneksi ke MQTT Broker!")
                 return
             
@@ -2143,8 +4584,7 @@ class AttendanceApp:
                 return
             
             # Cek apakah ID sudah ada (TIDAK BOLEH DUPLIKAT)
-            self.cursor.execute('SELECT id_user, name FROM users WHERE id_user = ?', (user_id,))
-            existing_user = self.cursor.fetchone()
+            existing_user = self.db.query_one('SELECT id_user, name FROM users WHERE id_user = ?', (user_id,))
             if existing_user:
                 messagebox.showerror("Error", 
                     f"ID User {user_id} sudah digunakan oleh '{existing_user[1]}'!\n\n" +
@@ -2154,12 +4594,17 @@ class AttendanceApp:
             
             # Simpan ke database dengan hash yang sudah didapat
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            self.cursor.execute('''
-                INSERT INTO users (id_user, name, email, position, fingerprint_template, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, user_name, user_email, user_position, 
-                  self.pending_fingerprint_hash, current_time, current_time))
-            self.conn.commit()
+            with self.db.writer() as conn:
+                conn.execute('''
+                    INSERT INTO users (id_user, name, email, position, fingerprint_template, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (user_id, user_name, user_email, user_position, 
+                      self.pending_fingerprint_hash, current_time, current_time))
+            
+            # Update index hash -> user
+            self.users[user_id] = user_name
+            self.user_index.put(self.pending_fingerprint_hash, user_id, user_name, user_email, user_position)
+            self.negative_cache.invalidate(self.pending_fingerprint_hash)
             
             self.log(f"✅ User berhasil disimpan: {user_name} (ID: {user_id}, Hash: {self.pending_fingerprint_hash})")
             
@@ -2192,8 +4637,7 @@ class AttendanceApp:
             user_id = int(user_id_str)
             
             # Cek apakah ID sudah ada di database
-            self.cursor.execute('SELECT name FROM users WHERE id_user = ?', (user_id,))
-            existing_user = self.cursor.fetchone()
+            existing_user = self.db.query_one('SELECT name FROM users WHERE id_user = ?', (user_id,))
             
             if existing_user:
                 # ID sudah digunakan - tampilkan warning di log
@@ -2247,7 +4691,7 @@ class AttendanceApp:
         for item in self.user_tree.get_children():
             self.user_tree.delete(item)
         
-        self.cursor.execute('''
+        rows = self.db.query('''
             SELECT id_user, name, email, position, fingerprint_template, created_at 
             FROM users ORDER BY id_user
         ''')
@@ -2255,7 +4699,7 @@ class AttendanceApp:
         count = 0
         sensor_counts = {"FPM10A": 0, "AS608": 0, "ZW101": 0}
         
-        for user_id, name, email, position, fp_hash, created_at in self.cursor.fetchall():
+        for user_id, name, email, position, fp_hash, created_at in rows:
             email_display = email or "-"
             position_display = position or "-"
             hash_display = fp_hash if fp_hash else "-"
@@ -2290,8 +4734,7 @@ class AttendanceApp:
         user_id = int(item['values'][0])
         
         # Ambil data dari database
-        self.cursor.execute('SELECT name, email, position FROM users WHERE id_user = ?', (user_id,))
-        result = self.cursor.fetchone()
+        result = self.db.query_one('SELECT name, email, position FROM users WHERE id_user = ?', (user_id,))
         if not result:
             return
         
@@ -2334,13 +4777,14 @@ class AttendanceApp:
             
             # Update dengan waktu lokal
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            self.cursor.execute('''
-                UPDATE users SET name = ?, email = ?, position = ?, updated_at = ?
-                WHERE id_user = ?
-            ''', (new_name, new_email, new_position, current_time, user_id))
-            self.conn.commit()
+            with self.db.writer() as conn:
+                conn.execute('''
+                    UPDATE users SET name = ?, email = ?, position = ?, updated_at = ?
+                    WHERE id_user = ?
+                ''', (new_name, new_email, new_position, current_time, user_id))
             
             self.users[user_id] = new_name
+            self.user_index.update_user(user_id, new_name, new_email, new_position)
             # self.sync_users_to_esp()  # Not needed - ESP32 uses MQTT verification
             self.refresh_user_list()
             self.log(f"✏️ User ID {user_id} berhasil diupdate")
@@ -2366,12 +4810,15 @@ class AttendanceApp:
             f"Hapus user {user_name} (ID: {user_id})?\n\nIni akan menghapus:\n- Data user\n- Template fingerprint\n- Semua log presensi"):
             
             # Hapus dari database
-            self.cursor.execute('DELETE FROM users WHERE id_user = ?', (user_id,))
-            self.conn.commit()
+            with self.db.writer() as conn:
+                conn.execute('DELETE FROM users WHERE id_user = ?', (user_id,))
             
             # Hapus dari dict
             if user_id in self.users:
                 del self.users[user_id]
+            self.user_index.remove_user(user_id)
+            self.checkin_window.forget(user_id)
+            self.log_pager.invalidate_counts()
             
             # Note: No need to send delete to ESP32 (no local storage)
             # ESP32 uses MQTT verification - desktop database is the source of truth
@@ -2388,7 +4835,7 @@ class AttendanceApp:
         )
         
         if filename:
-            self.cursor.execute('''
+            rows = self.db.query('''
                 SELECT id, name, email, position, 
                        CASE WHEN fingerprint_template IS NOT NULL THEN 'Ada' ELSE 'Tidak' END as template,
                        created_at
@@ -2398,66 +4845,179 @@ class AttendanceApp:
             with open(filename, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
                 writer.writerow(['ID', 'Nama', 'Email', 'Jabatan', 'Template', 'Tanggal Daftar'])
-                writer.writerows(self.cursor.fetchall())
+                writer.writerows(rows)
             
             messagebox.showinfo("Sukses", f"Data user berhasil diexport ke:\n{filename}")
             self.log(f"📤 Data user diexport ke {filename}")
     
-    def refresh_attendance_logs(self):
-        """Refresh log presensi"""
+    def refresh_attendance_logs(self, recount=False):
+        """Refresh log presensi (recount=True: hitung ulang total dari database)"""
+        if recount:
+            self.log_pager.invalidate_counts()
+        self.log_pager.set_filter()
+        self.reload_log_view()
+    
+    def reload_log_view(self, label_suffix=""):
+        """Bangun ulang log view dari halaman terbaru sesuai filter aktif"""
         for item in self.log_tree.get_children():
             self.log_tree.delete(item)
+        # Penomoran stripe: seq_top turun saat row ditambah di atas, seq_bottom naik di bawah
+        self.log_seq_top = 0
+        self.log_seq_bottom = 0
+        self.log_has_newer = False
+        self.log_has_older = True
+        
+        # Batas untuk append berikutnya, dibaca sebelum halaman pertama supaya tidak ada row terlewat
+        self.log_max_id = self.log_pager.max_log_id()
+        rows = self.log_pager.first_page()
+        self.insert_log_rows(rows, at_top=False)
+        self.log_has_older = len(rows) == self.log_pager.page_size
+        self.log_tree.yview_moveto(0)
+        
+        if len(rows) < self.log_pager.page_size:
+            # Semua row filter ini sudah termuat, tidak perlu COUNT(*)
+            self.log_total = len(rows)
+            self.log_pager.seed_count(sum(1 for row in rows if row[0] <= self.log_max_id), self.log_max_id)
+        else:
+            self.log_total = self.log_pager.count(self.log_max_id)
+        self.log_label_suffix = label_suffix
+        self.log_count_label.config(text=f"Total: {self.log_total} logs{label_suffix}")
+    
+    def append_new_logs(self):
+        """Tambahkan hanya log baru (log_id > log_max_id) di atas log_tree
         
-        self.cursor.execute('''
-            SELECT log_id, user_id, user_name, check_in_time, match_score, fingerprint_hash
-            FROM attendance_logs 
-            ORDER BY check_in_time DESC 
-            LIMIT 1000
-        ''')
+        Dipanggil setelah writer commit. Rebuild penuh hanya saat filter berubah
+        atau bila log baru lebih dari satu halaman.
+        """
+        max_id = self.log_pager.max_log_id()
+        if max_id <= self.log_max_id:
+            return
+        rows = self.log_pager.since(self.log_max_id, self.log_pager.page_size + 1)
+        self.log_max_id = max_id
+        if len(rows) > self.log_pager.page_size:
+            self.reload_log_view(self.log_label_suffix)
+            return
+        # Row bisa sudah ikut termuat oleh halaman pertama
+        rows = [row for row in rows if not self.log_tree.exists(str(row[0]))]
+        if not rows:
+            return
         
-        count = 0
-        for log_id, user_id, user_name, timestamp, score, fp_hash in self.cursor.fetchall():
-            # Alternating row colors
-            tag = 'evenrow' if count % 2 == 0 else 'oddrow'
-            self.log_tree.insert("", "end", values=(
-                log_id, user_id, user_name, timestamp, score or "-", fp_hash or "-"
-            ), tags=(tag,))
-            count += 1
+        self.log_total += len(rows)
+        self.log_count_label.config(text=f"Total: {self.log_total} logs{self.log_label_suffix}")
+        if self.log_has_newer:
+            # User sedang melihat halaman lama, row baru dimuat saat scroll ke atas
+            return
         
-        self.log_count_label.config(text=f"Total: {count} logs")
+        first, _ = self.log_tree.yview()
+        at_head = first <= 0.0
+        total_before = len(self.log_tree.get_children())
+        self.insert_log_rows(rows, at_top=True)
+        
+        children = self.log_tree.get_children()
+        excess = len(children) - self.log_page_size * self.log_window_pages
+        if excess > 0:
+            self.log_tree.delete(*children[-excess:])
+            self.log_has_older = True
+        if not at_head:
+            # Jangan geser baris yang sedang dibaca user
+            visible_index = first * total_before + len(rows)
+            self.log_tree.yview_moveto(visible_index / len(self.log_tree.get_children()))
+    
+    def insert_log_rows(self, rows, at_top):
+        """Masukkan rows (urut terbaru dulu) di atas atau bawah log_tree"""
+        if at_top:
+            # Sisipkan dari yang paling lama supaya urutan akhir tetap terbaru di atas
+            for row in reversed(rows):
+                self.log_seq_top -= 1
+                self.insert_log_row(row, 0, self.log_seq_top)
+        else:
+            for row in rows:
+                self.insert_log_row(row, "end", self.log_seq_bottom)
+                self.log_seq_bottom += 1
+    
+    def insert_log_row(self, row, index, seq):
+        log_id, user_id, user_name, timestamp, score, fp_hash = row
+        tag = 'evenrow' if seq % 2 == 0 else 'oddrow'
+        self.log_tree.insert("", index, iid=str(log_id), values=(
+            log_id, user_id, user_name, timestamp, score or "-", fp_hash or "-"
+        ), tags=(tag,))
+    
+    def log_row_key(self, item):
+        """Kunci keyset (check_in_time, log_id) dari item log_tree"""
+        values = self.log_tree.item(item, 'values')
+        return (values[3], int(item))
+    
+    def on_log_tree_scroll(self, first, last):
+        """yscrollcommand log_tree: update scrollbar lalu muat halaman bila mendekati tepi"""
+        self.log_scrollbar.set(first, last)
+        if self.log_page_pending:
+            return
+        if float(last) >= 0.9 and self.log_has_older:
+            self.log_page_pending = True
+            self.root.after_idle(self.load_older_logs)
+        elif float(first) <= 0.1 and self.log_has_newer:
+            self.log_page_pending = True
+            self.root.after_idle(self.load_newer_logs)
+    
+    def load_older_logs(self):
+        """Muat halaman lebih lama di bawah, buang halaman teratas bila window penuh"""
+        try:
+            children = self.log_tree.get_children()
+            if not children:
+                return
+            rows = self.log_pager.older(self.log_row_key(children[-1]))
+            self.log_has_older = len(rows) == self.log_pager.page_size
+            if not rows:
+                return
+            first, _ = self.log_tree.yview()
+            total_before = len(children)
+            self.insert_log_rows(rows, at_top=False)
+            
+            children = self.log_tree.get_children()
+            excess = len(children) - self.log_page_size * self.log_window_pages
+            if excess > 0:
+                self.log_tree.delete(*children[:excess])
+                self.log_has_newer = True
+                # Pertahankan posisi baris yang sedang terlihat
+                visible_index = max(0.0, first * total_before - excess)
+                self.log_tree.yview_moveto(visible_index / (len(children) - excess))
+        finally:
+            self.log_page_pending = False
+    
+    def load_newer_logs(self):
+        """Muat halaman lebih baru di atas, buang halaman terbawah bila window penuh"""
+        try:
+            children = self.log_tree.get_children()
+            if not children:
+                return
+            rows = self.log_pager.newer(self.log_row_key(children[0]))
+            self.log_has_newer = len(rows) == self.log_pager.page_size
+            if not rows:
+                return
+            first, _ = self.log_tree.yview()
+            total_before = len(children)
+            self.insert_log_rows(rows, at_top=True)
+            
+            children = self.log_tree.get_children()
+            excess = len(children) - self.log_page_size * self.log_window_pages
+            if excess > 0:
+                self.log_tree.delete(*children[-excess:])
+                self.log_has_older = True
+            visible_index = first * total_before + len(rows)
+            self.log_tree.yview_moveto(visible_index / len(self.log_tree.get_children()))
+        finally:
+            self.log_page_pending = False
     
     def filter_logs(self):
         """Filter log berdasarkan keyword"""
         keyword = self.filter_var.get().strip().lower()
         
-        for item in self.log_tree.get_children():
-            self.log_tree.delete(item)
-        
         if keyword:
-            self.cursor.execute('''
-                SELECT log_id, user_id, user_name, check_in_time, match_score, fingerprint_hash
-                FROM attendance_logs 
-                WHERE LOWER(user_name) LIKE ? OR CAST(user_id AS TEXT) LIKE ?
-                ORDER BY check_in_time DESC 
-                LIMIT 1000
-            ''', (f'%{keyword}%', f'%{keyword}%'))
+            self.log_pager.set_filter('LOWER(user_name) LIKE ? OR CAST(user_id AS TEXT) LIKE ?',
+                                      (f'%{keyword}%', f'%{keyword}%'))
         else:
-            self.cursor.execute('''
-                SELECT log_id, user_id, user_name, check_in_time, match_score, fingerprint_hash
-                FROM attendance_logs 
-                ORDER BY check_in_time DESC 
-                LIMIT 1000
-            ''')
-        
-        count = 0
-        for log_id, user_id, user_name, timestamp, score, fp_hash in self.cursor.fetchall():
-            tag = 'evenrow' if count % 2 == 0 else 'oddrow'
-            self.log_tree.insert("", "end", values=(
-                count + 1, user_id, user_name, timestamp, score or "-", fp_hash or "-"
-            ), tags=(tag,))
-            count += 1
-        
-        self.log_count_label.config(text=f"Total: {count} logs (filtered)")
+            self.log_pager.set_filter()
+        self.reload_log_view(" (filtered)")
     
     def filter_logs_by_date(self):
         """Filter log berdasarkan tanggal, bulan, dan tahun"""
@@ -2465,10 +5025,6 @@ class AttendanceApp:
         month = self.filter_month.get()
         year = self.filter_year.get()
         
-        # Clear treeview
-        for item in self.log_tree.get_children():
-            self.log_tree.delete(item)
-        
         # Mapping bulan ke angka
         month_map = {
             'Januari': 1, 'Februari': 2, 'Maret': 3, 'April': 4,
@@ -2476,42 +5032,31 @@ class AttendanceApp:
             'September': 9, 'Oktober': 10, 'November': 11, 'Desember': 12
         }
         
-        # Build query berdasarkan filter
-        query = '''
-            SELECT log_id, user_id, user_name, check_in_time, match_score, fingerprint_hash
-            FROM attendance_logs 
-            WHERE 1=1
-        '''
-        params = []
-        
-        # Filter tahun
-        if year != 'Semua':
-            query += " AND strftime('%Y', check_in_time) = ?"
-            params.append(year)
-        
-        # Filter bulan
-        if month != 'Semua':
-            month_num = month_map.get(month)
-            if month_num:
-                query += " AND strftime('%m', check_in_time) = ?"
-                params.append(f'{month_num:02d}')
-        
-        # Filter tanggal
-        if day != 'Semua':
-            query += " AND strftime('%d', check_in_time) = ?"
-            params.append(f'{int(day):02d}')
+        month_num = month_map.get(month) if month != 'Semua' else None
+        day_num = int(day) if day != 'Semua' else None
         
-        query += " ORDER BY check_in_time DESC LIMIT 1000"
+        # Build filter (rentang waktu supaya index check_in_time terpakai)
+        where = ''
+        params = []
         
-        self.cursor.execute(query, params)
+        if year != 'Semua' or month_num or day_num:
+            if year != 'Semua':
+                years = [int(year)]
+            else:
+                # Tanpa tahun: satu rentang per tahun yang ada datanya (MIN/MAX lewat index)
+                first, last = self.db.query_one('SELECT MIN(check_in_time), MAX(check_in_time) FROM attendance_logs')
+                years = range(int(first[:4]), int(last[:4]) + 1) if first else []
+            ranges = date_filter_ranges(years, month_num, day_num)
+            if ranges:
+                where = " OR ".join(["(check_in_time >= ? AND check_in_time < ?)"] * len(ranges))
+                for start, end in ranges:
+                    params.extend((start, end))
+            else:
+                where = "0"
         
-        count = 0
-        for log_id, user_id, user_name, timestamp, score, fp_hash in self.cursor.fetchall():
-            tag = 'evenrow' if count % 2 == 0 else 'oddrow'
-            self.log_tree.insert("", "end", values=(
-                count + 1, user_id, user_name, timestamp, score or "-", fp_hash or "-"
-            ), tags=(tag,))
-            count += 1
+        self.log_pager.set_filter(where, params)
+        if where and self.activity_log.is_enabled_for(logging.DEBUG):
+            self.check_log_query_plan(*self.log_pager.build_query())
         
         # Update label dengan info filter
         filter_info = []
@@ -2523,7 +5068,18 @@ class AttendanceApp:
             filter_info.append(f"Tahun: {year}")
         
         filter_text = f" ({', '.join(filter_info)})" if filter_info else ""
-        self.log_count_label.config(text=f"Total: {count} logs{filter_text}")
+        self.reload_log_view(filter_text)
+    
+    def check_log_query_plan(self, query, params=()):
+        """EXPLAIN QUERY PLAN untuk query log (hanya saat level DEBUG), laporkan apakah
+        rentang tanggal dicari lewat idx_attendance_time"""
+        plan = [row[-1] for row in self.db.query('EXPLAIN QUERY PLAN ' + query, params)]
+        uses_index = plan_searches_index(plan, 'idx_attendance_time')
+        if uses_index:
+            self.log(f"🔎 Query plan: SEARCH lewat idx_attendance_time ({len(plan)} langkah)", logging.DEBUG)
+        else:
+            self.log(f"⚠️ Query plan tanpa SEARCH idx_attendance_time: {' | '.join(plan)}", logging.DEBUG)
+        return uses_index
     
     def reset_date_filter(self):
         """Reset filter tanggal ke default"""
@@ -2536,9 +5092,9 @@ class AttendanceApp:
     def clear_logs(self):
         """Hapus semua log presensi"""
         if messagebox.askyesno("Konfirmasi", "Hapus SEMUA log presensi?"):
-            self.cursor.execute('DELETE FROM attendance_logs')
-            self.conn.commit()
-            self.refresh_attendance_logs()
+            with self.db.writer() as conn:
+                conn.execute('DELETE FROM attendance_logs')
+            self.refresh_attendance_logs(recount=True)
             self.log("🗑️ Semua log presensi dihapus")
     
     def export_logs(self):
@@ -2555,13 +5111,13 @@ class AttendanceApp:
                     writer = csv.writer(f)
                     writer.writerow(['No', 'User ID', 'Nama', 'Waktu Presensi', 'Score', 'Lokasi'])
                     
-                    self.cursor.execute('''
+                    rows = self.db.query('''
                         SELECT log_id, user_id, user_name, check_in_time, match_score, location
                         FROM attendance_logs 
                         ORDER BY check_in_time DESC
                     ''')
                     
-                    for idx, (log_id, user_id, user_name, timestamp, score, location) in enumerate(self.cursor.fetchall(), 1):
+                    for idx, (log_id, user_id, user_name, timestamp, score, location) in enumerate(rows, 1):
                         writer.writerow([idx, user_id, user_name, timestamp, score or "-", location])
                 
                 messagebox.showinfo("Sukses", f"Log berhasil diekspor ke:\n{filename}")
@@ -2569,20 +5125,65 @@ class AttendanceApp:
             except Exception as e:
                 messagebox.showerror("Error", f"Gagal export: {str(e)}")
     
-    def log(self, message):
-        """Tambahkan log ke text widget"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert("end", f"[{timestamp}] {message}\n")
-        self.log_text.see("end")
+    def log(self, message, level=None, exc_info=False):
+        """Tambahkan log ke activity log (thread-safe, widget diisi per tick UI)
+        
+        Tanpa level eksplisit, level ditebak dari prefix: ❌ = ERROR, ⚠️ = WARNING.
+        exc_info=True (di dalam except) menyertakan traceback di file log.
+        """
+        if level is None:
+            if message.startswith("❌"):
+                level = logging.ERROR
+            elif message.startswith("⚠️"):
+                level = logging.WARNING
+            else:
+                level = logging.INFO
+        self.activity_log.add(message, level, exc_info)
+        self.ui.refresh(self.flush_activity_log)
+    
+    def on_ui_error(self, func, error):
+        """Callback UiDispatcher saat update UI gagal (dipanggil di dalam except)"""
+        self.log(f"❌ UI update error in {getattr(func, '__name__', func)}: {error}", exc_info=True)
+    
+    def flush_activity_log(self):
+        """Masukkan baris log tertunda ke log_text (sekali per tick UI)"""
+        self.activity_log.drain(self.log_text)
+    
+    def change_log_level(self, event=None):
+        """Ganti filter level activity log dari UI dan simpan ke settings"""
+        name = self.log_level_var.get()
+        if name not in ActivityLog.LEVELS:
+            return
+        self.activity_log.set_level(ActivityLog.LEVELS[name])
+        with self.db.writer() as conn:
+            conn.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                         ('log_level', name))
+        self.ui.refresh(self.flush_activity_log)
     
     def on_closing(self):
         """Handler saat aplikasi ditutup"""
-        if self.is_connected:
-            self.disconnect_mqtt()
-        self.conn.close()
+        self.ui.stop()
+        if self.mqtt_supervisor:
+            self.mqtt_supervisor.stop()
+        self.stop_pipeline()
+        self.outbound_spool.close()
+        
+        # Flush log presensi yang masih tertunda sebelum database ditutup
+        if self.attendance_writer:
+            self.attendance_writer.stop()
+        self.db.close()
+        self.activity_log.close()
         self.root.destroy()
 
 if __name__ == "__main__":
+    if "--bench-codec" in sys.argv:
+        # python main.py --bench-codec : bandingkan encoding verify JSON vs struct1
+        for encoding, result in benchmark_verify_codec().items():
+            print(f"{encoding:8s} request {result['request_bytes']:3d} B, response {result['response_bytes']:3d} B, "
+                  f"decode request {result['decode_request_us']:.2f} µs, "
+                  f"encode response {result['encode_response_us']:.2f} µs")
+        sys.exit(0)
+    
     root = tk.Tk()
     app = AttendanceApp(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
@@ -0,0 +1,34 @@
+import importlib.util
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# main.py desktop ada di root repo (dijalankan sebagai script, bukan package)
+sys.path.insert(0, ROOT)
+
+from main import DEFAULT_DB_PROFILE, AttendanceApp, SQLitePool  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def desktop():
+    """Modul desktop/main.py (nama 'main' bentrok dengan main.py di root)"""
+    spec = importlib.util.spec_from_file_location("verifynger_desktop", os.path.join(ROOT, "desktop", "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    # Terdaftar di sys.modules supaya fungsi worker ShardedMatchPool bisa di-pickle
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def attendance_db(tmp_path):
+    """SQLitePool di file sementara dengan skema lengkap aplikasi (create_schema)"""
+    pool = SQLitePool(str(tmp_path / "attendance.db"))
+    with pool.writer() as conn:
+        AttendanceApp.create_schema(types.SimpleNamespace(db_profile=DEFAULT_DB_PROFILE), conn)
+    yield pool
+    pool.close()
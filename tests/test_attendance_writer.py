@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from main import AttendanceWriter, LatencyTracker
+
+
+def row(user_id, slot, key=None, when="2025-01-01 08:00:00"):
+    return (user_id, f"user{user_id}", when, 90, f"AS608_{user_id}", slot, key)
+
+
+def count_rows(pool):
+    return pool.query_one('SELECT COUNT(*) FROM attendance_logs')[0]
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def writer(attendance_db):
+    writers = []
+
+    def make(**kwargs):
+        w = AttendanceWriter(attendance_db, **kwargs)
+        w.start()
+        writers.append(w)
+        return w
+    yield make
+    for w in writers:
+        w.stop()
+
+
+def test_full_batch_is_committed_without_waiting_for_delay(writer, attendance_db):
+    commits = []
+    w = writer(batch_size=4, max_delay_ms=60_000, on_commit=commits.append)
+    for user_id in range(1, 5):
+        w.submit(row(user_id, 100))
+    wait_until(lambda: w.stats()["batches"] == 1)
+    assert count_rows(attendance_db) == 4
+    assert [len(batch) for batch in commits] == [4]
+
+
+def test_partial_batch_is_committed_after_max_delay(writer, attendance_db):
+    w = writer(batch_size=100, max_delay_ms=50)
+    w.submit(row(1, 100))
+    w.submit(row(2, 100))
+    wait_until(lambda: w.stats()["rows_written"] == 2)
+    assert w.stats()["batches"] == 1
+    assert count_rows(attendance_db) == 2
+
+
+def test_flush_and_stop_drain_pending_rows(writer, attendance_db):
+    w = writer(batch_size=100, max_delay_ms=60_000)
+    w.submit(row(1, 100))
+    assert w.flush()
+    assert count_rows(attendance_db) == 1
+
+    w.submit(row(2, 100))
+    w.submit(row(3, 100))
+    w.stop()
+    assert count_rows(attendance_db) == 3
+    assert not w.flush()  # writer sudah berhenti
+
+
+def test_insert_or_ignore_accounting(writer, attendance_db):
+    commits = []
+    latency = LatencyTracker()
+    w = writer(batch_size=100, max_delay_ms=60_000, on_commit=commits.append, latency=latency)
+    w.submit(row(1, 100, "dev:1:1"))
+    w.submit(row(1, 100, "dev:1:2"))   # slot sama -> diabaikan
+    w.submit(row(2, 100, "dev:1:1"))   # idempotency key sama -> diabaikan
+    w.submit(row(2, 100, "dev:1:3"))
+    assert w.flush()
+    stats = w.stats()
+    assert (stats["rows_written"], stats["rows_ignored"], stats["batches"]) == (2, 2, 1)
+    assert count_rows(attendance_db) == 2
+    assert len(commits) == 1
+    assert latency.stats()["stages"]["commit"]["count"] == 4
+
+    # Batch yang seluruhnya duplikat tidak memanggil on_commit
+    w.submit(row(1, 100, "dev:1:9"))
+    assert w.flush()
+    assert w.stats()["rows_ignored"] == 3
+    assert len(commits) == 1
+
+
+def test_failed_batch_is_reported_and_retried(writer, attendance_db):
+    errors = []
+    with attendance_db.writer() as conn:
+        conn.execute('ALTER TABLE attendance_logs RENAME TO attendance_logs_tmp')
+    w = writer(batch_size=1, max_delay_ms=20, on_error=lambda e, n: errors.append(n))
+    w.submit(row(1, 100))
+    wait_until(lambda: errors)
+    assert w.stats()["failed_batches"] >= 1
+
+    with attendance_db.writer() as conn:
+        conn.execute('ALTER TABLE attendance_logs_tmp RENAME TO attendance_logs')
+    wait_until(lambda: w.stats()["rows_written"] == 1)
+    assert count_rows(attendance_db) == 1
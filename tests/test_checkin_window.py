@@ -0,0 +1,75 @@
+import sqlite3
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+from main import AttendanceApp, CheckinWindow
+
+INSERT = ('INSERT INTO attendance_logs (user_id, user_name, check_in_time, checkin_slot, idempotency_key) '
+          'VALUES (?, ?, ?, ?, ?)')
+
+
+def test_admit_suppresses_repeat_scans_within_window():
+    window = CheckinWindow(window_s=60)
+    assert window.admit(1, 1000.0)
+    assert not window.admit(1, 1059.9)
+    assert window.admit(2, 1030.0)
+    assert window.admit(1, 1060.0)
+    assert window.stats() == {"window_s": 60, "users": 2, "admitted": 3, "suppressed": 1}
+
+
+def test_disabled_window_admits_everything_without_slot():
+    window = CheckinWindow(window_s=0)
+    assert window.admit(1, 1000.0) and window.admit(1, 1000.5)
+    assert window.slot(1000.0) is None
+
+
+def test_forget_and_set_window():
+    window = CheckinWindow(window_s=60)
+    window.admit(1, 1000.0)
+    window.forget(1)
+    assert window.admit(1, 1001.0)
+    window.set_window(10)
+    assert window.admit(1, 1011.0)
+
+
+def test_seed_keeps_latest_checkin_per_user():
+    window = CheckinWindow(window_s=60)
+    window.seed([(1, 1000.0), (1, 990.0), (2, None)])
+    assert not window.admit(1, 1030.0)
+    assert window.admit(2, 1030.0)
+
+
+def test_restart_seeds_window_from_recent_checkins(attendance_db):
+    now = datetime.now()
+    with attendance_db.writer() as conn:
+        conn.execute(INSERT, (1, "Ani", (now - timedelta(seconds=20)).strftime('%Y-%m-%d %H:%M:%S'), None, None))
+        conn.execute(INSERT, (2, "Budi", (now - timedelta(seconds=600)).strftime('%Y-%m-%d %H:%M:%S'), None, None))
+
+    # Aplikasi baru start: window kosong diisi dari presensi dalam jendela
+    app = types.SimpleNamespace(db=attendance_db, checkin_window_s=60, checkin_window=CheckinWindow(60))
+    AttendanceApp.load_recent_checkins(app)
+    ts = now.timestamp()
+    assert not app.checkin_window.admit(1, ts)
+    assert app.checkin_window.admit(2, ts)
+
+
+def test_slot_collision_is_rejected_by_unique_index(attendance_db):
+    window = CheckinWindow(window_s=60)
+    first, second = 6000.0, 6059.0
+    assert window.slot(first) == window.slot(second)
+    with attendance_db.writer() as conn:
+        conn.execute(INSERT, (1, "Ani", "2025-01-01 08:00:00", window.slot(first), "dev:1:1"))
+    with pytest.raises(sqlite3.IntegrityError):
+        with attendance_db.writer() as conn:
+            conn.execute(INSERT, (1, "Ani", "2025-01-01 08:00:59", window.slot(second), "dev:1:2"))
+
+    # Slot berikutnya dan user lain di slot yang sama tetap boleh
+    with attendance_db.writer() as conn:
+        conn.execute(INSERT, (1, "Ani", "2025-01-01 08:01:00", window.slot(6060.0), "dev:1:3"))
+        conn.execute(INSERT, (2, "Budi", "2025-01-01 08:00:30", window.slot(first), "dev:2:1"))
+        # Tanpa window (slot NULL) tidak pernah bentrok
+        conn.execute(INSERT, (1, "Ani", "2025-01-01 08:00:10", None, None))
+        conn.execute(INSERT, (1, "Ani", "2025-01-01 08:00:11", None, None))
+    assert attendance_db.query_one('SELECT COUNT(*) FROM attendance_logs')[0] == 5
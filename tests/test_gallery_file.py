@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import types
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(99)
+
+
+def template(rng, desktop):
+    return rng.integers(1, 256, desktop.TEMPLATE_SIZE, dtype=np.uint8).tobytes()
+
+
+def file_matcher(desktop, path, **kwargs):
+    return desktop.TemplateMatcher(path=str(path), **kwargs)
+
+
+def expected_size(desktop, capacity):
+    return desktop.TemplateMatcher.HEADER_SIZE + capacity * (8 + desktop.TEMPLATE_SIZE)
+
+
+def test_reopen_from_memmap_file(desktop, rng, tmp_path):
+    path = tmp_path / "attendance.gallery"
+    templates = {user_id: template(rng, desktop) for user_id in (3, 5, 8)}
+    matcher = file_matcher(desktop, path)
+    matcher.load(templates.items())
+    matcher.close()
+
+    reopened = file_matcher(desktop, path)
+    assert reopened.open_file()
+    assert len(reopened) == 3
+    for user_id, blob in templates.items():
+        assert reopened.match(blob)[0] == user_id
+    reopened.close()
+
+
+def test_open_file_rejects_missing_or_corrupt_file(desktop, tmp_path):
+    path = tmp_path / "attendance.gallery"
+    assert not file_matcher(desktop, path).open_file()
+    path.write_bytes(b"not a gallery" * 10)
+    assert not file_matcher(desktop, path).open_file()
+
+
+def test_remove_leaves_tombstone_that_survives_reopen(desktop, rng, tmp_path):
+    path = tmp_path / "attendance.gallery"
+    alice, bob = template(rng, desktop), template(rng, desktop)
+    matcher = file_matcher(desktop, path)
+    matcher.load([(1, alice), (2, bob)])
+    matcher.remove(1)
+    assert matcher.match(alice)[0] is None
+    assert matcher.stats()["tombstones"] == 1
+    assert not matcher.needs_compaction()
+    matcher.close()
+
+    reopened = file_matcher(desktop, path)
+    assert reopened.open_file()
+    assert (len(reopened), reopened.tombstones, reopened.count) == (1, 1, 2)
+    assert reopened.match(alice)[0] is None
+    assert reopened.match(bob)[0] == 2
+    reopened.remove(2)
+    assert reopened.needs_compaction()
+    reopened.close()
+
+
+def test_upsert_same_user_overwrites_row_in_place(desktop, rng, tmp_path):
+    matcher = file_matcher(desktop, tmp_path / "attendance.gallery")
+    old, new = template(rng, desktop), template(rng, desktop)
+    matcher.load([(1, old)])
+    matcher.upsert(1, new)
+    assert matcher.count == 1
+    assert matcher.match(new)[0] == 1
+    assert matcher.match(old)[0] is None
+    matcher.close()
+
+
+def test_growth_replaces_file_and_keeps_rows(desktop, rng, tmp_path):
+    path = tmp_path / "attendance.gallery"
+    matcher = file_matcher(desktop, path, initial_capacity=2)
+    templates = {user_id: template(rng, desktop) for user_id in range(1, 6)}
+    matcher.load([])
+    generation = matcher.generation
+    for user_id, blob in templates.items():
+        matcher.upsert(user_id, blob)
+    assert matcher.stats()["capacity"] == 8
+    assert matcher.generation > generation
+    assert os.path.getsize(path) == expected_size(desktop, 8)
+    assert not os.path.exists(str(path) + ".tmp")
+    matcher.close()
+
+    reopened = file_matcher(desktop, path)
+    assert reopened.open_file()
+    assert all(reopened.match(blob)[0] == user_id for user_id, blob in templates.items())
+    reopened.close()
+
+
+def test_open_gallery_ignores_users_with_empty_template(desktop, rng, tmp_path):
+    conn = sqlite3.connect(":memory:")
+    conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, fingerprint_template BLOB)')
+    conn.executemany('INSERT INTO users VALUES (?, ?)',
+                     [(1, template(rng, desktop)), (2, b""), (3, None), (4, template(rng, desktop))])
+    app = types.SimpleNamespace(conn=conn, matcher=file_matcher(desktop, tmp_path / "attendance.gallery"),
+                                probe_cache=desktop.ProbeCache())
+    app.reload_gallery = types.MethodType(desktop.AttendanceApp.reload_gallery, app)
+
+    desktop.AttendanceApp.open_gallery(app)
+    assert app.matcher.rebuilds == 1 and len(app.matcher) == 2
+    app.matcher.close()
+
+    # Start berikutnya: file sinkron, tidak dibangun ulang
+    app.matcher = file_matcher(desktop, tmp_path / "attendance.gallery")
+    desktop.AttendanceApp.open_gallery(app)
+    assert app.matcher.rebuilds == 0 and len(app.matcher) == 2
+    app.matcher.close()
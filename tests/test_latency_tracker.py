@@ -0,0 +1,53 @@
+import pytest
+
+from main import LatencyTracker
+
+
+@pytest.mark.parametrize("values, pct, expected", [
+    ([1, 2, 3, 4, 5], 50, 3),
+    (list(range(1, 101)), 50, 50),
+    (list(range(1, 101)), 95, 95),
+    (list(range(1, 101)), 99, 99),
+    (list(range(1, 11)), 95, 10),
+    ([7], 99, 7),
+])
+def test_nearest_rank_percentile(values, pct, expected):
+    assert LatencyTracker._percentile(values, pct) == expected
+
+
+def test_stage_counts_and_window():
+    tracker = LatencyTracker(window=10)
+    for ms in range(1, 21):
+        tracker.record("lookup", ms / 1000)
+    stats = tracker.stats()["stages"]
+    # count menghitung semua sampel, persentil hanya dari window terakhir (11..20 ms)
+    assert stats["lookup"]["count"] == 20
+    assert stats["lookup"]["p50"] == pytest.approx(15)
+    assert stats["lookup"]["p99"] == pytest.approx(20)
+    assert stats["publish"] == {"count": 0, "p50": None, "p95": None, "p99": None}
+
+
+def test_device_offset_uses_minimum_as_baseline():
+    tracker = LatencyTracker()
+    # Jam device (millis) dan desktop (epoch) berselisih 1_000_000 ms + delay jaringan
+    tracker.record_device("dev", 1000, (1_000_000 + 1000 + 30) / 1000)
+    tracker.record_device("dev", 2000, (1_000_000 + 2000 + 10) / 1000)
+    tracker.record_device("dev", 3000, (1_000_000 + 3000 + 55) / 1000)
+    stats = tracker.stats()
+    assert stats["devices"]["dev"]["min_offset_ms"] == pytest.approx(1_000_010)
+    assert stats["devices"]["dev"]["offset_ms"] == pytest.approx(1_000_055)
+    # Sampel uplink = offset - offset minimum saat itu: 0, 0, 45
+    assert stats["stages"]["uplink"]["count"] == 3
+    assert stats["stages"]["uplink"]["p99"] == pytest.approx(45)
+    assert stats["stages"]["uplink"]["p50"] == pytest.approx(0)
+
+
+def test_device_reboot_resets_offset():
+    tracker = LatencyTracker()
+    tracker.record_device("dev", 50_000, 1000.0)
+    # Timestamp mundur: device reboot, baseline dihitung ulang
+    tracker.record_device("dev", 100, 1010.0)
+    device = tracker.stats()["devices"]["dev"]
+    assert device["min_offset_ms"] == device["offset_ms"] == pytest.approx(1_010_000 - 100)
+    tracker.record_device("other", 10, 1000.0)
+    assert set(tracker.stats()["devices"]) == {"dev", "other"}
@@ -0,0 +1,62 @@
+import pytest
+
+from main import LogPager, SQLitePool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SQLitePool(str(tmp_path / "logs.db"))
+    with pool.writer() as conn:
+        conn.execute('CREATE TABLE attendance_logs (log_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, '
+                     'user_name TEXT, check_in_time TIMESTAMP, match_score INTEGER, fingerprint_hash TEXT)')
+    yield pool
+    pool.close()
+
+
+def insert(pool, names):
+    with pool.writer() as conn:
+        conn.executemany('INSERT INTO attendance_logs (user_id, user_name, check_in_time) VALUES (?, ?, ?)',
+                         [(i, name, "2025-01-01 08:00:00") for i, name in enumerate(names)])
+
+
+class CountingPool:
+    """Bungkus pool untuk menghitung query COUNT(*) yang dijalankan"""
+    def __init__(self, pool):
+        self.pool = pool
+        self.counts = []
+
+    def query_one(self, sql, params=()):
+        self.counts.append(sql)
+        return self.pool.query_one(sql, params)
+
+
+def test_count_is_cached_and_extended_incrementally(pool):
+    insert(pool, ["ani", "budi", "ani"] * 10)
+    db = CountingPool(pool)
+    pager = LogPager(db)
+    pager.set_filter('LOWER(user_name) LIKE ?', ('%ani%',))
+    assert pager.count(30) == 20
+    assert pager.count(30) == 20
+    assert len(db.counts) == 1
+
+    insert(pool, ["ani", "budi"])
+    assert pager.count(32) == 21
+    assert "log_id > ?" in db.counts[-1]
+
+    # Kembali ke filter sebelumnya tidak menghitung ulang seluruh tabel
+    pager.set_filter()
+    assert pager.count(32) == 32
+    pager.set_filter('LOWER(user_name) LIKE ?', ('%ani%',))
+    calls = len(db.counts)
+    assert pager.count(32) == 21
+    assert len(db.counts) == calls
+
+
+def test_invalidate_counts_after_delete(pool):
+    insert(pool, ["ani"] * 5)
+    pager = LogPager(pool)
+    assert pager.count(5) == 5
+    with pool.writer() as conn:
+        conn.execute('DELETE FROM attendance_logs WHERE log_id <= 2')
+    pager.invalidate_counts()
+    assert pager.count(5) == 3
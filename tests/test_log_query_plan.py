@@ -0,0 +1,40 @@
+import pytest
+
+from main import LogPager, SQLitePool, date_filter_ranges, plan_searches_index
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SQLitePool(str(tmp_path / "logs.db"))
+    with pool.writer() as conn:
+        conn.execute('CREATE TABLE attendance_logs (log_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, '
+                     'user_name TEXT, check_in_time TIMESTAMP, match_score INTEGER, fingerprint_hash TEXT)')
+        conn.execute('CREATE INDEX idx_attendance_time ON attendance_logs(check_in_time)')
+        conn.executemany('INSERT INTO attendance_logs (user_id, user_name, check_in_time) VALUES (?, ?, ?)',
+                         [(i, f"user{i}", f"2025-{i % 12 + 1:02d}-01 08:00:00") for i in range(200)])
+    yield pool
+    pool.close()
+
+
+def explain(pool, sql, params):
+    return [row[-1] for row in pool.query('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def test_scan_using_index_is_not_a_search():
+    assert not plan_searches_index(["SCAN attendance_logs USING INDEX idx_attendance_time"], "idx_attendance_time")
+    assert plan_searches_index(["SEARCH attendance_logs USING INDEX idx_attendance_time (check_in_time>? AND "
+                                "check_in_time<?)"], "idx_attendance_time")
+
+
+def test_date_range_filter_searches_index(pool):
+    pager = LogPager(pool)
+    (start, end), = date_filter_ranges([2025], 3)
+    pager.set_filter('(check_in_time >= ? AND check_in_time < ?)', (start, end))
+    assert plan_searches_index(explain(pool, *pager.build_query()), "idx_attendance_time")
+
+
+def test_unfiltered_and_strftime_filters_only_scan(pool):
+    pager = LogPager(pool)
+    assert not plan_searches_index(explain(pool, *pager.build_query()), "idx_attendance_time")
+    pager.set_filter("strftime('%m', check_in_time) = ?", ("03",))
+    assert not plan_searches_index(explain(pool, *pager.build_query()), "idx_attendance_time")
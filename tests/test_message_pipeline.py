@@ -0,0 +1,70 @@
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from main import MessagePipeline
+
+
+def message(topic, payload=b"{}"):
+    msg = mqtt.MQTTMessage(topic=topic.encode())
+    msg.payload = payload
+    return msg
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.01)
+
+
+def test_handler_errors_are_counted_and_reported():
+    errors = []
+
+    def handler(msg):
+        if msg.payload == b"bad":
+            raise ValueError("boom")
+
+    pipeline = MessagePipeline(handler, workers=2, on_error=lambda msg, e: errors.append((msg.topic, str(e))))
+    pipeline.start()
+    try:
+        pipeline.submit(message("verifynger/verify/request", b"bad"))
+        pipeline.submit(message("verifynger/verify/request"))
+        wait_until(lambda: pipeline.stats()["processed"] == 2)
+    finally:
+        pipeline.stop()
+    assert pipeline.stats()["errors"] == 1
+    assert errors == [("verifynger/verify/request", "boom")]
+
+
+def test_messages_of_one_topic_keep_their_order():
+    seen = []
+    lock = threading.Lock()
+
+    def handler(msg):
+        # Pesan pertama lambat: tanpa partisi per topic worker lain menyalipnya
+        if msg.payload == b"0":
+            time.sleep(0.05)
+        with lock:
+            seen.append((msg.topic, int(msg.payload)))
+
+    pipeline = MessagePipeline(handler, workers=4)
+    pipeline.start()
+    try:
+        for i in range(20):
+            pipeline.submit(message("verifynger/system/health", str(i).encode()))
+            pipeline.submit(message("verifynger/sensor/metrics", str(i).encode()))
+        wait_until(lambda: pipeline.stats()["processed"] == 40)
+    finally:
+        pipeline.stop()
+    for topic in ("verifynger/system/health", "verifynger/sensor/metrics"):
+        assert [n for t, n in seen if t == topic] == list(range(20))
+
+
+def test_drop_oldest_when_partition_is_full():
+    pipeline = MessagePipeline(lambda msg: None, workers=1, max_size=2)
+    for i in range(3):
+        assert pipeline.submit(message("verifynger/verify/request", str(i).encode()))
+    stats = pipeline.stats()
+    assert (stats["depth"], stats["dropped"], stats["enqueued"]) == (2, 1, 3)
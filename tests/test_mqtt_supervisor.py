@@ -0,0 +1,131 @@
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+import pytest
+
+import main
+from main import MqttSupervisor
+
+
+class FakeClient:
+    """Client paho palsu: connect gagal fail_times kali, lalu loop() sukses sampai drop()"""
+    def __init__(self, fail_times=0):
+        self.fail_times = fail_times
+        self.connects = 0
+        self.disconnects = 0
+        self.supervisor = None
+        self.connected = threading.Event()
+        self._drop = threading.Event()
+
+    def connect(self, host, port, keepalive):
+        self.connects += 1
+        if self.connects <= self.fail_times:
+            raise ConnectionRefusedError("broker down")
+        self._drop.clear()
+        self.supervisor.mark_connected()  # on_connect aplikasi
+        self.connected.set()
+
+    def loop(self, timeout=1.0):
+        if self._drop.wait(0.01):
+            self.connected.clear()
+            self.supervisor.mark_disconnected(mqtt.MQTT_ERR_CONN_LOST)
+            return mqtt.MQTT_ERR_CONN_LOST
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def drop(self):
+        self._drop.set()
+
+    def disconnect(self):
+        self.disconnects += 1
+        self._drop.set()
+
+
+def make_supervisor(client, retries, **kwargs):
+    supervisor = MqttSupervisor(client, "broker", 1883,
+                                on_retry=lambda delay, attempts, error: retries.append((delay, attempts, error)),
+                                **kwargs)
+    client.supervisor = supervisor
+    return supervisor
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.005)
+
+
+def test_backoff_doubles_up_to_cap(monkeypatch):
+    monkeypatch.setattr(main.random, "uniform", lambda low, high: high)
+    supervisor = MqttSupervisor(None, "broker", 1883, min_delay=1.0, max_delay=60.0)
+    delays = []
+    for attempts in range(9):
+        supervisor.attempts = attempts
+        delays.append(supervisor.next_delay())
+    assert delays == [1, 2, 4, 8, 16, 32, 60, 60, 60]
+    supervisor.attempts = 10_000
+    assert supervisor.next_delay() == 60
+
+
+def test_jitter_stays_within_half_to_full_delay():
+    supervisor = MqttSupervisor(None, "broker", 1883, min_delay=1.0, max_delay=60.0)
+    supervisor.attempts = 3
+    samples = [supervisor.next_delay() for _ in range(2000)]
+    assert all(4.0 <= delay <= 8.0 for delay in samples)
+    assert min(samples) < 4.5 and max(samples) > 7.5
+
+
+def test_retries_back_off_then_reset_after_connect():
+    retries = []
+    client = FakeClient(fail_times=3)
+    supervisor = make_supervisor(client, retries, min_delay=0.01, max_delay=0.04)
+    supervisor.start()
+    try:
+        assert client.connected.wait(5)
+        assert [attempts for _, attempts, _ in retries] == [1, 2, 3]
+        assert all(isinstance(error, ConnectionRefusedError) for _, _, error in retries)
+        assert [0.005 <= delay <= 0.04 for delay, _, _ in retries] == [True] * 3
+        assert supervisor.attempts == 0 and supervisor.connected
+
+        # Koneksi putus: backoff mulai lagi dari percobaan pertama
+        client.drop()
+        wait_until(lambda: len(retries) == 4)
+        assert retries[-1][1] == 1
+        assert client.connected.wait(5)
+        wait_until(lambda: supervisor.stats()["reconnects"] == 1)
+        assert supervisor.stats()["outages"] == 1
+        assert supervisor.failed_attempts == 4
+    finally:
+        supervisor.stop()
+
+
+def test_stop_ends_loop_while_connected_or_retrying():
+    retries = []
+    client = FakeClient()
+    supervisor = make_supervisor(client, retries)
+    supervisor.start()
+    assert client.connected.wait(5)
+    supervisor.stop()
+    assert not supervisor.running
+    assert client.disconnects == 1 and retries == []
+
+    # Stop saat sedang menunggu backoff panjang juga langsung berhenti
+    failing = FakeClient(fail_times=1000)
+    supervisor = make_supervisor(failing, retries, min_delay=30.0, max_delay=60.0)
+    supervisor.start()
+    wait_until(lambda: retries)
+    started = time.monotonic()
+    supervisor.stop()
+    assert not supervisor.running
+    assert time.monotonic() - started < 2.0
+    assert failing.connects == 1
+
+
+def test_intentional_disconnect_is_not_an_outage():
+    supervisor = MqttSupervisor(None, "broker", 1883)
+    supervisor.mark_connected()
+    supervisor.mark_disconnected(0)
+    supervisor.mark_connected()
+    stats = supervisor.stats()
+    assert stats["outages"] == 0 and stats["reconnects"] == 1
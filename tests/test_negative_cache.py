@@ -0,0 +1,71 @@
+import types
+
+import pytest
+
+import main
+from main import NegativeCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(main.time, "monotonic", lambda: now.value)
+    return now
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = NegativeCache(ttl_s=60)
+    cache.add("AS608_9")
+    assert cache.contains("AS608_9")
+    clock.value += 59.9
+    assert cache.contains("AS608_9")
+    clock.value += 0.2
+    assert not cache.contains("AS608_9")
+    assert cache.stats() == {"cached": 0, "tracked": 0, "hits": 2, "ttl_s": 60}
+
+
+def test_set_ttl_applies_to_new_entries(clock):
+    cache = NegativeCache(ttl_s=60)
+    cache.set_ttl(5)
+    cache.add("AS608_9")
+    clock.value += 6
+    assert not cache.contains("AS608_9")
+
+
+def test_miss_counters_survive_ttl_and_are_bounded(clock):
+    cache = NegativeCache(ttl_s=1, max_tracked=2)
+    assert [cache.record_miss("AS608_9") for _ in range(3)] == [1, 2, 3]
+    cache.record_miss("ZW101_1")
+    clock.value += 10
+    assert cache.record_miss("AS608_9") == 4
+
+    # Hash paling lama tidak di-update tergeser saat melebihi max_tracked
+    cache.record_miss("FPM10A_2")
+    assert [row[0] for row in cache.snapshot()] == ["AS608_9", "FPM10A_2"]
+
+
+def test_invalidate_on_registration_clears_entry_and_counter(clock):
+    cache = NegativeCache()
+    cache.add("AS608_9")
+    cache.record_miss("AS608_9")
+    version = cache.version
+
+    cache.invalidate("AS608_9")
+    assert not cache.contains("AS608_9")
+    assert cache.snapshot() == []
+    assert cache.version == version + 1
+
+    # Hash yang tidak tercatat tidak mengubah version (tabel UI tidak di-refresh)
+    cache.invalidate("AS608_9")
+    assert cache.version == version + 1
+
+
+def test_snapshot_orders_by_miss_count_and_limits(clock):
+    cache = NegativeCache()
+    for fp_hash, count in (("A_1", 1), ("B_2", 3), ("C_3", 2)):
+        for _ in range(count):
+            cache.record_miss(fp_hash)
+    rows = cache.snapshot(limit=2)
+    assert [(row[0], row[1]) for row in rows] == [("B_2", 3), ("C_3", 2)]
+    assert rows[0][2] <= rows[0][3]
+    assert cache.version == 6
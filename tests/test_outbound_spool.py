@@ -0,0 +1,90 @@
+import os
+import time
+
+from main import OutboundSpool
+
+
+def fill(spool, count, ttl_s=None):
+    for i in range(count):
+        spool.append("verifynger/command/mode", f"msg{i:03d}", ttl_s=ttl_s)
+
+
+def drain_all(spool, out):
+    return spool.drain(lambda topic, payload, qos: out.append(payload) or True, 10_000)
+
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".spool"))
+
+
+def test_drain_in_order_across_segments(tmp_path):
+    spool = OutboundSpool(str(tmp_path), segment_bytes=1024)
+    fill(spool, 100)
+    assert len(segment_files(tmp_path)) > 1
+
+    out = []
+    assert drain_all(spool, out) == (100, 0)
+    assert out == [f"msg{i:03d}".encode() for i in range(100)]
+    assert spool.pending() == 0
+    assert len(segment_files(tmp_path)) == 1
+
+
+def test_expired_messages_are_dropped(tmp_path):
+    spool = OutboundSpool(str(tmp_path))
+    spool.append("verifynger/command/relay", "open", ttl_s=0.01)
+    spool.append("verifynger/command/mode", "presensi")
+    time.sleep(0.05)
+
+    out = []
+    assert drain_all(spool, out) == (1, 1)
+    assert out == [b"presensi"]
+
+
+def test_cursor_saved_when_segment_switches_without_publish(tmp_path):
+    spool = OutboundSpool(str(tmp_path), segment_bytes=1024)
+    fill(spool, 100)
+    first_segment = segment_files(tmp_path)[0]
+
+    # Habiskan frame segmen pertama, lalu publish pertama di segmen kedua gagal
+    first_count, _ = spool._scan(int(first_segment[4:12]), 0)
+    out = []
+    assert spool.drain(lambda t, p, q: out.append(p) or True, first_count) == (first_count, 0)
+    assert spool.drain(lambda t, p, q: False, 10) == (0, 0)
+    assert first_segment not in segment_files(tmp_path)
+    spool.close()
+
+    reopened = OutboundSpool(str(tmp_path), segment_bytes=1024)
+    assert reopened.stats()["segments"] == len(segment_files(tmp_path))
+    rest = []
+    drain_all(reopened, rest)
+    assert out + rest == [f"msg{i:03d}".encode() for i in range(100)]
+
+
+def test_cursor_pointing_at_deleted_segment_recovers(tmp_path):
+    spool = OutboundSpool(str(tmp_path), segment_bytes=1024)
+    fill(spool, 100)
+    drained = []
+    spool.drain(lambda t, p, q: drained.append(p) or True, 5)
+    spool.close()
+    os.remove(tmp_path / segment_files(tmp_path)[0])
+
+    reopened = OutboundSpool(str(tmp_path), segment_bytes=1024)
+    assert reopened.stats()["segments"] == len(segment_files(tmp_path))
+    out = []
+    sent, _ = drain_all(reopened, out)
+    assert sent == reopened.stats()["sent"] and reopened.pending() == 0
+
+
+def test_torn_tail_frame_is_truncated(tmp_path):
+    spool = OutboundSpool(str(tmp_path))
+    fill(spool, 3)
+    spool.close()
+    with open(tmp_path / segment_files(tmp_path)[-1], "ab") as f:
+        f.write(b"\x10\x00")
+
+    reopened = OutboundSpool(str(tmp_path))
+    assert reopened.pending() == 3
+    reopened.append("verifynger/command/mode", "after")
+    out = []
+    drain_all(reopened, out)
+    assert out[-1] == b"after" and len(out) == 4
@@ -0,0 +1,22 @@
+def test_put_after_clear_is_dropped(desktop):
+    cache = desktop.ProbeCache(ttl_s=60, max_entries=8)
+    key = cache.key(b"probe")
+
+    # Match dimulai, lalu user dihapus (clear) sebelum hasilnya disimpan
+    epoch = cache.epoch
+    cache.clear()
+    assert not cache.put(key, (7, 95.0), epoch)
+    assert cache.get(key) is None
+    assert cache.stats()["stale_puts"] == 1
+
+    assert cache.put(key, (None, 0.0), cache.epoch)
+    assert cache.get(key) == (None, 0.0)
+
+
+def test_lru_eviction(desktop):
+    cache = desktop.ProbeCache(ttl_s=60, max_entries=2)
+    for name in (b"a", b"b", b"c"):
+        cache.put(cache.key(name), name, cache.epoch)
+    assert cache.get(cache.key(b"a")) is None
+    assert cache.get(cache.key(b"c")) == b"c"
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def gallery(desktop):
+    rng = np.random.default_rng(5)
+    return rng.integers(1, 256, (60, desktop.TEMPLATE_SIZE), dtype=np.uint8)
+
+
+@pytest.fixture
+def matchers(desktop, gallery, tmp_path):
+    rows = [(user_id, row.tobytes()) for user_id, row in enumerate(gallery, start=1)]
+    serial = desktop.TemplateMatcher()
+    serial.load(rows)
+    parallel = desktop.TemplateMatcher(path=str(tmp_path / "attendance.gallery"), initial_capacity=64)
+    parallel.load(rows)
+    parallel.parallel_min = 10
+    parallel.set_workers(2)
+    yield serial, parallel
+    parallel.close()
+
+
+def probes(desktop, gallery):
+    rng = np.random.default_rng(6)
+    noisy = [np.where(rng.random(row.size) < 0.05, row ^ 1, row).astype(np.uint8) for row in gallery[::7]]
+    impostors = list(rng.integers(1, 256, (3, desktop.TEMPLATE_SIZE), dtype=np.uint8))
+    return [probe.tobytes() for probe in noisy + impostors]
+
+
+def test_parallel_results_match_serial_path(desktop, gallery, matchers):
+    serial, parallel = matchers
+    for probe in probes(desktop, gallery):
+        assert parallel.match(probe) == serial.match(probe)
+    assert parallel.stats()["parallel_matches"] == len(probes(desktop, gallery))
+    assert parallel.stats()["workers"] == 2
+
+
+def test_tombstones_are_skipped_by_workers(desktop, gallery, matchers):
+    serial, parallel = matchers
+    serial.remove(1)
+    parallel.remove(1)
+    assert parallel.match(gallery[0].tobytes()) == serial.match(gallery[0].tobytes())
+    assert parallel.match(gallery[0].tobytes())[0] is None
+
+
+def test_below_parallel_min_or_without_pool_uses_serial_path(desktop, gallery, matchers):
+    serial, parallel = matchers
+    parallel.parallel_min = 1000
+    assert parallel.match(gallery[3].tobytes()) == serial.match(gallery[3].tobytes())
+    parallel.parallel_min = 10
+    parallel.set_workers(0)
+    assert parallel.match(gallery[4].tobytes()) == serial.match(gallery[4].tobytes())
+    assert parallel.stats()["parallel_matches"] == 0
+
+
+def test_broken_pool_falls_back_to_serial_path(desktop, gallery, matchers):
+    serial, parallel = matchers
+    parallel.pool.close()  # executor mati, submit() gagal
+    assert parallel.match(gallery[2].tobytes()) == serial.match(gallery[2].tobytes())
+    assert parallel.stats()["parallel_matches"] == 0
+
+
+def test_pool_is_recreated_after_gallery_growth(desktop, gallery, matchers):
+    serial, parallel = matchers
+    old_pool = parallel.pool
+    extra = np.random.default_rng(7).integers(1, 256, (10, desktop.TEMPLATE_SIZE), dtype=np.uint8)
+    for user_id, row in enumerate(extra, start=100):
+        parallel.upsert(user_id, row.tobytes())
+        serial.upsert(user_id, row.tobytes())
+    assert parallel.stats()["capacity"] == 128
+    assert parallel.pool is not old_pool and parallel.pool.workers == 2
+
+    for probe in [extra[-1].tobytes(), gallery[10].tobytes()]:
+        assert parallel.match(probe) == serial.match(probe)
+    assert parallel.stats()["parallel_matches"] == 2
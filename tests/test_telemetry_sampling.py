@@ -0,0 +1,66 @@
+import json
+import types
+
+from main import AttendanceApp, TelemetryStore
+
+
+class FakeLabel:
+    def __init__(self):
+        self.text = ""
+
+    def config(self, text):
+        self.text = text
+
+    def cget(self, key):
+        return self.text
+
+
+def make_app():
+    app = types.SimpleNamespace(
+        telemetry=TelemetryStore(), telemetry_seq=0, telemetry_sample_ms=500,
+        sensor_status=FakeLabel(), mode_status=FakeLabel(), logs=[], scheduled=[], applied=[],
+        sensor_list=["FPM10A", "AS608", "ZW101"], active_sensor="FPM10A",
+        metrics_route=None, health_route=None,
+        TOPIC_SENSOR_METRICS="verifynger/sensor/metrics", TOPIC_SYS_HEALTH="verifynger/system/health")
+    app.log = app.logs.append
+    app.root = types.SimpleNamespace(after=lambda ms, func: app.scheduled.append(ms))
+    app.apply_sensor_metrics = app.applied.append
+    app.on_mqtt_payload = lambda route, topic, data, lossy: None
+    app.sample_telemetry = lambda: None
+    app.apply_system_health = types.MethodType(AttendanceApp.apply_system_health, app)
+    return app
+
+
+def test_bad_health_payload_is_logged_and_sampling_continues():
+    app = make_app()
+    app.telemetry.put("health", json.dumps({"sensor": "AS608", "uptime_ms": "12s"}).encode())
+    AttendanceApp.sample_telemetry(app)
+    assert app.scheduled == [500]
+    assert any("system health" in line for line in app.logs)
+
+    app.telemetry.put("health", json.dumps({"sensor": "ZW101", "mode": "presensi", "uptime_ms": 61000}).encode())
+    AttendanceApp.sample_telemetry(app)
+    assert app.scheduled == [500, 500]
+    assert app.sensor_status.text == app.active_sensor == "ZW101"
+    assert "Uptime=0h1m1s" in app.logs[-1]
+
+
+def test_sampling_is_rescheduled_when_store_fails():
+    app = make_app()
+    app.telemetry = None
+    try:
+        AttendanceApp.sample_telemetry(app)
+    except AttributeError:
+        pass
+    assert app.scheduled == [500]
+
+
+def test_only_latest_payload_is_decoded():
+    app = make_app()
+    # Payload yang tergeser tidak pernah di-parse, meskipun rusak
+    app.telemetry.put("metrics", b"{not json")
+    app.telemetry.put("metrics", json.dumps({"AS608": {"total_scans": 3}, "extra": 1}).encode())
+    AttendanceApp.sample_telemetry(app)
+    assert app.applied == [{"AS608": {"total_scans": 3}}]
+    assert not app.logs
+    assert app.telemetry.stats()["superseded"] == 1
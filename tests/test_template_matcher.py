@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+
+def synthetic_template(rng, desktop, populated):
+    """Header paket + region minutiae acak sepanjang populated byte, sisanya padding nol"""
+    row = np.zeros(desktop.TEMPLATE_SIZE, dtype=np.uint8)
+    row[:2] = (0xEF, 0x01)
+    start = desktop.TEMPLATE_HEADER_BYTES
+    row[start:start + populated] = rng.integers(1, 256, populated, dtype=np.uint8)
+    return row
+
+
+def with_noise(rng, row, desktop, flip_ratio):
+    """Scan ulang jari yang sama: flip sebagian bit di region terisi"""
+    noisy = row.copy()
+    region = np.flatnonzero(row[desktop.TEMPLATE_HEADER_BYTES:]) + desktop.TEMPLATE_HEADER_BYTES
+    bits = np.unpackbits(noisy[region])
+    flips = rng.random(bits.size) < flip_ratio
+    noisy[region] = np.packbits(bits ^ flips)
+    return noisy
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(1234)
+
+
+def test_two_different_enrolled_templates_do_not_match(desktop, rng):
+    matcher = desktop.TemplateMatcher()
+    alice = synthetic_template(rng, desktop, 180)
+    bob = synthetic_template(rng, desktop, 180)
+    matcher.load([(1, alice.tobytes()), (2, bob.tobytes())])
+
+    assert matcher.match(alice.tobytes())[0] == 1
+    assert matcher.match(with_noise(rng, bob, desktop, 0.1).tobytes())[0] == 2
+
+    # Impostor: header dan padding sama, region minutiae berbeda
+    user_id, score = matcher.match(synthetic_template(rng, desktop, 180).tobytes())
+    assert user_id is None and score < matcher.threshold
+
+
+def test_header_only_templates_never_match(desktop):
+    # Template dummy firmware: hanya start code + ID slot, sisanya nol
+    matcher = desktop.TemplateMatcher()
+    first = bytes([0xEF, 0x01, 0x00, 0x01]) + bytes(508)
+    second = bytes([0xEF, 0x01, 0x00, 0x02]) + bytes(508)
+    matcher.load([(1, first)])
+    assert matcher.match(second) == (None, 0.0)
+    assert matcher.match(first) == (None, 0.0)
+
+
+def test_threshold_calibration_far_frr(desktop, rng):
+    threshold = desktop.TemplateMatcher().threshold
+    sizes = rng.integers(64, 401, 300)
+    gallery = np.stack([synthetic_template(rng, desktop, size) for size in sizes[:200]])
+    probes = [synthetic_template(rng, desktop, size) for size in sizes[200:]]
+
+    impostor = np.concatenate([desktop.region_scores(gallery, probe) for probe in probes])
+    assert impostor.size == 20000
+    assert impostor.max() < 58
+    assert np.count_nonzero(impostor >= threshold) == 0  # FAR 0/20.000
+
+    genuine = np.array([desktop.region_scores(gallery[i:i + 1], with_noise(rng, gallery[i], desktop, 0.1))[0]
+                        for i in range(len(gallery))])
+    assert genuine.min() >= threshold  # FRR 0 pada 10% bit noise
+    assert abs(genuine.mean() - 90) < 2
+
+
+def test_shortlist_recall_on_synthetic_gallery(desktop, rng):
+    matcher = desktop.TemplateMatcher(shortlist_k=32, recall_sample_every=1)
+    gallery = rng.integers(0, 256, (2000, desktop.TEMPLATE_SIZE), dtype=np.uint8)
+    matcher.load([(user_id, row.tobytes()) for user_id, row in enumerate(gallery, start=1)])
+
+    probes = rng.choice(len(gallery), 100, replace=False)
+    for index in probes:
+        user_id, _ = matcher.match(with_noise(rng, gallery[index], desktop, 0.2).tobytes())
+        assert user_id == index + 1
+
+    stats = matcher.stats()
+    assert stats["shortlisted"] == len(probes)
+    assert stats["recall"] == 1.0
+
+
+def test_shortlist_recall_on_sparse_templates(desktop, rng):
+    # Region minutiae pendek (64-128 byte), sisanya padding nol
+    matcher = desktop.TemplateMatcher(shortlist_k=32, recall_sample_every=1)
+    gallery = [synthetic_template(rng, desktop, int(size)) for size in rng.integers(64, 129, 2000)]
+    matcher.load([(user_id, row.tobytes()) for user_id, row in enumerate(gallery, start=1)])
+
+    probes = rng.choice(len(gallery), 200, replace=False)
+    correct = sum(matcher.match(with_noise(rng, gallery[index], desktop, 0.2).tobytes())[0] == index + 1
+                  for index in probes)
+    assert correct == len(probes)
+    assert matcher.stats()["recall"] == 1.0
@@ -0,0 +1,56 @@
+import json
+
+import paho.mqtt.client as mqtt
+import pytest
+
+from main import TopicRouter, decode_mqtt_payload
+
+
+def message(topic, payload):
+    msg = mqtt.MQTTMessage(topic=topic.encode())
+    msg.payload = payload
+    return msg
+
+
+def test_decode_mqtt_payload_utf8_and_latin1_fallback():
+    assert decode_mqtt_payload('{"name": "Bü"}'.encode('utf-8')) == ({"name": "Bü"}, False)
+    assert decode_mqtt_payload('{"name": "Bü"}'.encode('latin-1')) == ({"name": "Bü"}, True)
+    with pytest.raises(ValueError):
+        decode_mqtt_payload(b"{not json")
+
+
+def test_exact_route_wins_over_pattern_and_unrouted_is_counted():
+    calls = []
+    router = TopicRouter()
+    router.add("verifynger/+/status", lambda msg, data: calls.append(("pattern", data)))
+    router.add("verifynger/response/status", lambda msg, data: calls.append(("exact", data)))
+
+    assert router.route(message("verifynger/response/status", b'{"event": "ok"}'))
+    assert router.route(message("verifynger/system/status", b'{"event": "up"}'))
+    assert not router.route(message("other/topic", b"{}"))
+    assert calls == [("exact", {"event": "ok"}), ("pattern", {"event": "up"})]
+    assert router.unrouted == 1
+    assert set(router.topics()) == {"verifynger/+/status", "verifynger/response/status"}
+
+
+def test_route_without_decode_gets_raw_payload():
+    decoded, raw = [], []
+    router = TopicRouter(on_decoded=lambda route, topic, data, lossy: decoded.append(topic))
+    router.add("verifynger/sensor/metrics", lambda msg, data: raw.append((msg.payload, data)), decode=False)
+
+    # Payload tidak valid JSON pun tidak di-parse oleh router
+    assert router.route(message("verifynger/sensor/metrics", b"\xff raw"))
+    assert raw == [(b"\xff raw", None)]
+    assert decoded == []
+
+
+def test_handler_errors_are_counted_and_propagated():
+    router = TopicRouter()
+
+    def failing(msg, data):
+        raise KeyError("fingerprint_hash")
+
+    route = router.add("verifynger/verify/request", failing)
+    with pytest.raises(KeyError):
+        router.route(message("verifynger/verify/request", json.dumps({}).encode()))
+    assert (route.messages, route.errors) == (1, 1)
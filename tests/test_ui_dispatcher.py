@@ -0,0 +1,40 @@
+import types
+
+from main import UiDispatcher
+
+
+def make_dispatcher(**kwargs):
+    root = types.SimpleNamespace(after=lambda ms, func: None)
+    dispatcher = UiDispatcher(root, **kwargs)
+    dispatcher._running = True
+    return dispatcher
+
+
+def test_errors_are_counted_and_reported():
+    reported = []
+    dispatcher = make_dispatcher(on_error=lambda func, e: reported.append((func.__name__, str(e))))
+
+    def broken():
+        raise RuntimeError("widget destroyed")
+
+    done = []
+    dispatcher.call(broken)
+    dispatcher.call(done.append, 1)
+    dispatcher._tick()
+    assert dispatcher.errors == 1
+    assert reported == [("broken", "widget destroyed")]
+    assert done == [1]
+
+
+def test_refresh_requests_are_coalesced():
+    dispatcher = make_dispatcher()
+    runs = []
+
+    def redraw():
+        runs.append(1)
+
+    for _ in range(5):
+        dispatcher.refresh(redraw)
+    dispatcher._tick()
+    assert runs == [1]
+    assert dispatcher.coalesced == 4
@@ -0,0 +1,34 @@
+from main import UserIndex
+
+
+def test_hash_moving_to_another_user_detaches_old_owner():
+    index = UserIndex()
+    index.put("AS608_7", 2, "Budi", "budi@x", "Staff")
+    index.put("AS608_7", 1, "Ani", "ani@x", "Manager")
+
+    # Edit/hapus user lama tidak boleh menyentuh entry milik pemilik baru
+    index.update_user(2, "Budi S", "budi@x", "Staff")
+    assert index.lookup("AS608_7") == (1, "Ani", "ani@x", "Manager")
+    index.remove_user(2)
+    assert index.lookup("AS608_7") == (1, "Ani", "ani@x", "Manager")
+
+    index.update_user(1, "Ani W", "ani@x", "Manager")
+    assert index.lookup("AS608_7") == (1, "Ani W", "ani@x", "Manager")
+
+
+def test_rebuild_with_duplicate_hash_keeps_last_owner_only():
+    index = UserIndex()
+    index.rebuild([(2, "Budi", None, None, "AS608_7"), (1, "Ani", None, None, "AS608_7"),
+                   (3, "Citra", None, None, None)])
+    index.update_user(2, "Budi S", None, None)
+    assert index.lookup("AS608_7") == (1, "Ani", None, None)
+    assert index.lookup("missing") is None
+    assert (index.hits, index.misses) == (1, 1)
+
+
+def test_put_replaces_users_previous_hash():
+    index = UserIndex()
+    index.put("AS608_1", 1, "Ani", None, None)
+    index.put("ZW101_4", 1, "Ani", None, None)
+    assert index.lookup("AS608_1") is None
+    assert index.lookup("ZW101_4")[0] == 1
@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from main import (VERIFY_ENCODINGS, VERIFY_NAME_MAX, VERIFY_REQUEST_STRUCT, ResponseCache, benchmark_verify_codec,
+                  decode_verify_payload, encode_verify_request, encode_verify_response, verify_idempotency_key)
+
+REQUEST = {"fingerprint_hash": "AS608_42", "match_score": 87, "sensor": "AS608",
+           "fingerprint_id": 42, "timestamp": 123456, "boot": 0xDEADBEEF, "seq": 7,
+           "device": "24A160F3B2C8"}
+
+
+def test_struct1_request_round_trip():
+    payload = encode_verify_request(REQUEST)
+    assert len(payload) == VERIFY_REQUEST_STRUCT.size + len(REQUEST["device"])
+    data, encoding, lossy = decode_verify_payload(payload)
+    assert encoding == "struct1" and not lossy
+    assert data == REQUEST
+
+
+def test_idempotency_key_survives_reboot_and_units():
+    key = verify_idempotency_key(REQUEST)
+    # Setelah reboot millis() dan seq mulai dari awal, nonce boot berbeda
+    rebooted = dict(REQUEST, boot=0x12345678)
+    other_unit = dict(REQUEST, device="24A160F3B2D0")
+    assert key != verify_idempotency_key(rebooted)
+    assert key != verify_idempotency_key(other_unit)
+    assert key == verify_idempotency_key(dict(REQUEST))
+
+
+def test_legacy_request_has_no_idempotency_key():
+    legacy = {k: v for k, v in REQUEST.items() if k not in ("boot", "seq")}
+    assert verify_idempotency_key(legacy) is None
+    assert verify_idempotency_key(dict(REQUEST, fingerprint_hash=None)) is None
+
+
+def test_response_cache_replays_sent_response():
+    cache = ResponseCache(max_entries=2)
+    key = verify_idempotency_key(REQUEST)
+    assert cache.get(key) is None and cache.duplicates == 0
+
+    payload = encode_verify_response({"status": "MATCH", "user_id": 3, "user_name": "Ani",
+                                      "match_score": 87}, "struct1")
+    cache.put(key, payload)
+    assert cache.get(key) == payload
+    assert cache.duplicates == 1
+
+    cache.put("b", "{}")
+    cache.put("c", "{}")
+    assert cache.get(key) is None and len(cache) == 2
+
+
+@pytest.mark.parametrize("encoding", VERIFY_ENCODINGS)
+def test_response_round_trip(encoding):
+    response = {"status": "MATCH", "user_id": 42, "user_name": "Budi Santoso", "match_score": 87}
+    payload = encode_verify_response(response, encoding)
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    assert decode_verify_payload(payload) == (response, encoding, False)
+
+
+def test_struct1_response_truncates_long_names():
+    response = {"status": "NO_MATCH", "user_id": 0, "user_name": "x" * 40, "match_score": 0}
+    data, _, _ = decode_verify_payload(encode_verify_response(response, "struct1"))
+    assert data["user_name"] == "x" * VERIFY_NAME_MAX
+
+
+def test_json_request_is_the_fallback():
+    payload = json.dumps(REQUEST).encode('utf-8')
+    assert decode_verify_payload(payload) == (REQUEST, "json", False)
+
+
+def test_benchmark_reports_both_encodings():
+    results = benchmark_verify_codec(iterations=50)
+    assert set(results) == set(VERIFY_ENCODINGS)
+    assert results["struct1"]["request_bytes"] < results["json"]["request_bytes"]
+    assert results["struct1"]["response_bytes"] < results["json"]["response_bytes"]
+    for timings in results.values():
+        assert timings["decode_request_us"] > 0 and timings["encode_response_us"] > 0
+
+
+def test_bench_codec_command_line():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, os.path.join(root, "main.py"), "--bench-codec"],
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert [line.split()[0] for line in result.stdout.splitlines()[-2:]] == list(VERIFY_ENCODINGS)
+
+
+def test_unknown_status_is_sent_as_error_code():
+    response = {"status": "DUPLICATE", "user_id": 0, "user_name": "", "match_score": 0}
+    data, _, _ = decode_verify_payload(encode_verify_response(response, "struct1"))
+    assert data["status"] == "ERROR"
+
+
+def test_truncated_struct1_payload_is_lossy_none():
+    request = encode_verify_request(REQUEST)
+    assert decode_verify_payload(request[:VERIFY_REQUEST_STRUCT.size - 1]) == (None, "struct1", True)
+    response = encode_verify_response({"status": "MATCH", "user_name": "Ani"}, "struct1")
+    assert decode_verify_payload(response[:5]) == (None, "struct1", True)